@@ -0,0 +1,209 @@
+# spaceapp/predictions/audit_log.py
+import atexit
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+
+from .result_cache import row_hashes
+
+
+def input_digest(X):
+    """sha256 over the per-row content hashes of an upload"""
+    return hashlib.sha256(np.ascontiguousarray(row_hashes(X)).tobytes()).hexdigest()
+
+
+def summarize_result(labels):
+    """Short result string for LogUserPredict.result (max 45 chars)"""
+    if len(labels) == 1:
+        return str(labels[0])[:45]
+    unique = np.unique(labels)
+    if len(unique) == 1:
+        return f"All: {unique[0]}"[:45]
+    return f"{len(labels)} predictions"
+
+
+def summary_metrics(labels, predicted_prob):
+    """Aggregates stored instead of the per-row confidence list"""
+    classes, counts = np.unique(labels, return_counts=True)
+    predicted_prob = np.asarray(predicted_prob, dtype=np.float64)
+    return {
+        'prediction_counts': {str(c): int(n) for c, n in zip(classes.tolist(), counts.tolist())},
+        'mean_confidence': round(float(predicted_prob.mean()), 6) if len(predicted_prob) else None,
+        'min_confidence': round(float(predicted_prob.min()), 6) if len(predicted_prob) else None,
+        'total_predictions': int(len(labels)),
+        'timestamp': datetime.now().isoformat(),
+    }
+
+
+class _Pending:
+    """Compact payload of one request; df is kept only until it is spilled"""
+    __slots__ = ("user_id", "model_id", "data", "metrics", "result", "df", "queued")
+
+    def __init__(self, user_id, model_id, data, metrics, result, df=None):
+        self.user_id = user_id
+        self.model_id = model_id
+        self.data = data
+        self.metrics = metrics
+        self.result = result
+        self.df = df
+        self.queued = time.monotonic()
+
+
+class PredictionLogWriter:
+    """Buffers LogUserPredict records and writes them with bulk_create from a background thread.
+
+    Requests only append a compact record to an in-memory buffer. The writer thread flushes
+    it once max_records are queued or the oldest record has waited
+    max_delay_seconds, whichever comes first. Each row stores a compact
+    payload (input hash, row/column counts, class counts, confidence
+    summary), computed when the request is recorded; the full input is only
+    kept, and written to a compressed CSV under spill_dir, when one is
+    configured, named by its hash so repeats are stored once.
+    """
+
+    def __init__(self, max_records=500, max_delay_seconds=2.0, spill_dir=None, spill_compression="gzip"):
+        self.max_records = max_records
+        self.max_delay = max_delay_seconds
+        self.spill_dir = spill_dir
+        self.spill_compression = spill_compression
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._thread = None
+        self._flush_lock = threading.Lock()
+
+        self.queued = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.spilled = 0
+        self.last_error = None
+
+    def record(self, ml_model_instance, user, df, labels, predicted_prob):
+        """Queue one prediction request for logging; returns immediately"""
+        if user is None or not user.is_authenticated:
+            # LogUserPredict.idUser is required
+            return
+        # The buffer holds only the summary; the frame itself is kept just long enough to spill it
+        data = {
+            'input_sha256': input_digest(df),
+            'rows': int(len(df)),
+            'columns': int(df.shape[1]),
+        }
+        pending = _Pending(
+            user.pk, ml_model_instance.pk, data,
+            metrics=summary_metrics(labels, predicted_prob),
+            result=summarize_result(labels),
+            df=df if self.spill_dir else None,
+        )
+        with self._cond:
+            self._ensure_thread()
+            self._buffer.append(pending)
+            self.queued += 1
+            if len(self._buffer) >= self.max_records:
+                self._cond.notify()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if len(self._buffer) >= self.max_records:
+                        break
+                    if self._buffer:
+                        remaining = self._buffer[0].queued + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; also called at interpreter exit"""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            try:
+                from .models import LogUserPredict
+                LogUserPredict.objects.bulk_create(
+                    [self._build(LogUserPredict, pending) for pending in batch],
+                    batch_size=self.max_records,
+                )
+                self.written += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                self.last_error = str(e)
+                print(f"⚠️ Could not write {len(batch)} prediction logs: {e}")
+            finally:
+                self.flushes += 1
+                close_old_connections()
+            return len(batch)
+
+    def _build(self, model_class, pending):
+        data = dict(pending.data, spill=None)
+        if pending.df is not None:
+            data['spill'] = self._spill(pending.df, data['input_sha256'])
+            pending.df = None
+        return model_class(
+            data=data,
+            metrics=pending.metrics,
+            result=pending.result,
+            idUser_id=pending.user_id,
+            idModel_id=pending.model_id,
+        )
+
+    def _spill(self, df, digest):
+        if not self.spill_dir:
+            return None
+        extension = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz", "zstd": ".zst"}.get(self.spill_compression, "")
+        path = os.path.join(self.spill_dir, digest[:2], f"{digest}.csv{extension}")
+        try:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                df.to_csv(tmp_path, compression=self.spill_compression)
+                os.replace(tmp_path, path)
+                self.spilled += 1
+        except OSError as e:
+            self.last_error = str(e)
+            return None
+        return os.path.relpath(path, self.spill_dir)
+
+    def stats(self):
+        with self._cond:
+            buffered = len(self._buffer)
+        return {
+            "buffered": buffered,
+            "queued": self.queued,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "spilled": self.spilled,
+            "max_records": self.max_records,
+            "max_delay_seconds": self.max_delay,
+            "last_error": self.last_error,
+        }
+
+
+_log_options = getattr(settings, "PREDICTION_LOG", {})
+log_writer = None
+if _log_options.get("ENABLED", True):
+    log_writer = PredictionLogWriter(
+        max_records=_log_options.get("MAX_RECORDS", 500),
+        max_delay_seconds=_log_options.get("MAX_DELAY_SECONDS", 2.0),
+        spill_dir=_log_options.get("SPILL_DIR") or None,
+        spill_compression=_log_options.get("SPILL_COMPRESSION", "gzip"),
+    )
+    atexit.register(log_writer.flush)
@@ -0,0 +1,101 @@
+# spaceapp/predictions/coalescer.py
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+
+class _Batch:
+    def __init__(self):
+        self.parts = []
+        self.rows = 0
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class PredictionCoalescer:
+    """Merge concurrent predict_proba calls for the same model into one batched call.
+
+    The first request for a model opens a batch and waits up to max_wait_ms
+    (or until max_rows rows are queued); every request arriving meanwhile joins
+    it. The ensemble then runs once and each caller gets back its own slice.
+    """
+
+    def __init__(self, max_wait_ms=5, max_rows=1024):
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_rows = max_rows
+        self._cond = threading.Condition()
+        self._open = {}
+
+        self.batches = 0
+        self.requests = 0
+
+    def predict_proba(self, key, model, X):
+        # DataFrames (projections with categorical columns) are batched with frames of the same columns
+        if isinstance(X, pd.DataFrame):
+            key = (key, tuple(X.columns))
+        else:
+            X = np.asarray(X)
+            key = (key, X.shape[1])
+
+        with self._cond:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            position = len(batch.parts)
+            batch.parts.append(X)
+            batch.rows += len(X)
+            self.requests += 1
+            if batch.rows >= self.max_rows:
+                self._cond.notify_all()
+
+            if leader:
+                deadline = time.monotonic() + self.max_wait
+                while batch.rows < self.max_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                # Later requests start a new batch from here on
+                del self._open[key]
+                self.batches += 1
+
+        if leader:
+            try:
+                rows = pd.concat(batch.parts, ignore_index=True) if isinstance(X, pd.DataFrame) \
+                    else np.vstack(batch.parts)
+                probabilities = np.asarray(model.predict_proba(rows))
+                bounds = np.cumsum([len(part) for part in batch.parts])[:-1]
+                batch.results = np.split(probabilities, bounds)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[position]
+
+    def stats(self):
+        with self._cond:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_rows": self.max_rows,
+            }
+
+
+_coalescer_options = getattr(settings, "PREDICTION_COALESCER", {})
+coalescer = None
+if _coalescer_options.get("ENABLED", False):
+    coalescer = PredictionCoalescer(
+        max_wait_ms=_coalescer_options.get("MAX_WAIT_MS", 5),
+        max_rows=_coalescer_options.get("MAX_ROWS", 1024),
+    )
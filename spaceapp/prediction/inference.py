@@ -0,0 +1,112 @@
+# spaceapp/predictions/inference.py
+import numpy as np
+import pandas as pd
+
+from utils.feature_schema import FeatureProjection
+
+# Map numerical predictions to string labels
+LABEL_MAP = {
+    0: "FALSE POSITIVE",
+    1: "CANDIDATE",
+    2: "CONFIRMED"
+}
+
+
+class NamedColumnsModel:
+    """Lets a pipeline fitted on a DataFrame accept arrays in its training column order"""
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = list(model.feature_names_in_)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _frame(self, X):
+        if isinstance(X, pd.DataFrame):
+            return X
+        return pd.DataFrame(np.asarray(X), columns=self.columns).infer_objects()
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(self._frame(X))
+
+    def predict(self, X):
+        return self.model.predict(self._frame(X))
+
+
+def accept_arrays(model):
+    """Wrap models that select their input columns by name"""
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and all(isinstance(name, str) for name in names):
+        return NamedColumnsModel(model)
+    return model
+
+
+def get_projection(ml_model_instance):
+    """FeatureProjection of the schema recorded at training time, or None for older models"""
+    schema = getattr(ml_model_instance, "featureSchema", None)
+    return FeatureProjection(schema) if schema else None
+
+
+def model_input(df, projection=None):
+    """Rows in the model's training layout when its schema is known, positional otherwise"""
+    return projection.project(df) if projection is not None else df.values
+
+
+def class_labels(model, n_classes):
+    """String label for each column of the model's predict_proba output"""
+    classes = getattr(model, "classes_", None)
+    if classes is None:
+        classes = np.arange(n_classes)
+    return np.array([LABEL_MAP.get(c, str(c)) for c in classes.tolist()], dtype=object)
+
+
+def predict_frame(model, X, predict_proba=None):
+    """Run the model once with predict_proba and derive labels by argmax.
+
+    Returns (labels, predicted_probability, probabilities, class_names); the
+    ensemble is evaluated a single time instead of predict + predict_proba.
+    predict_proba can replace model.predict_proba (e.g. to go through the coalescer).
+    """
+    probabilities = np.asarray((predict_proba or model.predict_proba)(X))
+    predicted = probabilities.argmax(axis=1)
+    class_names = class_labels(model, probabilities.shape[1])
+    predicted_prob = probabilities[np.arange(len(predicted)), predicted]
+    return class_names[predicted], predicted_prob, probabilities, class_names
+
+
+def format_percentages(values):
+    """Vectorized equivalent of f"{value:.2%}" """
+    return np.char.mod("%.2f%%", np.asarray(values, dtype=np.float64) * 100)
+
+
+def build_predictions(index, labels, predicted_prob):
+    """Assemble the per-row response records from whole columns"""
+    names = pd.Index(index).astype(str).tolist()
+    percentages = format_percentages(predicted_prob).tolist()
+    return [
+        {"name": name, "prediction": label, "probability": probability}
+        for name, label, probability in zip(names, labels.tolist(), percentages)
+    ]
+
+
+def build_response(df, model, include_probabilities=False, predict_proba=None, projection=None, on_predicted=None):
+    """Prediction response payload for a DataFrame of KOI rows.
+
+    on_predicted(labels, predicted_prob) is called once the model has run (e.g. to log the request).
+    """
+    labels, predicted_prob, probabilities, class_names = predict_frame(
+        model, model_input(df, projection), predict_proba
+    )
+    if on_predicted is not None:
+        on_predicted(labels, predicted_prob)
+    response = {
+        'predictions': build_predictions(df.index, labels, predicted_prob),
+        'total_predictions': len(labels),
+        'message': 'Prediction successful'
+    }
+    if include_probabilities:
+        # Full per-class matrix, rows aligned with 'predictions'
+        response['classes'] = class_names.tolist()
+        response['probabilities'] = probabilities.round(6).tolist()
+    return response
@@ -0,0 +1,112 @@
+# spaceapp/predictions/jobs.py
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from utils.cpu_budget import cpu_allotment, submit_job
+from utils.worker_pool import get_pool, worker_alive, worker_id
+from .inference import build_predictions, get_projection, model_input, predict_frame
+from .models import PredictionJob
+from .streaming import encode_records, iter_csv_chunks
+
+
+def get_executor():
+    """Local worker pool for batch predictions, sized independently of HTTP workers"""
+    return get_pool('prediction', getattr(settings, 'PREDICTION_JOB_WORKERS', 2))
+
+
+def submit_prediction_job(job):
+    """Queue a saved PredictionJob once its row is committed; it starts when the CPU budget allows"""
+    job_id = str(job.idJob)
+    transaction.on_commit(lambda: submit_job(get_executor(), 'prediction', run_prediction_job, job_id))
+
+
+def recover_prediction_jobs(executor=None):
+    """Pick up the jobs a stopped server left behind; returns (failed, resubmitted).
+
+    Running jobs whose worker process is gone are marked failed (their
+    partial results cannot be resumed) and queued jobs are submitted again.
+    A queued job submitted twice still runs once: run_prediction_job only
+    starts jobs it moves out of the queued status itself.
+    """
+    failed = 0
+    running = PredictionJob.objects.filter(status=PredictionJob.STATUS_RUNNING)
+    for job_id, worker in running.values_list('idJob', 'worker'):
+        if not worker_alive(worker):
+            failed += PredictionJob.objects.filter(
+                idJob=job_id, status=PredictionJob.STATUS_RUNNING, worker=worker
+            ).update(
+                status=PredictionJob.STATUS_FAILED,
+                error="Prediction interrupted: its worker process stopped",
+                dateFinished=timezone.now(),
+            )
+    queued = [str(job_id) for job_id in
+              PredictionJob.objects.filter(status=PredictionJob.STATUS_QUEUED).values_list('idJob', flat=True)]
+    executor = executor or (get_executor() if queued else None)
+    for job_id in queued:
+        submit_job(executor, 'prediction', run_prediction_job, job_id)
+    return failed, len(queued)
+
+
+def count_rows(file):
+    """Cheap row count (newlines minus header) used for progress reporting"""
+    lines = 0
+    last = b"\n"
+    with file.open('rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def run_prediction_job(job_id, cpus=None):
+    """Worker entry point: predict the job's input chunk by chunk within cpus threads, tracking progress"""
+    from .model_cache import model_cache
+
+    close_old_connections()
+    jobs = PredictionJob.objects.filter(idJob=job_id)
+    # Claimed atomically: a job submitted again after a restart runs once
+    if not jobs.filter(status=PredictionJob.STATUS_QUEUED).update(
+        status=PredictionJob.STATUS_RUNNING, dateStarted=timezone.now(), worker=worker_id()
+    ):
+        close_old_connections()
+        return
+    job = jobs.select_related('idModel').get()
+
+    try:
+        with cpu_allotment(cpus):
+            jobs.update(rowsTotal=count_rows(job.inputFile))
+            model = model_cache.get(job.idModel)
+            projection = get_projection(job.idModel)
+
+            chunk_size = getattr(settings, 'PREDICTION_STREAM_CHUNK_ROWS', 10000)
+            extension = 'csv' if job.outputFormat == 'csv' else 'ndjson'
+            job.resultFile.save(f"{job_id}.{extension}", ContentFile(b""), save=False)
+
+            rows_done = 0
+            with job.inputFile.open('rb') as source, open(job.resultFile.path, 'w', newline='') as result:
+                for index, chunk in enumerate(iter_csv_chunks(source, chunk_size, projection)):
+                    labels, predicted_prob, _, _ = predict_frame(model, model_input(chunk, projection))
+                    records = build_predictions(chunk.index, labels, predicted_prob)
+                    result.write(encode_records(records, job.outputFormat, header=(index == 0)))
+                    rows_done += len(records)
+                    jobs.update(rowsDone=rows_done)
+
+            jobs.update(
+                status=PredictionJob.STATUS_FINISHED,
+                resultFile=job.resultFile.name,
+                rowsDone=rows_done,
+                rowsTotal=rows_done,
+                dateFinished=timezone.now(),
+            )
+    except Exception as e:
+        jobs.update(
+            status=PredictionJob.STATUS_FAILED,
+            error=f"Prediction failed: {str(e)}",
+            dateFinished=timezone.now(),
+        )
+    finally:
+        close_old_connections()
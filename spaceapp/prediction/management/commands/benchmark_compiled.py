@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from utils.compiled_pipeline import compare_latency, compile_pipeline
+from utils.testing import fit_stacking_pipeline, make_k2_like_frame
+
+
+class Command(BaseCommand):
+    help = "Compare predict_proba latency of a fitted stacking pipeline and its NumPy-compiled version"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=600, help="Rows of the synthetic training table")
+        parser.add_argument("--estimators", type=int, default=100, help="Trees per ensemble of the stacking model")
+        parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+        parser.add_argument("--repeat", type=int, default=5, help="Timed calls per batch size (median is shown)")
+
+    def handle(self, *args, rows=600, estimators=100, batch_sizes=(1, 10, 100, 1000), repeat=5, **options):
+        pipe, X = fit_stacking_pipeline(make_k2_like_frame(n_rows=rows), n_estimators=estimators)
+        results = compare_latency(pipe, compile_pipeline(pipe), X, batch_sizes=batch_sizes, repeat=repeat)
+        for size, timing in results.items():
+            self.stdout.write(
+                f"batch={size:>5}  sklearn={timing['sklearn'] * 1000:8.2f} ms  "
+                f"compiled={timing['compiled'] * 1000:8.2f} ms  x{timing['speedup']:.1f}"
+            )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from utils.feature_engineering import benchmark_feature_engineering
+
+
+class Command(BaseCommand):
+    help = "Time the fused FeatureEngineer against the row-wise pandas feature engineering"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Rows of the synthetic table")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per version (best is shown)")
+
+    def handle(self, *args, rows=1_000_000, repeat=3, **options):
+        results = benchmark_feature_engineering(n_rows=rows, repeat=repeat)
+        self.stdout.write(
+            f"rows={results['n_rows']}  fused={results['fused']['ns_per_row']:.1f} ns/row  "
+            f"pandas={results['pandas']['ns_per_row']:.1f} ns/row  x{results['speedup']:.1f}"
+        )
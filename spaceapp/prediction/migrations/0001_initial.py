@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:02
+
+import django.db.models.deletion
+import utils.content_store
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('train', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogUserPredict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datePrediction', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField()),
+                ('metrics', models.JSONField(blank=True, null=True)),
+                ('result', models.CharField(max_length=45)),
+                ('idModel', models.ForeignKey(db_column='idModel', on_delete=django.db.models.deletion.CASCADE, to='train.mlmodel')),
+                ('idUser', models.ForeignKey(db_column='idUser', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'LogUserPredict',
+            },
+        ),
+        migrations.CreateModel(
+            name='PredictionJob',
+            fields=[
+                ('idJob', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='Id')),
+                ('dateCreate', models.DateTimeField(auto_now_add=True, verbose_name='Date Created')),
+                ('dateStarted', models.DateTimeField(blank=True, null=True, verbose_name='Date Started')),
+                ('dateFinished', models.DateTimeField(blank=True, null=True, verbose_name='Date Finished')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('finished', 'Finished'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('outputFormat', models.CharField(default='csv', max_length=10)),
+                ('inputFile', models.FileField(storage=utils.content_store.ContentAddressedStorage(), upload_to='files/predictions/inputs/', verbose_name='Input')),
+                ('resultFile', models.FileField(blank=True, null=True, upload_to='files/predictions/results/', verbose_name='Result')),
+                ('rowsDone', models.PositiveIntegerField(default=0)),
+                ('rowsTotal', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('idModel', models.ForeignKey(db_column='idModel', on_delete=django.db.models.deletion.CASCADE, to='train.mlmodel')),
+            ],
+            options={
+                'db_table': 'PredictionJob',
+            },
+        ),
+    ]
@@ -0,0 +1,244 @@
+# spaceapp/predictions/model_cache.py
+import mmap
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+from django.conf import settings
+
+from utils.compiled_pipeline import CompileError, compile_pipeline
+from .inference import accept_arrays
+from .shared_artifacts import load_shared_model, mapped_memory, process_memory, shared_artifact_path
+
+
+def compile_if_supported(model):
+    """Swap a fitted sklearn pipeline for its NumPy-compiled equivalent when possible"""
+    try:
+        return compile_pipeline(model)
+    except CompileError:
+        return model
+
+
+# Shared by every model (classes, functions, modules, dtypes): not part of its size
+_NOT_WALKED = (type, types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.ModuleType, np.dtype)
+
+
+def _is_mapped(array):
+    """True for arrays backed by a memory-mapped file (pages shared through the page cache)"""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def model_nbytes(model):
+    """Private in-memory size of a loaded model: the array buffers it holds plus its small objects.
+
+    Walks the object graph (attributes, containers and the __getstate__ of
+    extension types such as sklearn's Tree) instead of pickling the whole
+    model on every load. Arrays mapped from a shared artifact are not
+    counted: every worker process shares their pages.
+    """
+    # id -> object: holding the temporary states keeps their ids from being reused
+    total, seen, stack = 0, {}, [model]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, np.ndarray):
+            # Views count their owner's buffer, once
+            while isinstance(obj.base, np.ndarray):
+                obj = obj.base
+            if id(obj) in seen:
+                continue
+            seen[id(obj)] = obj
+            if obj.dtype.hasobject:
+                stack.extend(obj.ravel().tolist())
+            if not _is_mapped(obj):
+                total += obj.nbytes
+            continue
+        if id(obj) in seen or isinstance(obj, _NOT_WALKED):
+            continue
+        seen[id(obj)] = obj
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append(vars(obj))
+        elif not isinstance(obj, (str, bytes, int, float, complex, bool, np.generic)):
+            # Extension types keep their arrays out of __dict__
+            try:
+                state = obj.__getstate__()
+            except (AttributeError, TypeError):
+                continue
+            if isinstance(state, dict):
+                stack.append(state)
+    return total
+
+
+class ModelCache:
+    """Process-wide LRU cache of fitted models, keyed by idModel + artifact mtime/size"""
+
+    def __init__(self, max_entries=8, max_bytes=512 * 1024 * 1024, loader=None, shared_dir=None,
+                 compile=False):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # With a shared_dir, models are loaded from an uncompressed copy mapped
+        # read-only, so all worker processes share one copy in the page cache
+        self.shared_dir = shared_dir
+        # Compiled pipelines keep every fitted array as plain numpy, so unlike
+        # sklearn trees they stay mapped instead of being copied on load
+        self.compile = compile
+        self.suffix = ".compiled" if compile else ""
+        if loader is None:
+            loader = self._load
+        self.loader = loader
+
+        # idModel -> {"signature": (mtime_ns, size), "path": str, "model": ..., "nbytes": int}
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _load(self, path):
+        prepare = compile_if_supported if self.compile else None
+        if self.shared_dir:
+            model = load_shared_model(path, self.shared_dir, prepare=prepare, suffix=self.suffix)
+        else:
+            model = joblib.load(path)
+            model = prepare(model) if prepare else model
+        # Inputs arrive as arrays in the training column order (see FeatureProjection)
+        return accept_arrays(model)
+
+    @staticmethod
+    def artifact_signature(path):
+        """(mtime_ns, size) of the artifact; changes whenever the file is replaced"""
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, ml_model_instance):
+        """Return the fitted model for an MLModel row, loading it on a miss"""
+        key = str(ml_model_instance.idModel)
+        path = ml_model_instance.artifact_path()
+        signature = self.artifact_signature(path)
+
+        model = self._lookup(key, signature)
+        if model is not None:
+            return model
+
+        # Only one thread loads a given model; the others wait and then hit
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            model = self._lookup(key, signature, count_miss=False)
+            if model is not None:
+                return model
+            try:
+                model = self.loader(path)
+                # The artifact is usually compressed: its size on disk understates the loaded model
+                self._store(key, signature, path, model, nbytes=model_nbytes(model))
+            finally:
+                with self._lock:
+                    # Late waiters keep their reference; the next miss creates a fresh lock
+                    if self._load_locks.get(key) is load_lock:
+                        del self._load_locks[key]
+        return model
+
+    def _lookup(self, key, signature, count_miss=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["signature"] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["model"]
+            if entry is not None:
+                # The artifact on disk changed under us: drop the stale copy
+                self._drop(key)
+                self.invalidations += 1
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def _store(self, key, signature, path, model, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if nbytes > self.max_bytes:
+                # Too big to keep around; the caller still gets the model
+                return
+            self._entries[key] = {"signature": signature, "path": path, "model": model, "nbytes": nbytes}
+            self._total_bytes += nbytes
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry["nbytes"]
+
+    def invalidate(self, model_id):
+        """Forget a model, e.g. when its MLModel row is replaced or deleted"""
+        with self._lock:
+            if str(model_id) in self._entries:
+                self._drop(str(model_id))
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "models": list(self._entries.keys()),
+            }
+
+    def memory_report(self):
+        """Resident vs shared memory of each cached model's mapped artifact"""
+        with self._lock:
+            entries = [(key, entry["path"]) for key, entry in self._entries.items()]
+
+        models = {}
+        for key, path in entries:
+            report = {"mmap": bool(self.shared_dir)}
+            if self.shared_dir:
+                try:
+                    shared_path = shared_artifact_path(path, self.shared_dir, self.suffix)
+                    report.update(mapped_memory(shared_path) or {})
+                except OSError:
+                    pass
+            models[key] = report
+        return {"process": process_memory(), "models": models}
+
+
+_cache_options = getattr(settings, "PREDICTION_MODEL_CACHE", {})
+model_cache = ModelCache(
+    max_entries=_cache_options.get("MAX_ENTRIES", 8),
+    max_bytes=_cache_options.get("MAX_BYTES", 512 * 1024 * 1024),
+    shared_dir=_cache_options.get("SHARED_DIR") if _cache_options.get("MMAP", False) else None,
+    compile=_cache_options.get("COMPILE", False),
+)
@@ -1,6 +1,8 @@
 # spaceapp/predictions/models.py
 from django.db import models
 from django.conf import settings
+from utils.content_store import blob_storage
+import uuid
 
 class LogUserPredict(models.Model):
     datePrediction = models.DateTimeField(auto_now_add=True)
@@ -22,4 +24,43 @@ class LogUserPredict(models.Model):
         db_table = 'LogUserPredict'
 
     def __str__(self):
-        return f"Prediction {self.id} by User {self.idUser_id}"
\ No newline at end of file
+        return f"Prediction {self.id} by User {self.idUser_id}"
+
+
+class PredictionJob(models.Model):
+    """Batch prediction over an uploaded file, run on the local worker pool"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_FINISHED = 'finished'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_FINISHED, 'Finished'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    idJob = models.UUIDField("Id", primary_key=True, default=uuid.uuid4, editable=False)
+    dateCreate = models.DateTimeField("Date Created", auto_now_add=True)
+    dateStarted = models.DateTimeField("Date Started", null=True, blank=True)
+    dateFinished = models.DateTimeField("Date Finished", null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    outputFormat = models.CharField(max_length=10, default='csv')
+    inputFile = models.FileField("Input", upload_to="files/predictions/inputs/", storage=blob_storage)
+    resultFile = models.FileField("Result", upload_to="files/predictions/results/", null=True, blank=True)
+    rowsDone = models.PositiveIntegerField(default=0)
+    rowsTotal = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    # host:pid of the worker process running the job (see jobs.recover_prediction_jobs)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    idModel = models.ForeignKey(
+        'train.MLModel',
+        on_delete=models.CASCADE,
+        db_column='idModel'
+    )
+
+    class Meta:
+        db_table = 'PredictionJob'
+
+    def __str__(self):
+        return f"Prediction job {self.idJob} ({self.status})"
@@ -0,0 +1,190 @@
+# spaceapp/predictions/result_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+
+def row_hashes(X):
+    """64-bit content hash of every normalized input row (numeric values compared as float64)"""
+    if isinstance(X, pd.DataFrame):
+        # Projected rows with categorical columns: only the numeric columns are cast
+        numeric = [c for c in X.columns if pd.api.types.is_numeric_dtype(X[c])]
+        frame = X.astype({c: np.float64 for c in numeric})
+    else:
+        frame = pd.DataFrame(X)
+        try:
+            frame = frame.astype(np.float64)
+        except (TypeError, ValueError):
+            pass
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def take_rows(X, positions):
+    """Rows of an array or DataFrame by position"""
+    return X.iloc[positions] if isinstance(X, pd.DataFrame) else X[positions]
+
+
+class _Segment:
+    """Rows computed by one inference call: unique row hashes + their probabilities"""
+
+    def __init__(self, keys, probabilities):
+        self.keys = pd.Index(keys)
+        self.probabilities = probabilities
+        self.created = time.monotonic()
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class PredictionResultCache:
+    """Per-row prediction results keyed by (model id, artifact hash, row content hash).
+
+    Repeat uploads are answered without inference, and a partially overlapping
+    upload only runs the model on the rows not seen yet. Entries are grouped
+    in segments (one per inference call) that expire after ttl_seconds and are
+    evicted least-recently-used once more than max_rows rows are stored.
+    """
+
+    def __init__(self, max_rows=1000000, ttl_seconds=3600):
+        self.max_rows = max_rows
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        # (model_id, artifact_hash, columns) -> OrderedDict[segment_id -> _Segment], LRU order
+        self._segments = OrderedDict()
+        self._digests = {}
+        self._rows = 0
+        self._next_id = 0
+
+        self.hit_rows = 0
+        self.miss_rows = 0
+        self.evictions = 0
+
+    def artifact_digest(self, path):
+        """sha256 of a model artifact, memoized per (path, mtime, size)"""
+        stat = os.stat(path)
+        memo_key = (str(path), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, "rb") as handle:
+                for block in iter(lambda: handle.read(1024 * 1024), b""):
+                    sha.update(block)
+            digest = self._digests[memo_key] = sha.hexdigest()
+        return digest
+
+    def cache_key(self, ml_model_instance, columns):
+        return (
+            str(ml_model_instance.idModel),
+            self.artifact_digest(ml_model_instance.artifact_path()),
+            tuple(str(c) for c in columns),
+        )
+
+    def predict_proba(self, key, X, predict_proba):
+        """predict_proba through the cache: only uncached rows reach the model.
+
+        DataFrames (projections with categorical columns) stay DataFrames, so
+        the model never sees an object array it has to re-infer dtypes from.
+        """
+        if not isinstance(X, pd.DataFrame):
+            X = np.asarray(X)
+        hashes = row_hashes(X)
+        result = None
+        missing = np.ones(len(hashes), dtype=bool)
+
+        with self._lock:
+            self._expire()
+            segments = self._segments.get(key)
+            if segments is not None:
+                self._segments.move_to_end(key)
+                for segment_id in list(segments):
+                    segment = segments[segment_id]
+                    todo = np.flatnonzero(missing)
+                    if len(todo) == 0:
+                        break
+                    positions = segment.keys.get_indexer(hashes[todo])
+                    found = positions >= 0
+                    if not found.any():
+                        continue
+                    if result is None:
+                        result = np.empty((len(hashes), segment.probabilities.shape[1]))
+                    result[todo[found]] = segment.probabilities[positions[found]]
+                    missing[todo[found]] = False
+                    segments.move_to_end(segment_id)
+
+            todo = np.flatnonzero(missing)
+            self.hit_rows += len(hashes) - len(todo)
+            self.miss_rows += len(todo)
+
+        if len(todo) == 0:
+            return result
+
+        # Duplicate rows inside the upload are predicted once
+        unique_hashes, first, inverse = np.unique(hashes[todo], return_index=True, return_inverse=True)
+        computed = np.asarray(predict_proba(take_rows(X, todo[first])))
+        if result is None:
+            result = np.empty((len(hashes), computed.shape[1]))
+        result[todo] = computed[inverse]
+        self._store(key, unique_hashes, computed)
+        return result
+
+    def _store(self, key, hashes, probabilities):
+        with self._lock:
+            segments = self._segments.setdefault(key, OrderedDict())
+            self._segments.move_to_end(key)
+            segments[self._next_id] = _Segment(hashes, probabilities)
+            self._next_id += 1
+            self._rows += len(hashes)
+            while self._rows > self.max_rows and self._segments:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        key, segments = next(iter(self._segments.items()))
+        _, segment = segments.popitem(last=False)
+        self._rows -= len(segment)
+        self.evictions += 1
+        if not segments:
+            del self._segments[key]
+
+    def _expire(self):
+        if not self.ttl:
+            return
+        deadline = time.monotonic() - self.ttl
+        for key in list(self._segments):
+            segments = self._segments[key]
+            for segment_id in [i for i, s in segments.items() if s.created < deadline]:
+                self._rows -= len(segments.pop(segment_id))
+                self.evictions += 1
+            if not segments:
+                del self._segments[key]
+
+    def invalidate(self, model_id):
+        """Drop every cached result of a model, e.g. after it is retrained"""
+        with self._lock:
+            for key in [k for k in self._segments if k[0] == str(model_id)]:
+                self._rows -= sum(len(s) for s in self._segments.pop(key).values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rows": self._rows,
+                "max_rows": self.max_rows,
+                "ttl_seconds": self.ttl,
+                "hit_rows": self.hit_rows,
+                "miss_rows": self.miss_rows,
+                "evictions": self.evictions,
+            }
+
+
+_result_cache_options = getattr(settings, "PREDICTION_RESULT_CACHE", {})
+result_cache = None
+if _result_cache_options.get("ENABLED", True):
+    result_cache = PredictionResultCache(
+        max_rows=_result_cache_options.get("MAX_ROWS", 1000000),
+        ttl_seconds=_result_cache_options.get("TTL_SECONDS", 3600),
+    )
@@ -1,37 +1,82 @@
 # spaceapp/predictions/serializers.py
 from rest_framework import serializers
-from .models import LogUserPredict
+from .models import LogUserPredict, PredictionJob
+from .inference import get_projection
+from utils.tabular_io import read_table
 import pandas as pd
 import json
-import os
-from pathlib import Path
 
 class PredictionSerializer(serializers.Serializer):
     model_id = serializers.UUIDField(required=True)
     csv_data = serializers.FileField(required=True)
+    # Also return the full per-class probability matrix
+    include_probabilities = serializers.BooleanField(required=False, default=False)
     
     def validate_csv_data(self, value):
-        # Validate CSV file
+        # The upload (CSV, Parquet, Feather or Arrow IPC) is parsed straight from the
+        # request in validate(); large ones are already spooled by Django to a
+        # uniquely named temporary file that is removed when the request ends
+        return value
+
+    def validate(self, attrs):
+        # Parse only the columns the model was trained on, with their recorded dtypes;
+        # columnar uploads are converted from Arrow without a text parse
+        from train.models import MLModel
+        ml_model_instance = MLModel.objects.filter(idModel=attrs['model_id']).only('featureSchema').first()
+        projection = get_projection(ml_model_instance)
+        read_kwargs = projection.read_csv_kwargs() if projection is not None else {}
         try:
-            temp_dir = Path('../tempdata')
-            temp_dir.mkdir(exist_ok=True)
-            
-            # Create temporary file path
-            temp_file_path = temp_dir / value.name
-
-                # Save uploaded file to temporary location
-            with open(temp_file_path, 'wb+') as destination:
-                for chunk in value.chunks():
-                    destination.write(chunk)
-            
-            df = pd.read_csv(temp_file_path, index_col="kepler_name")
+            df = read_table(attrs['csv_data'], index_col="kepler_name", **read_kwargs)
             df = df.rename(lambda x: "No name registered" if pd.isna(x) else x)
+        except Exception as e:
+            raise serializers.ValidationError({"csv_data": f"Invalid data file: {str(e)}"})
+        attrs['csv_data'] = df
+        attrs['projection'] = projection
+        return attrs
+
+class PredictionStreamSerializer(serializers.Serializer):
+    model_id = serializers.UUIDField(required=True)
+    csv_data = serializers.FileField(required=True)
+    output_format = serializers.ChoiceField(choices=["ndjson", "csv"], required=False, default="ndjson")
+    chunk_size = serializers.IntegerField(required=False, min_value=1, max_value=1000000)
+
+    @staticmethod
+    def csv_columns(value):
+        """Column names of an uploaded CSV, read from its header only"""
+        columns = pd.read_csv(value, nrows=0).columns
+        value.seek(0)
+        return columns
+
+    def validate_csv_data(self, value):
+        # Only the header is checked here; rows are parsed chunk by chunk while streaming
+        try:
+            columns = self.csv_columns(value)
         except Exception as e:
             raise serializers.ValidationError(f"Invalid CSV file: {str(e)}")
-        return df
+        if "kepler_name" not in columns:
+            raise serializers.ValidationError("Invalid CSV file: missing 'kepler_name' column")
+        return value
 
 class LogUserPredictSerializer(serializers.ModelSerializer):
     class Meta:
         model = LogUserPredict
         fields = '__all__'
-        read_only_fields = ('datePrediction',)
\ No newline at end of file
+        read_only_fields = ('datePrediction',)
+
+class PredictionJobCreateSerializer(PredictionStreamSerializer):
+    output_format = serializers.ChoiceField(choices=["csv", "ndjson"], required=False, default="csv")
+    chunk_size = None
+
+class PredictionJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PredictionJob
+        fields = ('idJob', 'idModel', 'status', 'outputFormat', 'rowsDone', 'rowsTotal', 'progress',
+                  'error', 'dateCreate', 'dateStarted', 'dateFinished')
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        if not obj.rowsTotal:
+            return 1.0 if obj.status == PredictionJob.STATUS_FINISHED else 0.0
+        return round(min(obj.rowsDone / obj.rowsTotal, 1.0), 4)
@@ -0,0 +1,101 @@
+# spaceapp/predictions/shared_artifacts.py
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+import joblib
+import psutil
+
+
+def shared_artifact_path(source_path, shared_dir, suffix=""):
+    """Deterministic location of the memory-mappable copy of a model artifact.
+
+    The name embeds the source mtime/size, so every worker process resolves the
+    same file for the same artifact and a replaced artifact gets a new copy.
+    """
+    stat = os.stat(source_path)
+    prefix = hashlib.sha1(str(Path(source_path).resolve()).encode()).hexdigest()[:16]
+    return Path(shared_dir) / f"{prefix}-{stat.st_mtime_ns}-{stat.st_size}{suffix}.joblib"
+
+
+def export_shared_artifact(model, path):
+    """Dump a fitted model uncompressed so its numpy arrays can be mapped read-only.
+
+    joblib stores each array as a raw aligned buffer when compress=0; the file is
+    written under a temporary name and renamed so concurrent workers never see a
+    partial artifact.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        joblib.dump(model, tmp_path, compress=0)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
+
+def load_shared_model(source_path, shared_dir, prepare=None, suffix=""):
+    """Load a model through its shared copy with mmap_mode="r", creating it on first use.
+
+    prepare(model) may convert the unpickled model before it is exported, e.g.
+    into a compiled pipeline whose arrays all stay mapped instead of copied.
+    """
+    path = shared_artifact_path(source_path, shared_dir, suffix)
+    if not path.exists():
+        model = joblib.load(source_path)
+        export_shared_artifact(prepare(model) if prepare else model, path)
+        # Copies made for older versions of the same artifact are no longer used
+        for stale in path.parent.glob(f"{path.name.split('-')[0]}-*.joblib"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    return joblib.load(path, mmap_mode="r")
+
+
+def mapped_memory(path):
+    """Resident/shared/private bytes of this process' mappings of one artifact file.
+
+    Read from /proc/self/smaps, so it is only available on Linux; returns None elsewhere.
+    """
+    smaps = Path("/proc/self/smaps")
+    if not smaps.exists():
+        return None
+
+    target = str(Path(path).resolve())
+    totals = {"rss": 0, "pss": 0, "shared": 0, "private": 0}
+    in_target = False
+    with open(smaps) as handle:
+        for line in handle:
+            fields = line.split()
+            if not fields:
+                continue
+            if not fields[0].endswith(":"):
+                # Mapping header: "start-end perms offset dev inode [pathname]"
+                in_target = len(fields) >= 6 and fields[5] == target
+                continue
+            if not in_target or len(fields) != 3 or fields[2] != "kB":
+                continue
+            name, value = fields[0], int(fields[1]) * 1024
+            if name == "Rss:":
+                totals["rss"] += value
+            elif name == "Pss:":
+                totals["pss"] += value
+            elif name in ("Shared_Clean:", "Shared_Dirty:"):
+                totals["shared"] += value
+            elif name in ("Private_Clean:", "Private_Dirty:"):
+                totals["private"] += value
+    return totals
+
+
+def process_memory():
+    """Whole-process resident vs unique/proportional memory"""
+    info = psutil.Process().memory_full_info()
+    return {
+        "rss": info.rss,
+        "uss": getattr(info, "uss", None),
+        "pss": getattr(info, "pss", None),
+        "shared": getattr(info, "shared", None),
+    }
@@ -0,0 +1,16 @@
+# spaceapp/predictions/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from train.models import MLModel
+from .model_cache import model_cache
+from .result_cache import result_cache
+
+
+@receiver(post_save, sender=MLModel)
+@receiver(post_delete, sender=MLModel)
+def invalidate_cached_model(sender, instance, **kwargs):
+    """Drop the cached fitted model and its cached results whenever its MLModel row is replaced or deleted"""
+    model_cache.invalidate(instance.idModel)
+    if result_cache is not None:
+        result_cache.invalidate(instance.idModel)
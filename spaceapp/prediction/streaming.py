@@ -0,0 +1,54 @@
+# spaceapp/predictions/streaming.py
+import json
+
+import pandas as pd
+
+from .inference import build_predictions, model_input, predict_frame
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+CSV_CONTENT_TYPE = "text/csv"
+
+
+def iter_csv_chunks(file, chunk_size, projection=None):
+    """Read an uploaded KOI CSV in bounded row chunks instead of one DataFrame"""
+    file.seek(0)
+    read_kwargs = projection.read_csv_kwargs() if projection is not None else {}
+    for chunk in pd.read_csv(file, index_col="kepler_name", chunksize=chunk_size, **read_kwargs):
+        yield chunk.rename(lambda x: "No name registered" if pd.isna(x) else x)
+
+
+def encode_records(records, output_format="ndjson", header=True):
+    """Serialize prediction records as NDJSON lines or CSV rows"""
+    if output_format == "csv":
+        return pd.DataFrame.from_records(
+            records, columns=["name", "prediction", "probability"]
+        ).to_csv(index=False, header=header)
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+def stream_predictions(model, chunks, output_format="ndjson", predict_proba=None, projection=None):
+    """Run inference chunk by chunk and yield encoded result lines.
+
+    Only one chunk is held in memory at a time, and the first rows are sent
+    before the rest of the upload has been parsed.
+    """
+    total = 0
+    try:
+        for index, chunk in enumerate(chunks):
+            labels, predicted_prob, _, _ = predict_frame(model, model_input(chunk, projection), predict_proba)
+            records = build_predictions(chunk.index, labels, predicted_prob)
+            total += len(records)
+            yield encode_records(records, output_format, header=(index == 0))
+    except Exception as e:
+        # Headers are already sent, so the failure is reported in-band
+        if output_format == "csv":
+            yield f"# error: Prediction failed: {str(e)}\n"
+        else:
+            yield json.dumps({"error": f"Prediction failed: {str(e)}"}) + "\n"
+        return
+
+    if output_format == "csv":
+        if total == 0:
+            yield "name,prediction,probability\n"
+    else:
+        yield json.dumps({"total_predictions": total, "message": "Prediction successful"}) + "\n"
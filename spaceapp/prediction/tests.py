@@ -1,3 +1,639 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+import numpy as np
+import pandas as pd
+
+import joblib
+from sklearn.ensemble import RandomForestClassifier, AdaBoostClassifier
+from sklearn.linear_model import LogisticRegression
+
+from accounts.models import User
+from prediction.audit_log import PredictionLogWriter, input_digest
+from prediction.coalescer import PredictionCoalescer
+from prediction.inference import accept_arrays, build_response
+from prediction.jobs import recover_prediction_jobs, run_prediction_job
+from prediction.model_cache import ModelCache, compile_if_supported, model_nbytes
+from prediction.result_cache import PredictionResultCache
+from prediction.shared_artifacts import load_shared_model, shared_artifact_path
+from prediction.models import LogUserPredict, PredictionJob
+from train.models import MLModel
+from utils.k2_source import build_model, build_pipeline, build_preprocessor
+from utils.feature_engineering import FeatureEngineer, _legacy_engineer
+from utils.compiled_pipeline import CompileError, compile_pipeline
+from utils.feature_schema import FeatureProjection, build_feature_schema
+from utils.cpu_budget import CpuScheduler, cpu_allotment, limit_request_threads
+from utils.testing import RecordingExecutor, fit_stacking_pipeline, make_k2_like_frame
+from utils.worker_pool import worker_id
+
+
+class CompiledPipelineEquivalenceTests(SimpleTestCase):
+    """The NumPy engine must reproduce pipe.predict_proba"""
+
+    def assert_equivalent(self, pipe, X):
+        compiled = compile_pipeline(pipe)
+        np.testing.assert_allclose(compiled.predict_proba(X), pipe.predict_proba(X), atol=1e-9)
+        np.testing.assert_array_equal(compiled.predict(X), pipe.predict(X))
+
+    def test_multiclass_stacking_pipeline(self):
+        pipe, X = fit_stacking_pipeline(make_k2_like_frame())
+        self.assert_equivalent(pipe, X)
+
+    def test_binary_stacking_pipeline(self):
+        pipe, X = fit_stacking_pipeline(make_k2_like_frame(n_classes=2, seed=1))
+        self.assert_equivalent(pipe, X)
+
+    def test_unseen_categories_and_missing_values(self):
+        pipe, X = fit_stacking_pipeline(make_k2_like_frame(seed=2))
+        X = X.copy()
+        X.loc[X.index[:20], "disc_facility"] = "Unseen observatory"
+        X.loc[X.index[20:40], "st_teff"] = np.nan
+        self.assert_equivalent(pipe, X)
+
+    def test_positional_numpy_input(self):
+        pipe, X = fit_stacking_pipeline(make_k2_like_frame(seed=3))
+        compiled = compile_pipeline(pipe)
+        np.testing.assert_allclose(compiled.predict_proba(X.to_numpy()), pipe.predict_proba(X), atol=1e-9)
+
+    def test_larger_than_one_block(self):
+        pipe, X = fit_stacking_pipeline(make_k2_like_frame(n_rows=5000, seed=4), n_estimators=5)
+        self.assert_equivalent(pipe, X)
+
+    def test_bare_estimators(self):
+        rng = np.random.default_rng(5)
+        X = rng.normal(size=(400, 6))
+        y = rng.integers(0, 3, 400)
+        for estimator in (
+            RandomForestClassifier(n_estimators=10, random_state=0),
+            AdaBoostClassifier(n_estimators=10, random_state=0),
+            LogisticRegression(max_iter=500),
+        ):
+            self.assert_equivalent(estimator.fit(X, y), X)
+
+    def test_unsupported_model_raises(self):
+        from sklearn.svm import SVC
+        rng = np.random.default_rng(6)
+        with self.assertRaises(CompileError):
+            compile_pipeline(SVC(probability=True).fit(rng.normal(size=(50, 3)), rng.integers(0, 2, 50)))
+
+
+class FeatureEngineerTests(SimpleTestCase):
+    """The fused transformer must match the row-wise pandas feature engineering"""
+
+    def test_matches_pandas_version(self):
+        X = make_k2_like_frame(n_rows=2000, seed=7).drop(columns=["disposition"])
+        X.loc[X.index[:50], "disc_locale"] = np.nan
+        X.loc[X.index[50:60], "disc_locale"] = "SPACE"
+        expected = _legacy_engineer(X)
+        engineered = FeatureEngineer().fit_transform(X)
+        for column in ("planets_per_star", "moons_per_planet", "discovery_age", "space_based"):
+            self.assertEqual(engineered[column].dtype, np.float32)
+            np.testing.assert_allclose(engineered[column], expected[column].astype(np.float64), rtol=1e-6)
+
+    def test_prediction_uses_training_features(self):
+        pipe, X = fit_stacking_pipeline(make_k2_like_frame(seed=8))
+        self.assertEqual(list(pipe.feature_names_in_), list(X.columns))
+        self.assertNotIn("planets_per_star", X.columns)
+        # Inputs with stale derived columns get them recomputed
+        stale = X.assign(planets_per_star=-1.0)
+        np.testing.assert_allclose(pipe.predict_proba(stale), pipe.predict_proba(X))
+
+
+class PredictionLogWriterTests(TestCase):
+    """Buffered audit records keep only their summary, not the request's DataFrame"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="astro@example.com", password="x")
+        self.ml_model = MLModel.objects.create(name="model", filePath="files/datasets/k2.csv",
+                                               parameters="files/models/parameters.json")
+        self.df = make_k2_like_frame(n_rows=40, seed=15).drop(columns=["disposition"])
+        self.labels = np.array(["CONFIRMED"] * 30 + ["CANDIDATE"] * 10)
+        self.prob = np.linspace(0.5, 0.9, 40)
+
+    def test_buffer_holds_summary_only(self):
+        writer = PredictionLogWriter(max_records=100, max_delay_seconds=3600)
+        writer.record(self.ml_model, self.user, self.df, self.labels, self.prob)
+        self.assertIsNone(writer._buffer[0].df)
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(writer._buffer, [])
+
+        log = LogUserPredict.objects.get()
+        self.assertEqual(log.data, {"input_sha256": input_digest(self.df), "rows": 40,
+                                    "columns": self.df.shape[1], "spill": None})
+        self.assertEqual(log.metrics["prediction_counts"], {"CANDIDATE": 10, "CONFIRMED": 30})
+        self.assertEqual(log.result, "40 predictions")
+
+    def test_spill_keeps_frame_until_written(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            writer = PredictionLogWriter(max_records=100, max_delay_seconds=3600, spill_dir=spill_dir)
+            writer.record(self.ml_model, self.user, self.df, self.labels, self.prob)
+            pending = writer._buffer[0]
+            self.assertIs(pending.df, self.df)
+            writer.flush()
+            self.assertIsNone(pending.df)
+            spill = LogUserPredict.objects.get().data["spill"]
+            self.assertEqual(len(pd.read_csv(f"{spill_dir}/{spill}", index_col=0)), 40)
+
+
+class BuildResponseTests(SimpleTestCase):
+    """One predict_proba pass answers exactly what predict + predict_proba used to"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        df = make_k2_like_frame(n_rows=300, seed=9)
+        # Integer labels, as the models /predict was written for
+        df["disposition"] = df["disposition"].map({"FALSE POSITIVE": 0, "CANDIDATE": 1, "CONFIRMED": 2})
+        pipe, X = fit_stacking_pipeline(df, n_estimators=10)
+        cls.model = accept_arrays(pipe)
+        cls.schema = build_feature_schema(X)
+        cls.df = X.iloc[:40].set_axis([f"K2-{i} b" for i in range(40)])
+
+    def legacy_predictions(self):
+        """The response rows as PredictionViewSet.predict built them before build_response"""
+        predictions = self.model.predict(self.df.values)
+        probabilities = self.model.predict_proba(self.df.values)
+        label_map = {0: "FALSE POSITIVE", 1: "CANDIDATE", 2: "CONFIRMED"}
+        return [{"name": str(self.df.index[i]), "prediction": label_map[pred], "probability": f"{prob[pred]:.2%}"}
+                for i, (pred, prob) in enumerate(zip(predictions, probabilities))]
+
+    def test_matches_predict_and_predict_proba(self):
+        calls = []
+        response = build_response(self.df, self.model, on_predicted=lambda *args: calls.append(args))
+        self.assertEqual(response["predictions"], self.legacy_predictions())
+        self.assertEqual(response["total_predictions"], 40)
+        self.assertEqual(response["message"], "Prediction successful")
+        self.assertNotIn("probabilities", response)
+        self.assertEqual(len(calls), 1)
+        # The projected (named, typed) input gives the same answer as the positional one
+        projected = build_response(self.df, self.model, projection=FeatureProjection(self.schema))
+        self.assertEqual(projected["predictions"], response["predictions"])
+
+    def test_include_probabilities(self):
+        response = build_response(self.df, self.model, include_probabilities=True)
+        self.assertEqual(response["classes"], ["FALSE POSITIVE", "CANDIDATE", "CONFIRMED"])
+        probabilities = np.array(response["probabilities"])
+        np.testing.assert_allclose(probabilities, self.model.predict_proba(self.df.values), atol=5e-7)
+        labels = [response["classes"][i] for i in probabilities.argmax(axis=1)]
+        self.assertEqual(labels, [row["prediction"] for row in self.legacy_predictions()])
+
+
+class _Artifact:
+    """Stands in for an MLModel row whose fitted pipeline is already on disk"""
+
+    def __init__(self, id_model, path):
+        self.idModel = id_model
+        self.path = path
+
+    def artifact_path(self):
+        return self.path
+
+
+class ModelCacheTests(SimpleTestCase):
+    """Cached models are accounted at their loaded size and leave no load locks behind"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.pipe, _ = fit_stacking_pipeline(make_k2_like_frame(n_rows=300, seed=1))
+        self.path = os.path.join(self.tmp.name, "model.joblib")
+        joblib.dump(self.pipe, self.path, compress=3)
+
+    def test_bytes_measure_the_loaded_model(self):
+        cache = ModelCache(loader=joblib.load)
+        cache.get(_Artifact(1, self.path))
+        nbytes = cache.stats()["bytes"]
+        expected = model_nbytes(self.pipe)
+        self.assertAlmostEqual(nbytes, expected, delta=expected * 0.05)
+        self.assertGreater(nbytes, os.path.getsize(self.path))
+
+    def test_mapped_arrays_are_not_private_bytes(self):
+        in_memory = model_nbytes(compile_pipeline(self.pipe))
+        cache = ModelCache(shared_dir=os.path.join(self.tmp.name, "shared"), compile=True)
+        cache.get(_Artifact(1, self.path))
+        # Only the small objects around the mapped arrays are this process' own
+        self.assertLess(cache.stats()["bytes"], in_memory * 0.2)
+        # Trees are copied out of the mapping by sklearn, so they still count
+        sklearn_cache = ModelCache(shared_dir=os.path.join(self.tmp.name, "shared"))
+        sklearn_cache.get(_Artifact(1, self.path))
+        self.assertGreater(sklearn_cache.stats()["bytes"], in_memory)
+
+    def test_load_locks_are_released(self):
+        cache = ModelCache(loader=joblib.load)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            models = list(executor.map(lambda i: cache.get(_Artifact(i % 2, self.path)), range(8)))
+        self.assertEqual(cache._load_locks, {})
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertIs(models[0], models[2])
+
+
+def _arrays(obj, seen=None):
+    """Every numpy array reachable from obj's attributes, lists and dicts"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        yield obj
+        return
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    elif hasattr(obj, "__dict__"):
+        values = vars(obj).values()
+    else:
+        return
+    for value in values:
+        yield from _arrays(value, seen)
+
+
+class SharedArtifactTests(SimpleTestCase):
+    """Workers map one uncompressed copy of each artifact instead of unpickling their own"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.pipe, self.X = fit_stacking_pipeline(make_k2_like_frame(n_rows=300, seed=1))
+        self.path = os.path.join(self.tmp.name, "model.joblib")
+        joblib.dump(self.pipe, self.path, compress=3)
+        self.shared_dir = os.path.join(self.tmp.name, "shared")
+
+    def load(self):
+        return load_shared_model(self.path, self.shared_dir, prepare=compile_if_supported, suffix=".compiled")
+
+    def test_arrays_stay_mapped(self):
+        for model in (self.load(), self.load()):
+            large = [array for array in _arrays(model) if array.nbytes >= 1024]
+            self.assertTrue(large)
+            for array in large:
+                self.assertIsInstance(array, np.memmap)
+                self.assertFalse(array.flags.writeable)
+            np.testing.assert_allclose(model.predict_proba(self.X), self.pipe.predict_proba(self.X), atol=1e-9)
+
+    def test_copy_is_reused_until_the_artifact_changes(self):
+        self.load()
+        shared = shared_artifact_path(self.path, self.shared_dir, ".compiled")
+        written = os.stat(shared)
+        self.load()
+        self.assertEqual((os.stat(shared).st_ino, os.stat(shared).st_mtime_ns), (written.st_ino, written.st_mtime_ns))
+        self.assertEqual(os.listdir(self.shared_dir), [shared.name])
+
+        # A replaced artifact gets a new copy and the stale one is removed
+        os.utime(self.path, ns=(written.st_mtime_ns + 10 ** 9, written.st_mtime_ns + 10 ** 9))
+        self.load()
+        replaced = shared_artifact_path(self.path, self.shared_dir, ".compiled")
+        self.assertNotEqual(replaced, shared)
+        self.assertEqual(os.listdir(self.shared_dir), [replaced.name])
+
+    def test_memory_report(self):
+        cache = ModelCache(shared_dir=self.shared_dir, compile=True)
+        # Mapped pages are only read in by inference
+        cache.get(_Artifact(1, self.path)).predict_proba(self.X)
+        report = cache.memory_report()
+        self.assertEqual(set(report), {"process", "models"})
+        self.assertEqual(set(report["process"]), {"rss", "uss", "pss", "shared"})
+        self.assertGreater(report["process"]["rss"], 0)
+        model = report["models"]["1"]
+        self.assertTrue(model["mmap"])
+        if os.path.exists("/proc/self/smaps"):
+            self.assertEqual(set(model), {"mmap", "rss", "pss", "shared", "private"})
+            self.assertGreater(model["rss"], 0)
+
+
+class PredictionResultCacheTests(SimpleTestCase):
+    """Only rows not seen with the same artifact reach the model, and the answers are unchanged"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "model.joblib")
+        with open(self.path, "wb") as handle:
+            handle.write(b"version 1")
+        rng = np.random.default_rng(21)
+        self.X = rng.normal(size=(50, 4))
+        self.calls = []
+
+    def model(self, X):
+        self.calls.append(len(X))
+        scores = np.column_stack([X[:, 0], X[:, 1]])
+        return np.exp(scores) / np.exp(scores).sum(axis=1, keepdims=True)
+
+    def test_repeat_and_overlapping_uploads(self):
+        cache = PredictionResultCache()
+        key = cache.cache_key(_Artifact(1, self.path), ["a", "b", "c", "d"])
+        np.testing.assert_allclose(cache.predict_proba(key, self.X, self.model), self.model(self.X))
+        expected = self.model(self.X[::-1])
+        self.calls.clear()
+        np.testing.assert_allclose(cache.predict_proba(key, self.X[::-1], self.model), expected)
+        self.assertEqual(self.calls, [])
+
+        new_rows = np.vstack([self.X[:10], self.X[40:] + 1, self.X[40:] + 1])
+        expected = self.model(new_rows)
+        self.calls.clear()
+        np.testing.assert_allclose(cache.predict_proba(key, new_rows, self.model), expected)
+        # 10 cached rows; the 10 new ones (each sent twice) are predicted once
+        self.assertEqual(self.calls, [10])
+        self.assertEqual(cache.stats()["rows"], 60)
+
+    def test_replaced_artifact_and_eviction(self):
+        cache = PredictionResultCache(max_rows=60)
+        key = cache.cache_key(_Artifact(1, self.path), ["a", "b", "c", "d"])
+        cache.predict_proba(key, self.X, self.model)
+        with open(self.path, "wb") as handle:
+            handle.write(b"version 2, retrained")
+        new_key = cache.cache_key(_Artifact(1, self.path), ["a", "b", "c", "d"])
+        self.assertNotEqual(new_key, key)
+        self.calls.clear()
+        cache.predict_proba(new_key, self.X, self.model)
+        self.assertEqual(self.calls, [50])
+        # The older model's segment went over max_rows and was evicted
+        self.assertEqual((cache.stats()["rows"], cache.stats()["evictions"]), (50, 1))
+        cache.invalidate(1)
+        self.assertEqual(cache.stats()["rows"], 0)
+
+    def test_dataframes_reach_the_model_as_dataframes(self):
+        frame = pd.DataFrame({"a": self.X[:, 0], "b": self.X[:, 1], "facility": ["K2", "TESS"] * 25})
+        seen = []
+
+        def model(X):
+            seen.append(X)
+            return self.model(X[["a", "b"]].to_numpy())
+
+        cache = PredictionResultCache()
+        key = cache.cache_key(_Artifact(1, self.path), frame.columns)
+        np.testing.assert_allclose(cache.predict_proba(key, frame, model), self.model(self.X))
+        # Same numbers, one unseen category: only those rows are predicted, still typed per column
+        repeat = pd.concat([frame.iloc[:10], frame.iloc[:5].assign(facility="JWST")])
+        np.testing.assert_allclose(cache.predict_proba(key, repeat, model), self.model(self.X[[*range(10), *range(5)]]))
+        self.assertEqual([len(X) for X in seen], [50, 5])
+        self.assertIsInstance(seen[1], pd.DataFrame)
+        self.assertEqual([str(dtype) for dtype in seen[1].dtypes], ["float64", "float64", "object"])
+        self.assertEqual(list(seen[1]["facility"]), ["JWST"] * 5)
+
+
+class _BatchRecorder:
+    """Model whose probabilities are the first column and its negation, recording each batch"""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_proba(self, X):
+        self.batches.append(X)
+        values = X.iloc[:, 0].to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)[:, 0]
+        return np.column_stack([values, -values])
+
+
+class PredictionCoalescerTests(SimpleTestCase):
+    """Concurrent requests share one predict_proba call and each gets back its own rows"""
+
+    def submit_together(self, coalescer, model, inputs):
+        with ThreadPoolExecutor(max_workers=len(inputs)) as pool:
+            futures = [pool.submit(coalescer.predict_proba, "model", model, X) for X in inputs]
+            return [future.result(timeout=10) for future in futures]
+
+    def test_dataframes_are_batched_as_one_frame(self):
+        model = _BatchRecorder()
+        frames = [pd.DataFrame({"a": [1.0, 2.0, 3.0], "facility": ["K2", "TESS", "JWST"]}),
+                  pd.DataFrame({"a": [4.0, 5.0], "facility": ["K2", None]})]
+        coalescer = PredictionCoalescer(max_wait_ms=5000, max_rows=5)
+        results = self.submit_together(coalescer, model, frames)
+        for frame, result in zip(frames, results):
+            np.testing.assert_array_equal(result[:, 0], frame["a"].to_numpy())
+        self.assertEqual(len(model.batches), 1)
+        self.assertIsInstance(model.batches[0], pd.DataFrame)
+        self.assertEqual([str(dtype) for dtype in model.batches[0].dtypes], ["float64", "object"])
+
+    def test_concurrent_requests_get_their_own_rows(self):
+        model = _BatchRecorder()
+        sizes = [1, 4, 2, 3]
+        starts = np.cumsum([0] + sizes[:-1])
+        inputs = [np.arange(start, start + size, dtype=float).reshape(-1, 1) * 10 for start, size in zip(starts, sizes)]
+        coalescer = PredictionCoalescer(max_wait_ms=5000, max_rows=sum(sizes))
+        results = self.submit_together(coalescer, model, inputs)
+        for X, result in zip(inputs, results):
+            np.testing.assert_array_equal(result, np.column_stack([X[:, 0], -X[:, 0]]))
+        self.assertEqual([len(batch) for batch in model.batches], [sum(sizes)])
+        self.assertEqual(coalescer.stats()["requests"], 4)
+        self.assertEqual(coalescer.stats()["batches"], 1)
+
+    def test_max_rows_closes_a_batch(self):
+        model = _BatchRecorder()
+        coalescer = PredictionCoalescer(max_wait_ms=60000, max_rows=3)
+        started = time.monotonic()
+        result = coalescer.predict_proba("model", model, np.ones((5, 2)))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(result.shape, (5, 2))
+        # The next request opens a new batch
+        coalescer.predict_proba("model", model, np.ones((3, 2)))
+        self.assertEqual([len(batch) for batch in model.batches], [5, 3])
+
+    def test_max_wait_closes_a_batch(self):
+        model = _BatchRecorder()
+        coalescer = PredictionCoalescer(max_wait_ms=50, max_rows=1000)
+        started = time.monotonic()
+        coalescer.predict_proba("model", model, np.ones((1, 2)))
+        elapsed = time.monotonic() - started
+        self.assertGreaterEqual(elapsed, 0.045)
+        self.assertLess(elapsed, 5)
+        self.assertEqual(coalescer.stats()["batches"], 1)
+
+    def test_errors_reach_every_waiter(self):
+        class Failing:
+            def predict_proba(self, X):
+                raise ValueError("model exploded")
+
+        coalescer = PredictionCoalescer(max_wait_ms=5000, max_rows=6)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(coalescer.predict_proba, "model", Failing(), np.ones((2, 2))) for _ in range(3)]
+            for future in futures:
+                with self.assertRaisesRegex(ValueError, "model exploded"):
+                    future.result(timeout=10)
+        # No batch is left open for the next request
+        result = coalescer.predict_proba("model", _BatchRecorder(), np.ones((6, 2)))
+        self.assertEqual(result.shape, (6, 2))
+
+
+class PredictionJobRecoveryTests(TestCase):
+    """Jobs left queued or running by a stopped server are not stuck forever"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.ml_model = MLModel.objects.create(name="model", filePath="files/datasets/k2.csv",
+                                               parameters="files/models/parameters.json")
+
+    def create_job(self, **fields):
+        return PredictionJob.objects.create(idModel=self.ml_model,
+                                            inputFile=SimpleUploadedFile("rows.csv", b"a\n1\n"), **fields)
+
+    def test_recovery(self):
+        queued = self.create_job()
+        # A pid no process of this host can have (above pid_max)
+        host = worker_id().rsplit(":", 1)[0]
+        orphaned = self.create_job(status=PredictionJob.STATUS_RUNNING, worker=f"{host}:99999999")
+        alive = self.create_job(status=PredictionJob.STATUS_RUNNING, worker=worker_id())
+        remote = self.create_job(status=PredictionJob.STATUS_RUNNING, worker="other-host:1")
+        executor = RecordingExecutor()
+        self.assertEqual(recover_prediction_jobs(executor), (1, 1))
+        self.assertEqual(executor.job_ids, [str(queued.idJob)])
+        statuses = {job.idJob: job.status for job in PredictionJob.objects.all()}
+        self.assertEqual(statuses, {
+            queued.idJob: PredictionJob.STATUS_QUEUED,
+            orphaned.idJob: PredictionJob.STATUS_FAILED,
+            alive.idJob: PredictionJob.STATUS_RUNNING,
+            remote.idJob: PredictionJob.STATUS_RUNNING,
+        })
+
+    def test_job_submitted_twice_runs_once(self):
+        job = self.create_job()
+        # Claimed by another server's worker meanwhile
+        PredictionJob.objects.filter(idJob=job.idJob).update(status=PredictionJob.STATUS_RUNNING,
+                                                             worker="other-host:1")
+        run_prediction_job(str(job.idJob))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.rowsTotal), (PredictionJob.STATUS_RUNNING, "other-host:1", None))
+
+
+class CpuSchedulerTests(SimpleTestCase):
+    """Jobs never hold more CPUs than the budget; the rest wait in submission order"""
+
+    def test_jobs_queue_when_budget_is_used(self):
+        scheduler = CpuScheduler(total=3)
+        gate = threading.Event()
+        running, peak, order = [], [], []
+        lock = threading.Lock()
+
+        def job(name, cpus=None):
+            with lock:
+                running.append(cpus)
+                peak.append(sum(running))
+                order.append(name)
+            gate.wait(5)
+            with lock:
+                running.remove(cpus)
+            return name, cpus
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [scheduler.submit(executor, cpus, job, name)
+                       for name, cpus in (("a", 2), ("b", 2), ("c", 1), ("d", 8))]
+            self.assertEqual(scheduler.stats()["waiting"], 3)
+            gate.set()
+            results = [f.result(5) for f in futures]
+        self.assertEqual(results, [("a", 2), ("b", 2), ("c", 1), ("d", 3)])
+        self.assertLessEqual(max(peak), 3)
+        self.assertEqual(order, ["a", "b", "c", "d"])
+        self.assertEqual(scheduler.stats()["in_use"], 0)
+
+    def test_allotment_sets_joblib_and_blas_limits(self):
+        from joblib import effective_n_jobs
+        from threadpoolctl import threadpool_info
+        with cpu_allotment(2):
+            self.assertEqual(effective_n_jobs(None), 2)
+            self.assertTrue(all(pool["num_threads"] <= 2 for pool in threadpool_info()))
+        self.assertEqual(effective_n_jobs(None), 1)
+
+    @override_settings(CPU_BUDGET={"REQUEST_THREADS": 2})
+    def test_request_threads_cap_the_whole_process(self):
+        from threadpoolctl import threadpool_info, threadpool_limits
+        original = threadpool_limits(limits=None)
+        self.addCleanup(original.restore_original_limits)
+        self.assertEqual(limit_request_threads(), 2)
+        # Set once, not per call: the cap outlives the function
+        self.assertTrue(all(pool["num_threads"] <= 2 for pool in threadpool_info()))
+
+
+class _ServedModelTestCase(TestCase):
+    """A small stacking model registered as an MLModel under a temporary MEDIA_ROOT"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.pipe, X = fit_stacking_pipeline(make_k2_like_frame(n_rows=300, seed=7), n_estimators=5)
+        os.makedirs(os.path.join(media.name, "files", "models"))
+        joblib.dump(self.pipe, os.path.join(media.name, "files", "models", "model.joblib"))
+        self.ml_model = MLModel.objects.create(name="model", filePath="files/datasets/k2.csv",
+                                               parameters="files/models/parameters.json",
+                                               modelFile="files/models/model.joblib",
+                                               featureSchema=build_feature_schema(X))
+        self.rows = X.iloc[:20].assign(kepler_name=[f"K2-{i} b" for i in range(20)])
+
+
+class PredictionViewTests(_ServedModelTestCase):
+    """Uploads to /predict are parsed in memory, so same-named uploads never share a file"""
+
+    def post(self, rows):
+        upload = SimpleUploadedFile("rows.csv", rows.to_csv(index=False).encode())
+        response = self.client.post(reverse("predict"), {"model_id": str(self.ml_model.idModel), "csv_data": upload})
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.data["predictions"]]
+
+    def test_uploads_are_not_written_to_disk(self):
+        tempdata = os.path.join(os.pardir, "tempdata")
+        existed = os.path.exists(tempdata)
+        self.assertEqual(self.post(self.rows.iloc[:12]), self.rows["kepler_name"].iloc[:12].tolist())
+        self.assertEqual(self.post(self.rows.iloc[12:]), self.rows["kepler_name"].iloc[12:].tolist())
+        self.assertEqual(os.path.exists(tempdata), existed)
+
+
+class PredictionStreamViewTests(_ServedModelTestCase):
+    """Large uploads come back chunk by chunk, with the same predictions as the whole-file path"""
+
+    def post(self, rows, **data):
+        upload = SimpleUploadedFile("rows.csv", rows.to_csv(index=False).encode())
+        response = self.client.post(reverse("predict_stream"), {
+            "model_id": str(self.ml_model.idModel), "csv_data": upload, "chunk_size": 7, **data
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def expected(self):
+        # The upload as a whole-file read_csv sees it (missing categories come back as NaN)
+        X = pd.read_csv(io.StringIO(self.rows.to_csv(index=False)), index_col="kepler_name")
+        labels = self.pipe.predict(X).tolist()
+        probabilities = [f"{p:.2%}" for p in self.pipe.predict_proba(X).max(axis=1)]
+        return [{"name": name, "prediction": label, "probability": probability}
+                for name, label, probability in zip(X.index, labels, probabilities)]
+
+    def test_ndjson_in_several_chunks(self):
+        response, body = self.post(self.rows)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(lines[:-1], self.expected())
+        self.assertEqual(lines[-1], {"total_predictions": 20, "message": "Prediction successful"})
+
+    def test_csv_in_several_chunks(self):
+        response, body = self.post(self.rows, output_format="csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(body.count("name,prediction,probability"), 1)
+        df = pd.read_csv(io.StringIO(body))
+        self.assertEqual(df.to_dict("records"), self.expected())
+
+    def test_error_after_the_headers_is_reported_in_the_body(self):
+        rows = self.rows.astype({"pl_rade": object})
+        rows.iloc[10, rows.columns.get_loc("pl_rade")] = "not a number"
+        _, body = self.post(rows)
+        lines = [json.loads(line) for line in body.splitlines()]
+        # The first chunk was already sent; the failing one ends the stream without a summary
+        self.assertEqual(lines[:-1], self.expected()[:7])
+        self.assertTrue(lines[-1]["error"].startswith("Prediction failed:"))
+
+        _, body = self.post(rows, output_format="csv")
+        self.assertTrue(body.splitlines()[-1].startswith("# error: Prediction failed:"))
+        self.assertEqual(len(body.splitlines()), 1 + 7 + 1)
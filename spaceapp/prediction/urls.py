@@ -4,4 +4,10 @@ from .views import PredictionViewSet
 
 urlpatterns = [
     path('api/v1/predict/', PredictionViewSet.as_view({'post': 'predict'}), name='predict'),
+    path('api/v1/predict/stream/', PredictionViewSet.as_view({'post': 'predict_stream'}), name='predict_stream'),
+    path('api/v1/jobs/', PredictionViewSet.as_view({'post': 'submit_job'}), name='prediction_job_submit'),
+    path('api/v1/jobs/<uuid:pk>/', PredictionViewSet.as_view({'get': 'job_status'}), name='prediction_job_status'),
+    path('api/v1/jobs/<uuid:pk>/result/', PredictionViewSet.as_view({'get': 'job_result'}), name='prediction_job_result'),
+    path('api/v1/model-cache/', PredictionViewSet.as_view({'get': 'model_cache_stats'}), name='model_cache_stats'),
+    path('api/v1/model-cache/memory/', PredictionViewSet.as_view({'get': 'model_cache_memory'}), name='model_cache_memory'),
 ]
\ No newline at end of file
@@ -11,7 +11,21 @@ import joblib
 import numpy as np
 from datetime import datetime
 from .models import LogUserPredict
-from .serializers import PredictionSerializer, LogUserPredictSerializer
+from .models import PredictionJob
+from .serializers import (
+    PredictionSerializer, PredictionStreamSerializer, LogUserPredictSerializer,
+    PredictionJobCreateSerializer, PredictionJobSerializer
+)
+from .jobs import submit_prediction_job
+from .model_cache import model_cache
+from .inference import build_response, get_projection
+from .coalescer import coalescer
+from .result_cache import result_cache
+from .audit_log import log_writer
+from .streaming import CSV_CONTENT_TYPE, NDJSON_CONTENT_TYPE, iter_csv_chunks, stream_predictions
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 
@@ -33,7 +47,7 @@ class PredictionViewSet(viewsets.ModelViewSet):
             model_id = validated_data['model_id']
             csv_data_list = validated_data['csv_data']
 
-            print(csv_data_list.shape)          # Get the model instance from train app - UPDATED REFERENCE
+            # Get the model instance from train app - UPDATED REFERENCE
             from train.models import MLModel  # Changed from Model to MLModel
             try:
                 ml_model_instance = MLModel.objects.get(idModel=model_id)  # Changed variable name for clarity
@@ -45,65 +59,29 @@ class PredictionViewSet(viewsets.ModelViewSet):
             
             # Step 2: Load ML model and make predictions
             
-            # Load the trained model from filePath
+            # Load the trained model artifact (served from the process-wide cache)
             try:
-                # Note: filePath is a FileField, so use .path to get the file system path
-                model = joblib.load(ml_model_instance.filePath.path)
+                model = model_cache.get(ml_model_instance)
             except Exception as e:
                 return Response(
                     {"error": f"Failed to load model: {str(e)}"}, 
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
-            # Make predictions
-            predictions = model.predict(csv_data_list.values)
-
-
-            # NEW: Get prediction probabilities and map to labels
-            # Get probabilities for each class
-            probabilities = model.predict_proba(csv_data_list.values)
-            
-            # Map numerical predictions to string labels
-            label_map = {
-                0: "FALSE POSITIVE",
-                1: "CANDIDATE", 
-                2: "CONFIRMED"
-            }
-            
-            # Prepare the response data using the index from csv_data_list
-            response_data = []
-            for i, (pred, prob) in enumerate(zip(predictions, probabilities)):
-                # Get the predicted class probability (max probability for the predicted class)
-                predicted_prob = prob[pred]  # Probability of the predicted class
-                
-                response_data.append({
-                    "name": str(csv_data_list.index[i]),  # Use the actual index from csv_data_list
-                    "prediction": label_map[pred],
-                    "probability": f"{predicted_prob:.2%}"  # Format as percentage with 2 decimal places
-                })
-            
-            # # Calculate metrics
-            # metrics = self.calculate_metrics(model, df, predictions)
-            
-            # # Convert predictions to string result
-            # result = self.format_predictions(predictions)
-            
-            # # Step 3: Store prediction log
-            # prediction_log = LogUserPredict.objects.create(
-            #     data=df.to_dict(orient='records'),
-            #     metrics=metrics,
-            #     result=result,
-            #     idUser=request.user,
-            #     idModel=ml_model_instance  # This should now work
-            # )
+            # Single predict_proba pass; labels come from its argmax and the
+            # response rows are assembled column-wise
+            projection = validated_data.get('projection')
+            columns = projection.columns if projection is not None else csv_data_list.columns
+            predict_proba = self.get_predict_proba(ml_model_instance, model, columns)
+            response = build_response(
+                csv_data_list,
+                model,
+                include_probabilities=validated_data.get('include_probabilities', False),
+                predict_proba=predict_proba,
+                projection=projection,
+                on_predicted=self.get_log_callback(request, ml_model_instance, csv_data_list)
+            )
             
-            # Prepare response
-            response = {
-                'predictions': response_data,
-                'total_predictions': len(predictions),
-                'message': 'Prediction successful'  
-            }
-
             return Response(response, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -112,6 +90,129 @@ class PredictionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def get_log_callback(self, request, ml_model_instance, df):
+        """Step 3: store the prediction log through the buffered bulk writer"""
+        if log_writer is None:
+            return None
+        return lambda labels, predicted_prob: log_writer.record(
+            ml_model_instance, request.user, df, labels, predicted_prob
+        )
+
+    def get_predict_proba(self, ml_model_instance, model, columns):
+        """model.predict_proba routed through the result cache and the coalescer"""
+        predict_proba = model.predict_proba
+        if coalescer is not None:
+            # Concurrent small requests for this model share one batched call
+            model_key = str(ml_model_instance.idModel)
+            predict_proba = lambda X: coalescer.predict_proba(model_key, model, X)
+        if result_cache is not None:
+            # Rows already predicted with this exact artifact skip inference
+            key = result_cache.cache_key(ml_model_instance, columns)
+            uncached_predict_proba = predict_proba
+            predict_proba = lambda X: result_cache.predict_proba(key, X, uncached_predict_proba)
+        return predict_proba
+
+    @action(detail=False, methods=['post'])
+    def predict_stream(self, request):
+        """Chunked prediction for large uploads, streamed back as NDJSON or CSV"""
+        serializer = PredictionStreamSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = serializer.validated_data
+        from train.models import MLModel
+        try:
+            ml_model_instance = MLModel.objects.get(idModel=validated_data['model_id'])
+        except MLModel.DoesNotExist:
+            return Response(
+                {"error": "Model not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            model = model_cache.get(ml_model_instance)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to load model: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        output_format = validated_data['output_format']
+        chunk_size = validated_data.get('chunk_size') or getattr(settings, 'PREDICTION_STREAM_CHUNK_ROWS', 10000)
+        projection = get_projection(ml_model_instance)
+        chunks = iter_csv_chunks(validated_data['csv_data'], chunk_size, projection)
+        columns = projection.columns if projection is not None else \
+            PredictionStreamSerializer.csv_columns(validated_data['csv_data'])
+        predict_proba = self.get_predict_proba(ml_model_instance, model, columns)
+        return StreamingHttpResponse(
+            stream_predictions(model, chunks, output_format, predict_proba, projection),
+            content_type=CSV_CONTENT_TYPE if output_format == 'csv' else NDJSON_CONTENT_TYPE
+        )
+
+    @action(detail=False, methods=['post'])
+    def submit_job(self, request):
+        """Queue a batch prediction on the local worker pool and return its job id"""
+        serializer = PredictionJobCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = serializer.validated_data
+        from train.models import MLModel
+        try:
+            ml_model_instance = MLModel.objects.get(idModel=validated_data['model_id'])
+        except MLModel.DoesNotExist:
+            return Response(
+                {"error": "Model not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        job = PredictionJob.objects.create(
+            idModel=ml_model_instance,
+            inputFile=validated_data['csv_data'],
+            outputFormat=validated_data['output_format']
+        )
+        submit_prediction_job(job)
+        return Response(PredictionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def job_status(self, request, pk=None):
+        """Progress of a batch prediction job (rows done / total)"""
+        job = get_object_or_404(PredictionJob, idJob=pk)
+        return Response(PredictionJobSerializer(job).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def job_result(self, request, pk=None):
+        """Download the results of a finished batch prediction job"""
+        job = get_object_or_404(PredictionJob, idJob=pk)
+        if job.status != PredictionJob.STATUS_FINISHED:
+            return Response(
+                {"error": f"Job is {job.status}", "job": PredictionJobSerializer(job).data},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(
+            job.resultFile.open('rb'),
+            as_attachment=True,
+            filename=f"predictions-{job.idJob}.{'csv' if job.outputFormat == 'csv' else 'ndjson'}",
+            content_type=CSV_CONTENT_TYPE if job.outputFormat == 'csv' else NDJSON_CONTENT_TYPE
+        )
+
+    @action(detail=False, methods=['get'])
+    def model_cache_stats(self, request):
+        """Hit/miss/eviction counters of the fitted-model cache"""
+        stats = model_cache.stats()
+        if coalescer is not None:
+            stats['coalescer'] = coalescer.stats()
+        if result_cache is not None:
+            stats['result_cache'] = result_cache.stats()
+        if log_writer is not None:
+            stats['prediction_log'] = log_writer.stats()
+        return Response(stats, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def model_cache_memory(self, request):
+        """Resident vs shared memory per loaded model"""
+        return Response(model_cache.memory_report(), status=status.HTTP_200_OK)
+
     def calculate_metrics(self, model, df, predictions):
         """Calculate prediction metrics based on model type"""
         metrics = {}
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spaceapp.settings')
 
 application = get_asgi_application()
+
+from spaceapp.startup import web_worker_startup  # noqa: E402
+
+web_worker_startup()
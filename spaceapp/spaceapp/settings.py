@@ -185,4 +185,113 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ]
-}
\ No newline at end of file
+}
+
+# ==================== PREDICTION CONFIGURATION ====================
+
+# Fitted models kept in memory by each worker process (LRU, bounded by count and bytes)
+PREDICTION_MODEL_CACHE = {
+    'MAX_ENTRIES': config('MODEL_CACHE_MAX_ENTRIES', default=8, cast=int),
+    'MAX_BYTES': config('MODEL_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int),
+    # Load models from an uncompressed copy under SHARED_DIR with mmap_mode="r" so the
+    # OS page cache holds one copy of the estimator arrays for all server workers
+    'MMAP': config('MODEL_CACHE_MMAP', default=True, cast=bool),
+    'SHARED_DIR': BASE_DIR / 'files' / 'shared_models',
+    # Serve supported sklearn pipelines through the pure-NumPy engine (utils/compiled_pipeline.py)
+    'COMPILE': config('MODEL_CACHE_COMPILE', default=True, cast=bool),
+}
+
+# Rows parsed and predicted per chunk by /prediction/api/v1/predict/stream/
+PREDICTION_STREAM_CHUNK_ROWS = config('PREDICTION_STREAM_CHUNK_ROWS', default=10000, cast=int)
+
+# Worker processes running batch prediction jobs (/prediction/api/v1/jobs/), independent of HTTP workers
+PREDICTION_JOB_WORKERS = config('PREDICTION_JOB_WORKERS', default=2, cast=int)
+
+# Opt-in micro-batching: concurrent /predict calls for the same model are merged into
+# one predict_proba call after waiting at most MAX_WAIT_MS or until MAX_ROWS rows queue up
+PREDICTION_COALESCER = {
+    'ENABLED': config('PREDICTION_COALESCER_ENABLED', default=False, cast=bool),
+    'MAX_WAIT_MS': config('PREDICTION_COALESCER_MAX_WAIT_MS', default=5, cast=float),
+    'MAX_ROWS': config('PREDICTION_COALESCER_MAX_ROWS', default=1024, cast=int),
+}
+
+# Per-row prediction results keyed by (model id, artifact hash, row content hash), so
+# repeated or overlapping uploads only run inference on rows not seen before
+PREDICTION_RESULT_CACHE = {
+    'ENABLED': config('PREDICTION_RESULT_CACHE_ENABLED', default=True, cast=bool),
+    'MAX_ROWS': config('PREDICTION_RESULT_CACHE_MAX_ROWS', default=1000000, cast=int),
+    'TTL_SECONDS': config('PREDICTION_RESULT_CACHE_TTL_SECONDS', default=3600, cast=int),
+}
+
+# LogUserPredict audit records are buffered and written with bulk_create once MAX_RECORDS
+# are queued or the oldest has waited MAX_DELAY_SECONDS. Rows keep a compact summary;
+# full inputs are only kept as compressed CSVs when SPILL_DIR is set
+PREDICTION_LOG = {
+    'ENABLED': config('PREDICTION_LOG_ENABLED', default=True, cast=bool),
+    'MAX_RECORDS': config('PREDICTION_LOG_MAX_RECORDS', default=500, cast=int),
+    'MAX_DELAY_SECONDS': config('PREDICTION_LOG_MAX_DELAY_SECONDS', default=2.0, cast=float),
+    'SPILL_DIR': config('PREDICTION_LOG_SPILL_DIR', default=''),
+    'SPILL_COMPRESSION': config('PREDICTION_LOG_SPILL_COMPRESSION', default='gzip'),
+}
+
+
+# ==================== CPU BUDGET ====================
+
+# CPUs shared by training and batch prediction jobs (utils/cpu_budget.py). CPUS (0 = all) minus
+# PREDICTION_RESERVED_CPUS, kept for HTTP /predict requests, is the job budget; each job gets
+# TRAINING_JOB_CPUS / PREDICTION_JOB_CPUS of it (0 = the whole budget) as its BLAS/joblib limit
+# and waits in a queue while the budget is used up. REQUEST_THREADS caps the BLAS threads of each
+# web worker process, set once at start-up. The budget is per server process: with N workers
+# (gunicorn --workers N) jobs can use N x CPUS, so size CPUS for that or run a single worker
+CPU_BUDGET = {
+    'CPUS': config('CPU_BUDGET_CPUS', default=0, cast=int),
+    'PREDICTION_RESERVED_CPUS': config('CPU_BUDGET_PREDICTION_RESERVED_CPUS', default=1, cast=int),
+    'TRAINING_JOB_CPUS': config('CPU_BUDGET_TRAINING_JOB_CPUS', default=0, cast=int),
+    'PREDICTION_JOB_CPUS': config('CPU_BUDGET_PREDICTION_JOB_CPUS', default=1, cast=int),
+    'REQUEST_THREADS': config('CPU_BUDGET_REQUEST_THREADS', default=1, cast=int),
+}
+
+
+# ==================== DATASET CONFIGURATION ====================
+
+# Stored CSV datasets are converted once to an uncompressed Feather copy under DIR and
+# read from it (memory-mapped, no text parsing) on later loads
+DATASET_COLUMNAR_CACHE = {
+    'ENABLED': config('DATASET_COLUMNAR_CACHE_ENABLED', default=False, cast=bool),
+    'DIR': config('DATASET_COLUMNAR_CACHE_DIR', default=str(BASE_DIR / 'files' / 'columnar_cache')),
+}
+
+
+# Uploaded datasets, parameter files and prediction inputs are stored once per content under
+# DIR (relative to MEDIA_ROOT) as <sha256><ext>; uploaddata.Blob counts the rows referencing each
+# one. Blobs left without references are deleted after GRACE_SECONDS (a re-upload reuses them)
+# by `python manage.py collect_blobs`, to be run periodically (e.g. from cron).
+# Older uploads are moved into the store with `python manage.py dedup_uploads`
+CONTENT_STORE = {
+    'DIR': config('CONTENT_STORE_DIR', default='files/blobs'),
+    'GRACE_SECONDS': config('CONTENT_STORE_GRACE_SECONDS', default=3600, cast=int),
+}
+
+
+# ==================== TRAINING CONFIGURATION ====================
+
+# Worker processes running training jobs (/train/api/v1/train/); caps concurrent fits
+TRAINING_JOB_WORKERS = config('TRAINING_JOB_WORKERS', default=1, cast=int)
+
+# Fitted preprocessing (FeatureEngineer + ColumnTransformer) and the transformed train/test
+# matrices, keyed by dataset content hash + preprocessing config; retraining the same dataset
+# with other hyperparameters skips parsing and preprocessing. LRU-trimmed to MAX_BYTES
+TRAINING_PREPROCESSING_CACHE = {
+    'ENABLED': config('TRAINING_PREPROCESSING_CACHE_ENABLED', default=False, cast=bool),
+    'DIR': config('TRAINING_PREPROCESSING_CACHE_DIR', default=str(BASE_DIR / 'files' / 'preprocessing_cache')),
+    'MAX_BYTES': config('TRAINING_PREPROCESSING_CACHE_MAX_BYTES', default=2 * 1024 * 1024 * 1024, cast=int),
+}
+
+# Versioned model registry (files/registry/<lineage>/v<N>/ under MEDIA_ROOT): each training or
+# retrain writes an immutable version with its metadata. CODEC is the joblib compression of the
+# artifacts (none, zlib, gzip, bz2, lzma, lz4 if installed); "registry": {"codec": ...} in the
+# parameters JSON overrides it. COMPARE_CODECS also records size/load time of every codec
+MODEL_REGISTRY = {
+    'CODEC': config('MODEL_REGISTRY_CODEC', default='zlib'),
+    'COMPARE_CODECS': config('MODEL_REGISTRY_COMPARE_CODECS', default=False, cast=bool),
+}
@@ -0,0 +1,35 @@
+# spaceapp/startup.py
+from django.db import DatabaseError
+
+
+def recover_jobs():
+    """Fail the jobs whose worker process stopped and submit the queued ones again"""
+    from prediction.jobs import recover_prediction_jobs
+    from train.jobs import recover_training_jobs
+
+    for kind, recover in (("Prediction", recover_prediction_jobs), ("Training", recover_training_jobs)):
+        try:
+            failed, resubmitted = recover()
+        except DatabaseError as e:
+            # e.g. tables not migrated yet
+            print(f"⚠️ {kind} jobs not recovered: {e}")
+            continue
+        if failed or resubmitted:
+            print(f"🔁 {kind} jobs: {failed} interrupted marked failed, {resubmitted} queued submitted again")
+
+
+def limit_request_threads():
+    """BLAS/OpenMP thread cap shared by every request this process serves"""
+    # Load the inference stack first: the cap only reaches libraries already loaded
+    import prediction.views  # noqa: F401
+    from utils.cpu_budget import limit_request_threads as limit
+
+    threads = limit()
+    if threads:
+        print(f"🧵 Requests limited to {threads} BLAS/OpenMP thread(s) per web worker")
+
+
+def web_worker_startup():
+    """Run once by each web server process (wsgi.py/asgi.py): not by management commands nor pool workers"""
+    limit_request_threads()
+    recover_jobs()
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spaceapp.settings')
 
 application = get_wsgi_application()
+
+from spaceapp.startup import web_worker_startup  # noqa: E402
+
+web_worker_startup()
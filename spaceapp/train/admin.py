@@ -1,9 +1,15 @@
 # spaceapp/train/admin.py
 from django.contrib import admin
-from .models import MLModel
+from .models import MLModel, TrainingJob
 
 @admin.register(MLModel)
 class MLModelAdmin(admin.ModelAdmin):
-    list_display = ['name', 'dateCreate', 'idModel']
+    list_display = ['name', 'version', 'dateCreate', 'idModel']
     list_filter = ['dateCreate']
-    search_fields = ['name']
\ No newline at end of file
+    search_fields = ['name']
+
+@admin.register(TrainingJob)
+class TrainingJobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'stage', 'dateCreate', 'idJob']
+    list_filter = ['status', 'dateCreate']
+    search_fields = ['name']
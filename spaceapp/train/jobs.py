@@ -0,0 +1,255 @@
+# spaceapp/train/jobs.py
+import json
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from utils.cpu_budget import cpu_allotment, submit_job
+from utils.k2_source import DEFAULT_CV_MODE, retrain_model, train_and_select_model
+from utils.model_registry import DEFAULT_CODEC, ModelRegistry, parse_registry_options
+from utils.preprocessing_cache import PreprocessingCache
+from utils.worker_pool import get_pool, worker_alive, worker_id
+from .models import MLModel, TrainingJob
+
+
+class TrainingCancelled(Exception):
+    pass
+
+
+def get_executor():
+    """Local worker pool for training; its size caps how many fits run at once"""
+    return get_pool('training', getattr(settings, 'TRAINING_JOB_WORKERS', 1))
+
+
+def columnar_cache_dir():
+    """Directory of the Feather copies of stored CSV datasets, or None when disabled"""
+    options = getattr(settings, 'DATASET_COLUMNAR_CACHE', {})
+    return options.get('DIR') if options.get('ENABLED', False) else None
+
+
+_preprocessing_cache = None
+
+
+def get_preprocessing_cache():
+    """Process-wide on-disk cache of fitted preprocessing, or None when disabled"""
+    global _preprocessing_cache
+    options = getattr(settings, 'TRAINING_PREPROCESSING_CACHE', {})
+    if not options.get('ENABLED', False):
+        return None
+    if _preprocessing_cache is None:
+        _preprocessing_cache = PreprocessingCache(
+            options['DIR'], max_bytes=options.get('MAX_BYTES', 2 * 1024 ** 3)
+        )
+    return _preprocessing_cache
+
+
+def read_parameters(file):
+    """Training options from the uploaded parameters JSON (an object; empty file means defaults)"""
+    if hasattr(file, 'storage'):
+        with file.open('rb') as handle:
+            content = handle.read().strip()
+    else:
+        # Upload still being validated: left open so it can be saved afterwards
+        file.seek(0)
+        content = file.read().strip()
+        file.seek(0)
+    if not content:
+        return {}
+    parameters = json.loads(content)
+    if not isinstance(parameters, dict):
+        raise ValueError("parameters must be a JSON object")
+    return parameters
+
+
+# Storage name (relative to MEDIA_ROOT) of the model registry
+REGISTRY_ROOT = "files/registry"
+
+
+def get_model_registry():
+    return ModelRegistry(default_storage.path(REGISTRY_ROOT))
+
+
+def registry_options(parameters):
+    """Codec for the new version: the parameters JSON "registry" block over settings.MODEL_REGISTRY"""
+    options = getattr(settings, 'MODEL_REGISTRY', {})
+    return {
+        **parse_registry_options(parameters, options.get('CODEC', DEFAULT_CODEC)),
+        'compare_codecs': options.get('COMPARE_CODECS', False),
+    }
+
+
+def registry_names(lineage, version):
+    """Storage names of the fitted pipeline and retrain state of a registered version"""
+    base = f"{REGISTRY_ROOT}/{lineage}/v{version}"
+    return f"{base}/model.joblib", f"{base}/state.joblib"
+
+
+def model_lineage(ml_model):
+    """Registry lineage of a model: the id of the first model it was retrained from"""
+    while ml_model.parent_id is not None:
+        ml_model = ml_model.parent
+    return ml_model.idModel
+
+
+def submit_training_job(job):
+    """Queue a saved TrainingJob once its row is committed; it starts when the CPU budget allows"""
+    job_id = str(job.idJob)
+    transaction.on_commit(lambda: submit_job(get_executor(), 'training', run_training_job, job_id))
+
+
+def cancel_training_job(job):
+    """Queued jobs are cancelled right away; running ones stop at their next stage boundary"""
+    jobs = TrainingJob.objects.filter(idJob=job.idJob)
+    if jobs.filter(status=TrainingJob.STATUS_QUEUED).update(
+        status=TrainingJob.STATUS_CANCELLED, cancelRequested=True, dateFinished=timezone.now()
+    ):
+        return
+    jobs.filter(status=TrainingJob.STATUS_RUNNING).update(cancelRequested=True)
+    # Nobody would reach the next stage boundary of a job whose worker is gone
+    running = jobs.filter(status=TrainingJob.STATUS_RUNNING).values_list('worker', flat=True).first()
+    if running is not None and not worker_alive(running):
+        jobs.filter(status=TrainingJob.STATUS_RUNNING, worker=running).update(
+            status=TrainingJob.STATUS_CANCELLED, dateFinished=timezone.now()
+        )
+
+
+def recover_training_jobs(executor=None):
+    """Pick up the jobs a stopped server left behind; returns (failed, resubmitted).
+
+    Running jobs whose worker process is gone are marked failed (cancelled
+    if a cancel was requested) and queued jobs are submitted again; like
+    prediction jobs, a job submitted twice still runs once.
+    """
+    failed = 0
+    running = TrainingJob.objects.filter(status=TrainingJob.STATUS_RUNNING)
+    for job_id, worker, cancel_requested in running.values_list('idJob', 'worker', 'cancelRequested'):
+        if worker_alive(worker):
+            continue
+        jobs = TrainingJob.objects.filter(idJob=job_id, status=TrainingJob.STATUS_RUNNING, worker=worker)
+        if cancel_requested:
+            jobs.update(status=TrainingJob.STATUS_CANCELLED, dateFinished=timezone.now())
+        else:
+            failed += jobs.update(
+                status=TrainingJob.STATUS_FAILED,
+                error="Training interrupted: its worker process stopped",
+                dateFinished=timezone.now(),
+            )
+    queued = [str(job_id) for job_id in
+              TrainingJob.objects.filter(status=TrainingJob.STATUS_QUEUED).values_list('idJob', flat=True)]
+    executor = executor or (get_executor() if queued else None)
+    for job_id in queued:
+        submit_job(executor, 'training', run_training_job, job_id)
+    return failed, len(queued)
+
+
+def save_new_model(job, lineage, summary, feature_schema):
+    """Create or update the MLModel of a new lineage at a registered version (checkpoints move it forward)"""
+    model_name, state_name = registry_names(lineage, summary["version"])
+    ml_model, _ = MLModel.objects.update_or_create(
+        idModel=lineage,
+        defaults={
+            "name": job.name,
+            "filePath": job.filePath.name,
+            "parameters": job.parameters.name,
+            "featureSchema": feature_schema,
+            "modelFile": model_name,
+            # Only the stacking engine keeps a retrain state
+            "stateFile": state_name if "state" in summary["artifacts"] else None,
+            "version": summary["version"],
+        },
+    )
+    return ml_model
+
+
+def retrain_job_model(job, registration, progress):
+    """Incremental retrain of job.baseModel on the job's rows, registered as its next version"""
+    base = job.baseModel
+    schema = base.featureSchema or {}
+    registration.update(lineage=model_lineage(base), after=base.version)
+    registration["metadata"]["parent"] = str(base.idModel)
+    train_data = retrain_model(
+        model_path=base.artifact_path(), state_path=base.stateFile.path,
+        path=job.filePath.path, feature_schema=schema,
+        target=schema.get("target", "disposition"), cache_dir=columnar_cache_dir(), progress=progress,
+        registry=get_model_registry(), registration=registration
+    )
+    version = train_data["registry"]["version"]
+    model_name, state_name = registry_names(registration["lineage"], version)
+    ml_model = MLModel.objects.create(
+        name=job.name,
+        filePath=job.filePath.name,
+        parameters=job.parameters.name,
+        featureSchema=train_data.pop("feature_schema"),
+        modelFile=model_name,
+        stateFile=state_name,
+        version=version,
+        parent=base,
+    )
+    return ml_model, train_data
+
+
+def run_training_job(job_id, cpus=None):
+    """Worker entry point: train within cpus threads/processes, then register the MLModel"""
+    close_old_connections()
+    jobs = TrainingJob.objects.filter(idJob=job_id)
+    # Jobs cancelled while still queued never start; claimed atomically, so a
+    # job submitted again after a restart runs once
+    if not jobs.filter(status=TrainingJob.STATUS_QUEUED).update(
+        status=TrainingJob.STATUS_RUNNING, dateStarted=timezone.now(), worker=worker_id()
+    ):
+        close_old_connections()
+        return
+    job = jobs.get()
+    parameters = read_parameters(job.parameters)
+
+    def progress(stage, step, steps):
+        if jobs.filter(cancelRequested=True).exists():
+            raise TrainingCancelled()
+        jobs.update(stage=stage, stageStep=step, stageSteps=steps)
+
+    try:
+        with cpu_allotment(cpus):
+            registration = {
+                **registry_options(parameters),
+                "metadata": {"name": job.name, "dataset": job.filePath.name, "job": str(job.idJob)},
+            }
+            if job.baseModel_id is not None:
+                ml_model, train_data = retrain_job_model(job, registration, progress)
+            else:
+                # A new model starts its own lineage, named by the MLModel id
+                lineage = registration["lineage"] = uuid.uuid4()
+                registry = get_model_registry()
+
+                def on_checkpoint(summary):
+                    # The best model so far can be used while a time-budgeted training goes on
+                    schema = registry.metadata(lineage, summary["version"]).get("feature_schema")
+                    jobs.update(idModel=save_new_model(job, lineage, summary, schema))
+
+                train_data = train_and_select_model(
+                    path=job.filePath.path, target="disposition",
+                    cache_dir=columnar_cache_dir(), progress=progress,
+                    cv_mode=parameters.get("cv_mode", DEFAULT_CV_MODE), parameters=parameters,
+                    preprocessing_cache=get_preprocessing_cache(),
+                    registry=registry, registration=registration, on_checkpoint=on_checkpoint
+                )
+                ml_model = save_new_model(job, lineage, train_data["registry"], train_data.pop("feature_schema", None))
+            jobs.update(
+                status=TrainingJob.STATUS_FINISHED,
+                stageStep=1,
+                result=train_data,
+                idModel=ml_model,
+                dateFinished=timezone.now(),
+            )
+    except TrainingCancelled:
+        jobs.update(status=TrainingJob.STATUS_CANCELLED, dateFinished=timezone.now())
+    except Exception as e:
+        jobs.update(
+            status=TrainingJob.STATUS_FAILED,
+            error=f"Training failed: {str(e)}",
+            dateFinished=timezone.now(),
+        )
+    finally:
+        close_old_connections()
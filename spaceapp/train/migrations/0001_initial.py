@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:02
+
+import django.db.models.deletion
+import utils.content_store
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MLModel',
+            fields=[
+                ('idModel', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='Id')),
+                ('dateCreate', models.DateTimeField(auto_now_add=True, verbose_name='Date Created')),
+                ('name', models.CharField(max_length=100, verbose_name='Name')),
+                ('filePath', models.FileField(storage=utils.content_store.ContentAddressedStorage(), upload_to='files/datasets/', verbose_name='File')),
+                ('parameters', models.FileField(storage=utils.content_store.ContentAddressedStorage(), upload_to='files/models/', verbose_name='Parameters')),
+                ('featureSchema', models.JSONField(blank=True, null=True, verbose_name='Feature Schema')),
+                ('modelFile', models.FileField(blank=True, null=True, upload_to='files/models/', verbose_name='Model File')),
+                ('stateFile', models.FileField(blank=True, null=True, upload_to='files/models/', verbose_name='Retrain State')),
+                ('version', models.PositiveIntegerField(default=1, verbose_name='Version')),
+                ('parent', models.ForeignKey(blank=True, db_column='parent', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='versions', to='train.mlmodel')),
+            ],
+            options={
+                'verbose_name': 'ML Model',
+                'verbose_name_plural': 'ML Models',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrainingJob',
+            fields=[
+                ('idJob', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='Id')),
+                ('dateCreate', models.DateTimeField(auto_now_add=True, verbose_name='Date Created')),
+                ('dateStarted', models.DateTimeField(blank=True, null=True, verbose_name='Date Started')),
+                ('dateFinished', models.DateTimeField(blank=True, null=True, verbose_name='Date Finished')),
+                ('name', models.CharField(max_length=100, verbose_name='Name')),
+                ('filePath', models.FileField(storage=utils.content_store.ContentAddressedStorage(), upload_to='files/datasets/', verbose_name='File')),
+                ('parameters', models.FileField(storage=utils.content_store.ContentAddressedStorage(), upload_to='files/models/', verbose_name='Parameters')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('finished', 'Finished'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=10, verbose_name='Status')),
+                ('stage', models.CharField(blank=True, default='', max_length=20, verbose_name='Stage')),
+                ('stageStep', models.PositiveIntegerField(default=0, verbose_name='Stage Step')),
+                ('stageSteps', models.PositiveIntegerField(default=1, verbose_name='Stage Steps')),
+                ('cancelRequested', models.BooleanField(default=False, verbose_name='Cancel Requested')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Result')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Error')),
+                ('baseModel', models.ForeignKey(blank=True, db_column='baseModel', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='retrainJobs', to='train.mlmodel')),
+                ('idModel', models.ForeignKey(blank=True, db_column='idModel', null=True, on_delete=django.db.models.deletion.SET_NULL, to='train.mlmodel')),
+            ],
+            options={
+                'verbose_name': 'Training job',
+                'verbose_name_plural': 'Training jobs',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='worker',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Worker'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from accounts.models import *
+from utils.content_store import blob_storage
 
 import uuid
 
@@ -10,8 +11,14 @@ class MLModel(models.Model):
 	idModel = models.UUIDField("Id", primary_key=True, default=uuid.uuid4, editable=False)
 	dateCreate = models.DateTimeField("Date Created", auto_now_add=True)
 	name =  models.CharField("Name", max_length=100)
-	filePath = models.FileField("File", upload_to="files/datasets/", null=False, blank=False)
-	parameters = models.FileField("Parameters", upload_to="files/models/", null=False, blank=False)
+	filePath = models.FileField("File", upload_to="files/datasets/", storage=blob_storage, null=False, blank=False)
+	parameters = models.FileField("Parameters", upload_to="files/models/", storage=blob_storage, null=False, blank=False)
+	featureSchema = models.JSONField("Feature Schema", null=True, blank=True)
+	modelFile = models.FileField("Model File", upload_to="files/models/", null=True, blank=True)
+	stateFile = models.FileField("Retrain State", upload_to="files/models/", null=True, blank=True)
+	version = models.PositiveIntegerField("Version", default=1)
+	parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+							   related_name="versions", db_column='parent')
 	
 	class Meta:
 		verbose_name_plural = "ML Models"
@@ -19,3 +26,51 @@ class MLModel(models.Model):
 
 	def __str__(self):
 		return self.name
+
+	def artifact_path(self):
+		"""Fitted pipeline on disk; rows from before modelFile existed point filePath at it"""
+		return self.modelFile.path if self.modelFile else self.filePath.path
+
+
+class TrainingJob(models.Model):
+	"""Training run of the stacking pipeline on the local worker pool"""
+	STATUS_QUEUED = 'queued'
+	STATUS_RUNNING = 'running'
+	STATUS_FINISHED = 'finished'
+	STATUS_FAILED = 'failed'
+	STATUS_CANCELLED = 'cancelled'
+	STATUS_CHOICES = [
+		(STATUS_QUEUED, 'Queued'),
+		(STATUS_RUNNING, 'Running'),
+		(STATUS_FINISHED, 'Finished'),
+		(STATUS_FAILED, 'Failed'),
+		(STATUS_CANCELLED, 'Cancelled'),
+	]
+
+	idJob = models.UUIDField("Id", primary_key=True, default=uuid.uuid4, editable=False)
+	dateCreate = models.DateTimeField("Date Created", auto_now_add=True)
+	dateStarted = models.DateTimeField("Date Started", null=True, blank=True)
+	dateFinished = models.DateTimeField("Date Finished", null=True, blank=True)
+	name = models.CharField("Name", max_length=100)
+	filePath = models.FileField("File", upload_to="files/datasets/", storage=blob_storage)
+	parameters = models.FileField("Parameters", upload_to="files/models/", storage=blob_storage)
+	status = models.CharField("Status", max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+	stage = models.CharField("Stage", max_length=20, blank=True, default="")
+	stageStep = models.PositiveIntegerField("Stage Step", default=0)
+	stageSteps = models.PositiveIntegerField("Stage Steps", default=1)
+	cancelRequested = models.BooleanField("Cancel Requested", default=False)
+	# host:pid of the worker process running the job (see jobs.recover_training_jobs)
+	worker = models.CharField("Worker", max_length=100, blank=True, default="")
+	result = models.JSONField("Result", null=True, blank=True)
+	error = models.TextField("Error", null=True, blank=True)
+	idModel = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True, blank=True, db_column='idModel')
+	# Set for incremental retrains: filePath then holds only the new rows
+	baseModel = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True, blank=True,
+								  related_name="retrainJobs", db_column='baseModel')
+
+	class Meta:
+		verbose_name_plural = "Training jobs"
+		verbose_name = "Training job"
+
+	def __str__(self):
+		return f"Training job {self.idJob} ({self.status})"
@@ -9,3 +9,58 @@ class MLModelSerializer(serializers.ModelSerializer):
 	class Meta:
 		model = MLModel
 		fields = "__all__"
+		read_only_fields = ("featureSchema",)
+
+class TrainingJobCreateSerializer(serializers.ModelSerializer):
+	class Meta:
+		model = TrainingJob
+		fields = ("name", "filePath", "parameters")
+
+	def validate_parameters(self, value):
+		from train.jobs import read_parameters
+		from utils.k2_source import CV_MODES, DEFAULT_CV_MODE, build_model, parse_engine
+		from utils.anytime import parse_time_budget
+		from utils.categorical_encoding import parse_encoding_options
+		from utils.evaluation import parse_evaluation_options
+		from utils.model_registry import parse_registry_options
+		from utils.search import parse_parameters
+		try:
+			parameters = read_parameters(value)
+			parse_parameters(parameters, build_model(parse_engine(parameters)))
+			parse_evaluation_options(parameters)
+			parse_registry_options(parameters)
+			parse_time_budget(parameters)
+			parse_encoding_options(parameters)
+		except ValueError as e:
+			raise serializers.ValidationError(f"Invalid parameters file: {str(e)}")
+		if parameters.get("cv_mode", DEFAULT_CV_MODE) not in CV_MODES:
+			raise serializers.ValidationError(f"cv_mode must be one of {', '.join(CV_MODES)}")
+		return value
+
+class TrainingJobRetrainSerializer(serializers.ModelSerializer):
+	"""Only the new labelled rows; parameters are inherited from the base model"""
+	class Meta:
+		model = TrainingJob
+		fields = ("name", "filePath")
+
+class TrainingJobSerializer(serializers.ModelSerializer):
+	# Share of the whole run taken by each stage, in order
+	STAGE_WEIGHTS = (("load", 0.05), ("preprocess", 0.05), ("search", 0.4), ("cv", 0.3), ("fit", 0.15), ("evaluate", 0.05))
+
+	progress = serializers.SerializerMethodField()
+
+	class Meta:
+		model = TrainingJob
+		fields = ("idJob", "name", "status", "stage", "stageStep", "stageSteps", "progress",
+				  "cancelRequested", "result", "error", "idModel", "baseModel", "dateCreate", "dateStarted", "dateFinished")
+		read_only_fields = fields
+
+	def get_progress(self, obj):
+		if obj.status == TrainingJob.STATUS_FINISHED:
+			return 1.0
+		done = 0.0
+		for stage, weight in self.STAGE_WEIGHTS:
+			if stage == obj.stage:
+				return round(done + weight * obj.stageStep / max(obj.stageSteps, 1), 4)
+			done += weight
+		return 0.0
@@ -1,3 +1,173 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+import numpy as np
+
+from train.jobs import cancel_training_job, get_model_registry, recover_training_jobs, run_training_job
+from train.models import MLModel, TrainingJob
+from utils.model_registry import ModelRegistry
+from utils.testing import RecordingExecutor, fit_stacking_pipeline, make_k2_like_frame
+from utils.worker_pool import worker_id
+
+
+class ModelRegistryTests(SimpleTestCase):
+    """Versions are immutable directories published by rename, numbered per lineage"""
+
+    def test_versions_round_trip(self):
+        pipe, X = fit_stacking_pipeline(make_k2_like_frame(n_rows=300, seed=9), n_estimators=10)
+        with tempfile.TemporaryDirectory() as root:
+            registry = ModelRegistry(root)
+            first, _ = registry.register("m", {"model": pipe}, {"metrics": {"accuracy": 0.5}}, codec="zlib")
+            second, directory = registry.register("m", {"model": pipe}, codec="none", after=3)
+            self.assertEqual((first, second), (1, 4))
+            self.assertEqual(registry.versions("m"), [1, 4])
+            meta = registry.metadata("m", 1)
+            self.assertEqual(meta["metrics"], {"accuracy": 0.5})
+            self.assertLess(meta["total_bytes"], registry.metadata("m", 4)["total_bytes"])
+            np.testing.assert_allclose(registry.load("m", 1).predict_proba(X), pipe.predict_proba(X))
+            with self.assertRaises(OSError):
+                registry.register("m", {"model": pipe}, version=1)
+            with self.assertRaises(ValueError):
+                registry.register("m", {"model": pipe}, codec="snappy")
+            # Failed registrations leave no partial version behind
+            self.assertEqual(sorted(p.name for p in directory.parent.iterdir()), ["v1", "v4"])
+
+
+class TrainingJobTests(TestCase):
+    """POST /train only queues the job; the worker runs it and registers the MLModel"""
+
+    PARAMETERS = {"cv_mode": "fast", "params": {"rf__n_estimators": 5, "ada__n_estimators": 5}}
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.dataset = make_k2_like_frame(n_rows=200, seed=22).to_csv(index=False).encode()
+
+    def files(self, parameters=None):
+        return {
+            "filePath": SimpleUploadedFile("k2.csv", self.dataset),
+            "parameters": SimpleUploadedFile("parameters.json", json.dumps(parameters or self.PARAMETERS).encode()),
+        }
+
+    def create_job(self, parameters=None, **fields):
+        return TrainingJob.objects.create(name="k2", **self.files(parameters), **fields)
+
+    def test_post_queues_job(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse("train"), {"name": "k2", **self.files()})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], TrainingJob.STATUS_QUEUED)
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(MLModel.objects.exists())
+
+        response = self.client.post(reverse("train"), {"name": "k2", **self.files({"cv_mode": "slow"})})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TrainingJob.objects.count(), 1)
+
+    def test_worker_registers_model(self):
+        job = self.create_job()
+        run_training_job(job.idJob, cpus=1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_FINISHED, job.error)
+        self.assertIsNotNone(job.dateFinished)
+        self.assertEqual(job.result["registry"]["version"], 1)
+        self.assertTrue(os.path.exists(job.idModel.artifact_path()))
+        self.assertEqual(job.idModel.featureSchema["target"], "disposition")
+
+    def test_time_budget_checkpoints_are_models(self):
+        parameters = {"time_budget_seconds": 300, "params": {"rf__n_estimators": 5, "ada__n_estimators": 5}}
+        job = self.create_job(parameters)
+        run_training_job(job.idJob, cpus=1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_FINISHED, job.error)
+        steps = job.result["anytime"]["steps"]
+        checkpoints = [step["checkpoint"] for step in steps if step["checkpoint"] is not None]
+        best = steps[job.result["anytime"]["best_step"]]
+
+        # One MLModel moved along the checkpoints, left on the winner's version
+        ml_model = MLModel.objects.get()
+        self.assertEqual(job.idModel, ml_model)
+        self.assertEqual(ml_model.version, best["checkpoint"])
+        self.assertEqual(job.result["registry"]["version"], best["checkpoint"])
+        self.assertEqual(ml_model.featureSchema["target"], "disposition")
+        self.assertTrue(os.path.exists(ml_model.artifact_path()))
+
+        # The winner is not registered again; its version gets the test evaluation
+        registry = get_model_registry()
+        self.assertEqual(registry.versions(ml_model.idModel), checkpoints)
+        record = registry.metadata(ml_model.idModel, best["checkpoint"])
+        self.assertTrue(record["final"])
+        self.assertIn("predictions.csv", record["artifacts"])
+        self.assertEqual(record["metrics"]["accuracy"], job.result["accuracy"])
+
+    def test_cancelled_jobs_register_nothing(self):
+        queued = self.create_job()
+        cancel_training_job(queued)
+        run_training_job(queued.idJob, cpus=1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.dateStarted), (TrainingJob.STATUS_CANCELLED, None))
+
+        # Cancelled once running: stops at the first stage boundary
+        running = self.create_job(cancelRequested=True)
+        run_training_job(running.idJob, cpus=1)
+        running.refresh_from_db()
+        self.assertEqual(running.status, TrainingJob.STATUS_CANCELLED)
+        self.assertIsNotNone(running.dateStarted)
+        self.assertFalse(MLModel.objects.exists())
+
+
+class TrainingJobRecoveryTests(TestCase):
+    """Jobs left queued or running by a stopped server are not stuck forever"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.dead_worker = f"{worker_id().rsplit(':', 1)[0]}:99999999"  # above any pid_max
+
+    def create_job(self, **fields):
+        return TrainingJob.objects.create(name="k2", filePath=SimpleUploadedFile("k2.csv", b"a,disposition\n1,x\n"),
+                                          parameters=SimpleUploadedFile("parameters.json", b"{}"), **fields)
+
+    def test_recovery(self):
+        queued = self.create_job()
+        orphaned = self.create_job(status=TrainingJob.STATUS_RUNNING, worker=self.dead_worker)
+        cancelling = self.create_job(status=TrainingJob.STATUS_RUNNING, worker=self.dead_worker,
+                                     cancelRequested=True)
+        alive = self.create_job(status=TrainingJob.STATUS_RUNNING, worker=worker_id())
+        remote = self.create_job(status=TrainingJob.STATUS_RUNNING, worker="other-host:1")
+        executor = RecordingExecutor()
+        self.assertEqual(recover_training_jobs(executor), (1, 1))
+        self.assertEqual(executor.job_ids, [str(queued.idJob)])
+        statuses = {job.idJob: job.status for job in TrainingJob.objects.all()}
+        self.assertEqual(statuses, {
+            queued.idJob: TrainingJob.STATUS_QUEUED,
+            orphaned.idJob: TrainingJob.STATUS_FAILED,
+            cancelling.idJob: TrainingJob.STATUS_CANCELLED,
+            alive.idJob: TrainingJob.STATUS_RUNNING,
+            remote.idJob: TrainingJob.STATUS_RUNNING,
+        })
+
+    def test_job_submitted_twice_runs_once(self):
+        job = self.create_job()
+        # Claimed by another server's worker meanwhile
+        TrainingJob.objects.filter(idJob=job.idJob).update(status=TrainingJob.STATUS_RUNNING, worker="other-host:1")
+        run_training_job(job.idJob, cpus=1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.stage), (TrainingJob.STATUS_RUNNING, "other-host:1", ""))
+
+    def test_cancelling_an_orphaned_job(self):
+        job = self.create_job(status=TrainingJob.STATUS_RUNNING, worker=self.dead_worker)
+        cancel_training_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_CANCELLED)
@@ -1,7 +1,10 @@
 # spaceapp/predictions/urls.py
 from django.urls import path
-from .views import MLModelList
+from .views import MLModelList, MLModelRetrain, TrainingJobDetail, TrainingJobCancel
 
 urlpatterns = [
     path('api/v1/train/', MLModelList.as_view(), name="train"),
+    path('api/v1/train/<uuid:pk>/retrain/', MLModelRetrain.as_view(), name="train_retrain"),
+    path('api/v1/train/jobs/<uuid:pk>/', TrainingJobDetail.as_view(), name="training_job_status"),
+    path('api/v1/train/jobs/<uuid:pk>/cancel/', TrainingJobCancel.as_view(), name="training_job_cancel"),
 ]
\ No newline at end of file
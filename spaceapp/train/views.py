@@ -1,19 +1,23 @@
 from uploaddata.models import UserData
-from train.serializer import MLModelSerializer
+from train.models import MLModel, TrainingJob
+from train.serializer import (
+    MLModelSerializer, TrainingJobCreateSerializer, TrainingJobRetrainSerializer, TrainingJobSerializer
+)
+from train.jobs import cancel_training_job, submit_training_job
 
 from django.http import Http404
+from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 
 import pandas as pd
-from utils.k2_source import *
 # Create your views here.
 
 class MLModelList(APIView):
     """
-    List all MLModel, or create a new MLModel.
+    List all MLModel, or queue the training of a new MLModel.
     """
     permission_classes = [AllowAny]
     def get(self, request, format=None):
@@ -21,32 +25,65 @@ class MLModelList(APIView):
         # return Response({"message": "This endpoint is under construction."}, status=status.HTTP_200_OK)
 
     def post(self, request, format=None):
-        # Check if a file is included in the request
-        file = request.FILES.get('filePath')
-        try:
-            # Read CSV file with pandas
-            # df = pd.read_csv(file)
-            train_data = train_and_select_model(path=file, target="disposition")
-            # print(train_data)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Improve the serializer and use it to validate and save the data
-        serializer = MLModelSerializer(data=request.data)
+        # Training (5-fold CV + final fit) runs on the training worker pool; the
+        # client polls /train/api/v1/train/jobs/<id>/ for progress and metrics
+        serializer = TrainingJobCreateSerializer(data=request.data)
         if serializer.is_valid():
-            instance = serializer.save()  # saves file to storage (MEDIA_ROOT/uploads/)
+            job = serializer.save()  # saves the dataset and parameters files to storage
+            submit_training_job(job)
+            return Response(TrainingJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            # Read the uploaded file using pandas
-            # csv_path = instance.filePath.path  # local path to saved CSV
-            # df = pd.read_csv(csv_path)
-            # print(df)
 
-            # return Response(serializer.data, status=status.HTTP_201_CREATED)
-            return Response(train_data, status=status.HTTP_201_CREATED)
+class MLModelRetrain(APIView):
+    """
+    Queue an incremental retrain of an MLModel on new labelled rows only.
+    The result is registered as a new MLModel version (parent = this model).
+    """
+    permission_classes = [AllowAny]
+    def post(self, request, pk, format=None):
+        base = get_object_or_404(MLModel, idModel=pk)
+        if not base.stateFile or not base.featureSchema:
+            return Response(
+                {"error": "Model has no retrain state; train it again to enable incremental retraining"},
+                status=status.HTTP_409_CONFLICT
+            )
+        serializer = TrainingJobRetrainSerializer(data=request.data)
+        if serializer.is_valid():
+            job = serializer.save(baseModel=base, parameters=base.parameters.name)
+            submit_training_job(job)
+            return Response(TrainingJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+class TrainingJobDetail(APIView):
+    """
+    Stage progress of a training job, with its metrics once finished.
+    """
+    permission_classes = [AllowAny]
+    def get(self, request, pk, format=None):
+        job = get_object_or_404(TrainingJob, idJob=pk)
+        return Response(TrainingJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class TrainingJobCancel(APIView):
+    """
+    Cancel a queued or running training job.
+    """
+    permission_classes = [AllowAny]
+    def post(self, request, pk, format=None):
+        job = get_object_or_404(TrainingJob, idJob=pk)
+        if job.status not in (TrainingJob.STATUS_QUEUED, TrainingJob.STATUS_RUNNING):
+            return Response(
+                {"error": f"Job is {job.status}", "job": TrainingJobSerializer(job).data},
+                status=status.HTTP_409_CONFLICT
+            )
+        cancel_training_job(job)
+        job.refresh_from_db()
+        return Response(TrainingJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
 """
 {
     "name": "Test Model", # Name of the model
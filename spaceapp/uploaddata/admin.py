@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import UserData
+from .models import Blob, UserData
 
 # Register your models here.
-admin.site.register(UserData)
\ No newline at end of file
+admin.site.register(UserData)
+admin.site.register(Blob)
\ No newline at end of file
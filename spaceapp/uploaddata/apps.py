@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class UploaddataConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'uploaddata'
+
+    def ready(self):
+        from .signals import connect_blob_signals
+        # Uploads of every app share one copy per content; count the rows using each
+        connect_blob_signals()
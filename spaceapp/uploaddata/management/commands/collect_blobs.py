@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from utils.content_store import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Delete stored blobs that no row has referenced for the grace period (run it periodically, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace-seconds", type=int, default=None,
+                            help="Override CONTENT_STORE['GRACE_SECONDS']")
+
+    def handle(self, *args, grace_seconds=None, **options):
+        removed = collect_garbage(grace_seconds=grace_seconds)
+        self.stdout.write(f"{len(removed)} unreferenced blobs removed")
@@ -0,0 +1,50 @@
+import os
+
+from django.apps import apps
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from uploaddata.signals import blob_fields
+from utils.content_store import blob_digest, blob_storage
+from utils.preprocessing_cache import file_digest
+
+
+class Command(BaseCommand):
+    help = "Move uploads saved before the content-addressed store into it, keeping one copy per content"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved")
+        parser.add_argument("--keep-originals", action="store_true", help="Do not delete the moved files")
+
+    def handle(self, *args, dry_run=False, keep_originals=False, **options):
+        moved = {}  # old name -> blob name
+        rows = 0
+        for model in apps.get_models():
+            for attname in blob_fields(model):
+                for instance in model.objects.exclude(**{attname: ""}).iterator():
+                    name = getattr(instance, attname).name
+                    if blob_digest(name) is not None:
+                        continue
+                    if name not in moved:
+                        if not blob_storage.exists(name):
+                            self.stderr.write(f"Missing file {name} ({model._meta.label} {instance.pk})")
+                            continue
+                        if dry_run:
+                            moved[name] = file_digest(blob_storage.path(name))
+                        else:
+                            with blob_storage.open(name, "rb") as handle:
+                                moved[name] = blob_storage.save(name, File(handle, name=name))
+                    rows += 1
+                    if not dry_run:
+                        setattr(instance, attname, moved[name])
+                        instance.save(update_fields=[attname])
+
+        freed = sum(os.path.getsize(blob_storage.path(name)) for name in moved)
+        blobs = set(moved.values())
+        if not dry_run and not keep_originals:
+            for name in moved:
+                blob_storage.delete(name)
+        self.stdout.write(
+            f"{rows} references to {len(moved)} files {'would' if dry_run else 'now'} point at {len(blobs)} blobs; "
+            f"{freed} bytes in the original files"
+        )
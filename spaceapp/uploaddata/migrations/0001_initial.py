@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:02
+
+import django.db.models.deletion
+import utils.content_store
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Name')),
+                ('sha256', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256')),
+                ('size', models.BigIntegerField(verbose_name='Size')),
+                ('refCount', models.PositiveIntegerField(default=0, verbose_name='References')),
+                ('dateCreate', models.DateTimeField(auto_now_add=True, verbose_name='Date Created')),
+                ('lastUsed', models.DateTimeField(blank=True, null=True, verbose_name='Last Used')),
+            ],
+            options={
+                'verbose_name': 'Blob',
+                'verbose_name_plural': 'Blobs',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserData',
+            fields=[
+                ('idUserData', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='Id')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date Created')),
+                ('name_dataset', models.CharField(max_length=100, verbose_name='Name')),
+                ('filePath', models.FileField(storage=utils.content_store.ContentAddressedStorage(), upload_to='datasets/', verbose_name='File')),
+                ('idUser', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'User dataset',
+                'verbose_name_plural': 'User datasets',
+            },
+        ),
+    ]
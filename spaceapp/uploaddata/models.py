@@ -1,5 +1,6 @@
 from django.db import models
 from accounts.models import *
+from utils.content_store import blob_storage
 
 import uuid
 
@@ -10,7 +11,7 @@ class UserData(models.Model):
 	idUserData = models.UUIDField("Id", primary_key=True, default=uuid.uuid4, editable=False)
 	date_creation = models.DateTimeField("Date Created", auto_now_add=True)
 	name_dataset =  models.CharField("Name", max_length=100)
-	filePath = models.FileField("File", upload_to="datasets/", null=False, blank=False)
+	filePath = models.FileField("File", upload_to="datasets/", storage=blob_storage, null=False, blank=False)
 	idUser = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name="User")
 
 	class Meta:
@@ -19,3 +20,20 @@ class UserData(models.Model):
 
 	def __str__(self):
 		return self.name_dataset
+
+
+class Blob(models.Model):
+	"""Uploaded file stored once by content (utils/content_store.py), with the number of rows using it"""
+	name = models.CharField("Name", max_length=100, primary_key=True)
+	sha256 = models.CharField("SHA-256", max_length=64, db_index=True)
+	size = models.BigIntegerField("Size")
+	refCount = models.PositiveIntegerField("References", default=0)
+	dateCreate = models.DateTimeField("Date Created", auto_now_add=True)
+	lastUsed = models.DateTimeField("Last Used", null=True, blank=True)
+
+	class Meta:
+		verbose_name_plural = "Blobs"
+		verbose_name = "Blob"
+
+	def __str__(self):
+		return self.name
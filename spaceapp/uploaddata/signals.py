@@ -0,0 +1,62 @@
+# spaceapp/uploaddata/signals.py
+from functools import lru_cache
+
+from django.apps import apps
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_init, post_save
+
+from utils.content_store import ContentAddressedStorage, acquire, release
+
+
+@lru_cache(maxsize=None)
+def blob_fields(model):
+    """Names of the model's file fields kept in the content-addressed store"""
+    return tuple(
+        field.attname for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    )
+
+
+def _stored_name(instance, attname):
+    """Name held by a loaded file field (None when the field was deferred)"""
+    if attname not in instance.__dict__:
+        return None
+    value = instance.__dict__[attname]
+    return getattr(value, "name", value) or ""
+
+
+def remember_blob_names(sender, instance, **kwargs):
+    instance._blob_names = {attname: _stored_name(instance, attname) for attname in blob_fields(sender)}
+
+
+def count_blob_references(sender, instance, created, update_fields=None, **kwargs):
+    """Acquire the blobs a saved row now points at and release the ones it stopped using"""
+    previous = getattr(instance, "_blob_names", {})
+    for attname in blob_fields(sender):
+        if update_fields is not None and attname not in update_fields:
+            continue
+        name = _stored_name(instance, attname)
+        # Rows built with an existing name (e.g. job.filePath.name) are new references too
+        old = "" if created else previous.get(attname)
+        if name is None or old is None or name == old:
+            continue
+        acquire(name)
+        release(old)
+        previous[attname] = name
+    instance._blob_names = previous
+
+
+def release_blob_references(sender, instance, **kwargs):
+    for attname in blob_fields(sender):
+        release(_stored_name(instance, attname))
+
+
+def connect_blob_signals():
+    """Track blob references of every installed model storing uploads in the content-addressed store"""
+    for model in apps.get_models():
+        if not blob_fields(model):
+            continue
+        uid = f"blob-{model._meta.label}"
+        post_init.connect(remember_blob_names, sender=model, dispatch_uid=uid)
+        post_save.connect(count_blob_references, sender=model, dispatch_uid=uid)
+        post_delete.connect(release_blob_references, sender=model, dispatch_uid=uid)
@@ -1,3 +1,68 @@
-from django.test import TestCase
+import hashlib
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from train.models import MLModel, TrainingJob
+from uploaddata.models import Blob
+from utils.content_store import blob_digest, blob_storage, collect_garbage
+from utils.testing import make_k2_like_frame
+
+
+class ContentStoreTests(TestCase):
+    """Identical uploads are stored once and counted by every row referencing them"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = Path(media.name)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.content = make_k2_like_frame(n_rows=50).to_csv(index=False).encode()
+
+    def create_job(self, file_name, content):
+        return TrainingJob.objects.create(name=file_name, filePath=SimpleUploadedFile(file_name, content),
+                                          parameters=SimpleUploadedFile("parameters.json", b"{}"))
+
+    def test_identical_uploads_share_one_blob(self):
+        jobs = [self.create_job(f"k2_{i}.csv", self.content) for i in range(2)]
+        model = MLModel.objects.create(name="model", filePath=jobs[0].filePath.name, parameters=jobs[0].parameters.name)
+        name = jobs[0].filePath.name
+        self.assertEqual(jobs[1].filePath.name, name)
+        self.assertEqual(blob_digest(name), hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(len(list(self.media.rglob("*.csv"))), 1)
+        self.assertEqual(Blob.objects.get(name=name).refCount, 3)
+
+        for row in jobs + [model]:
+            row.delete()
+        self.assertEqual(Blob.objects.get(name=name).refCount, 0)
+        # Kept for the grace period, then removed with the shared parameters file
+        self.assertEqual(collect_garbage(), [])
+        self.assertEqual(len(collect_garbage(grace_seconds=0)), 2)
+        self.assertFalse(Path(blob_storage.path(name)).exists())
+
+    def test_release_collects_only_the_released_blob(self):
+        stale = self.create_job("old.csv", b"old rows\n")
+        stale.delete()
+        Blob.objects.filter(name=stale.filePath.name).update(lastUsed="2000-01-01T00:00Z")
+        job = self.create_job("k2.csv", self.content)
+        with self.settings(CONTENT_STORE={"GRACE_SECONDS": 0}), self.captureOnCommitCallbacks(execute=True):
+            job.delete()
+        self.assertFalse(Blob.objects.filter(name=job.filePath.name).exists())
+        self.assertFalse(Path(blob_storage.path(job.filePath.name)).exists())
+        # Left for the collect_blobs command
+        self.assertTrue(Blob.objects.filter(name=stale.filePath.name).exists())
+        self.assertEqual(collect_garbage(grace_seconds=60, names=[stale.filePath.name]), [stale.filePath.name])
+
+    def test_replacing_a_file_releases_the_old_blob(self):
+        job = self.create_job("k2.csv", self.content)
+        old = job.filePath.name
+        job = TrainingJob.objects.get(idJob=job.idJob)
+        job.filePath = SimpleUploadedFile("k2.csv", self.content + b"\n")
+        job.save()
+        self.assertNotEqual(job.filePath.name, old)
+        self.assertEqual(Blob.objects.get(name=old).refCount, 0)
+        self.assertEqual(Blob.objects.get(name=job.filePath.name).refCount, 1)
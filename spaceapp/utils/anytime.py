@@ -0,0 +1,143 @@
+# =====================================
+# anytime.py — entrenamiento con presupuesto de tiempo y mejor modelo en cada momento
+# =====================================
+
+import copy
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Filas de train apartadas para comparar las etapas
+VALIDATION_SIZE = 0.15
+# Tamaños de los ensembles que crecen con warm_start (árboles / iteraciones); el primero,
+# de una sola unidad, mide lo que cuesta cada árbol/iteración para estimar los siguientes
+FOREST_SIZES = (1, 25, 50, 100, 200)
+BOOSTING_SIZES = (1, 25, 50, 100, 200, 400)
+
+
+def parse_time_budget(parameters):
+    """Validated top-level "time_budget_seconds" of the parameters JSON (None = unbounded)"""
+    budget = parameters.get("time_budget_seconds")
+    if budget is None:
+        return None
+    if isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0:
+        raise ValueError("time_budget_seconds must be a positive number")
+    return float(budget)
+
+
+def _baseline():
+    # Funciona con la salida de ambos preprocesadores (dispersa escalada o densa con NaN)
+    return Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="median")),
+        ("scaler", StandardScaler(with_mean=False)),
+        ("model", LogisticRegression(max_iter=300)),
+    ])
+
+
+def budget_ladder(model):
+    """Steps from cheapest to most expensive for the configured model.
+
+    Each step is (name, params, units, make): make() returns the estimator
+    to fit, the same object growing with warm_start along an ensemble's
+    steps; units (trees or iterations the step adds) scale its time estimate.
+    An ensemble first grows a single tree/iteration, so the larger steps are
+    priced from a measured unit instead of from the baseline fit.
+    """
+    steps = [("baseline", {}, None, _baseline)]
+    if isinstance(model, HistGradientBoostingClassifier):
+        grown = clone(model).set_params(warm_start=True, early_stopping=False)
+        sizes = [n for n in BOOSTING_SIZES if n < model.max_iter] + [model.max_iter]
+        for before, n in zip([0] + sizes, sizes):
+            steps.append(("hist_gradient_boosting", {"max_iter": n}, n - before,
+                          lambda n=n: grown.set_params(max_iter=n)))
+        return steps
+
+    # Stacking: bosque que crece y, si queda tiempo, el Stacking completo
+    forest = clone(model.get_params()["rf"]).set_params(warm_start=True)
+    for before, n in zip((0,) + FOREST_SIZES, FOREST_SIZES):
+        steps.append(("random_forest", {"n_estimators": n}, n - before,
+                      lambda n=n: forest.set_params(n_estimators=n)))
+    params = model.get_params()
+    # RF + AdaBoost, ajustados en cada fold interno y al final
+    units = (params["rf__n_estimators"] + params["ada__n_estimators"]) * ((model.cv or 5) + 1)
+    steps.append(("stacking", {}, units, lambda: clone(model)))
+    return steps
+
+
+def anytime_fit(steps, X, y, seconds, checkpoint=None, progress=None, random_state=42):
+    """Fit steps in order for at most about seconds; returns (best estimator, report).
+
+    Every step is scored on a stratified hold-out of the training rows; a
+    step that beats the best so far is handed to checkpoint(estimator, entry)
+    (e.g. saved to the ModelRegistry) before the next one starts. A step
+    starts only if its estimated time (units x seconds per unit measured on
+    the previous ensemble step; before any, one unit is taken to cost a
+    baseline fit) fits before the deadline, keeping back the time the last
+    checkpoint took. A fit that started is never interrupted, so the
+    deadline holds up to the error of that estimate. The baseline always
+    runs, so a usable model exists whatever the budget. The selected
+    estimator stays fitted on the non-held-out rows: no refit on all rows,
+    which the budget may not allow.
+    """
+    index_fit, index_val = train_test_split(
+        np.arange(len(y)), test_size=VALIDATION_SIZE, stratify=y, random_state=random_state
+    )
+    X_fit, X_val, y_fit, y_val = X[index_fit], X[index_val], y[index_fit], y[index_val]
+
+    start = time.monotonic()
+    deadline = start + seconds
+    best, best_score, best_step = None, -np.inf, None
+    seconds_per_unit, reserve = None, 0.0
+    trace, stopped = [], "completed"
+    for i, (name, params, units, make) in enumerate(steps):
+        if best is not None:
+            remaining = deadline - time.monotonic() - reserve
+            estimate = units * seconds_per_unit if units else 0.0
+            if remaining <= 0 or estimate > remaining:
+                stopped = "time_budget"
+                break
+        if progress is not None:
+            progress("fit", i, len(steps))
+
+        fit_start = time.monotonic()
+        estimator = make()
+        estimator.fit(X_fit, y_fit)
+        fit_seconds = time.monotonic() - fit_start
+        if hasattr(estimator, "pop_oof"):
+            # Las out-of-fold del Stacking no se guardan con el modelo
+            estimator.pop_oof()
+        if units:
+            seconds_per_unit = fit_seconds / units
+        elif seconds_per_unit is None:
+            # Until an ensemble step is timed, a tree/iteration is assumed to cost a baseline fit
+            seconds_per_unit = fit_seconds
+
+        score = float(accuracy_score(y_val, estimator.predict(X_val)))
+        entry = {"step": name, "params": params, "fit_seconds": round(fit_seconds, 3),
+                 "validation_accuracy": score, "checkpoint": None}
+        trace.append(entry)
+        if score > best_score:
+            # Los ensembles que siguen creciendo son el mismo objeto: se guarda una copia
+            best, best_score, best_step = copy.deepcopy(estimator), score, i
+            if checkpoint is not None:
+                checkpoint_start = time.monotonic()
+                entry["checkpoint"] = checkpoint(best, entry)
+                reserve = max(reserve, time.monotonic() - checkpoint_start)
+
+    return best, {
+        "steps": trace,
+        "best_step": best_step,
+        "best_score": best_score,
+        "stopped": stopped,
+        "budget_seconds": round(seconds, 3),
+        "elapsed_seconds": round(time.monotonic() - start, 3),
+        "validation_rows": int(len(index_val)),
+    }
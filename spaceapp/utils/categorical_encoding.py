@@ -0,0 +1,228 @@
+# =====================================
+# categorical_encoding.py — codificación de categóricas según su cardinalidad
+# =====================================
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+from sklearn.utils.validation import check_is_fitted
+
+# Opciones del bloque "encoding" del JSON de parámetros
+ENCODING_DEFAULTS = {
+    # auto: one-hot hasta max_onehot categorías; por encima top-K (casi únicas: hashing) para
+    # el Stacking y ordinal (más de 255: frecuencia) para gradient boosting.
+    # onehot: todo one-hot como antes; top_k / hashing / frequency: para las que pasan max_onehot
+    "strategy": "auto",
+    "max_onehot": 32,
+    "top_k": 20,
+    "hash_width": 32,
+}
+STRATEGIES = ("auto", "onehot", "top_k", "hashing", "frequency")
+# Columnas con más valores distintos que este ratio de filas se consideran casi únicas
+NEAR_UNIQUE_RATIO = 0.5
+# Máximo de categorías que HistGradientBoosting trata de forma nativa
+MAX_NATIVE_CATEGORIES = 255
+MISSING = "Unknown"
+
+
+def parse_encoding_options(parameters):
+    """Validated options from the "encoding" block of the parameters JSON"""
+    options = {**ENCODING_DEFAULTS, **(parameters.get("encoding") or {})}
+    unknown = set(options) - set(ENCODING_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown encoding options: {', '.join(sorted(unknown))}")
+    if options["strategy"] not in STRATEGIES:
+        raise ValueError(f"encoding.strategy must be one of {', '.join(STRATEGIES)}")
+    for name in ("max_onehot", "top_k", "hash_width"):
+        value = options[name]
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ValueError(f"encoding.{name} must be a positive integer")
+    return options
+
+
+def _as_strings(values):
+    """Column as an object array of str, missing values -> None"""
+    values = pd.Series(values, copy=False)
+    return values.astype(object).where(values.notna(), None).map(lambda v: v if v is None else str(v)).to_numpy()
+
+
+class FrequencyEncoder(TransformerMixin, BaseEstimator):
+    """Each category replaced by its relative frequency in the training rows (unseen -> 0)"""
+
+    def fit(self, X, y=None):
+        X = pd.DataFrame(X)
+        self.n_features_in_ = X.shape[1]
+        self.feature_names_in_ = np.asarray([str(c) for c in X.columns], dtype=object)
+        self.frequencies_ = [
+            pd.Series(_as_strings(X.iloc[:, j])).fillna(MISSING).value_counts(normalize=True).to_dict()
+            for j in range(X.shape[1])
+        ]
+        return self
+
+    def transform(self, X):
+        check_is_fitted(self, "frequencies_")
+        X = pd.DataFrame(X)
+        out = np.empty((len(X), len(self.frequencies_)), dtype=np.float32)
+        for j, frequencies in enumerate(self.frequencies_):
+            values = pd.Series(_as_strings(X.iloc[:, j])).fillna(MISSING)
+            out[:, j] = values.map(frequencies).fillna(0.0).to_numpy(dtype=np.float32)
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray([f"{c}_frequency" for c in self.feature_names_in_], dtype=object)
+
+
+class HashingEncoder(TransformerMixin, BaseEstimator):
+    """Each column hashed into its own block of n_features columns (sparse, fixed width)"""
+
+    def __init__(self, n_features=32):
+        self.n_features = n_features
+
+    def fit(self, X, y=None):
+        X = pd.DataFrame(X)
+        self.n_features_in_ = X.shape[1]
+        self.feature_names_in_ = np.asarray([str(c) for c in X.columns], dtype=object)
+        return self
+
+    def transform(self, X):
+        check_is_fitted(self, "n_features_in_")
+        X = pd.DataFrame(X)
+        hasher = FeatureHasher(n_features=self.n_features, input_type="string",
+                               alternate_sign=False, dtype=np.float32)
+        blocks = [
+            # Missing values hash to nothing: an all-zero block
+            hasher.transform([] if v is None else [v] for v in _as_strings(X.iloc[:, j]))
+            for j in range(X.shape[1])
+        ]
+        return sparse.hstack(blocks, format="csr", dtype=np.float32)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray([f"{c}_hash{i}" for c in self.feature_names_in_ for i in range(self.n_features)],
+                          dtype=object)
+
+
+def plan_encoding(X, cat_cols, options=None, engine="stacking"):
+    """{column: (strategy, cardinality)} for the categorical columns of X"""
+    options = options or ENCODING_DEFAULTS
+    plan = {}
+    for column in cat_cols:
+        cardinality = int(X[column].nunique(dropna=True))
+        if cardinality <= options["max_onehot"] or options["strategy"] == "onehot":
+            strategy = "onehot"
+        elif options["strategy"] != "auto":
+            strategy = options["strategy"]
+        elif engine == "hist_gradient_boosting":
+            # Hasta 255 categorías siguen siendo nativas (columna "cat")
+            strategy = "onehot" if cardinality <= MAX_NATIVE_CATEGORIES else "frequency"
+        else:
+            strategy = "hashing" if cardinality > NEAR_UNIQUE_RATIO * max(len(X), 1) else "top_k"
+        plan[column] = (strategy, cardinality)
+    return plan
+
+
+def categorical_transformers(plan, options=None, engine="stacking"):
+    """ColumnTransformer entries for the planned columns: cat (one-hot / native), cat_top, cat_hash, cat_freq"""
+    options = options or ENCODING_DEFAULTS
+    groups = {}
+    for column, (strategy, _) in plan.items():
+        groups.setdefault(strategy, []).append(column)
+    if engine == "hist_gradient_boosting":
+        # Códigos ordinales (missing/desconocidas -> NaN) que el modelo trata como categóricos
+        def ordinal(max_categories):
+            return OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=np.nan,
+                                  encoded_missing_value=np.nan, max_categories=max_categories, dtype=np.float32)
+        entries = [
+            ("cat", ordinal(MAX_NATIVE_CATEGORIES), groups.get("onehot", [])),
+            ("cat_top", ordinal(min(options["top_k"] + 1, MAX_NATIVE_CATEGORIES)), groups.get("top_k", [])),
+            ("cat_hash", HashingEncoder(options["hash_width"]), groups.get("hashing", [])),
+            ("cat_freq", FrequencyEncoder(), groups.get("frequency", [])),
+        ]
+    else:
+        entries = [
+            ("cat", Pipeline(steps=[
+                ("imputer", SimpleImputer(strategy="constant", fill_value=MISSING)),
+                ("encoder", OneHotEncoder(handle_unknown="ignore"))
+            ]), groups.get("onehot", [])),
+            # Las top_k más frecuentes + una columna "otras" (incluye las no vistas)
+            ("cat_top", Pipeline(steps=[
+                ("imputer", SimpleImputer(strategy="constant", fill_value=MISSING)),
+                ("encoder", OneHotEncoder(handle_unknown="infrequent_if_exist", max_categories=options["top_k"] + 1))
+            ]), groups.get("top_k", [])),
+            ("cat_hash", HashingEncoder(options["hash_width"]), groups.get("hashing", [])),
+            ("cat_freq", Pipeline(steps=[
+                ("encoder", FrequencyEncoder()),
+                ("scaler", StandardScaler())
+            ]), groups.get("frequency", [])),
+        ]
+    # "cat" siempre está (aunque vacío): retrain_model amplía su vocabulario
+    return [entry for entry in entries if entry[0] == "cat" or entry[2]]
+
+
+def _final_step(transformer):
+    return transformer.steps[-1][1] if isinstance(transformer, Pipeline) else transformer
+
+
+def _column_widths(transformer, columns):
+    """Output columns of a fitted transformer per input column"""
+    step = _final_step(transformer)
+    if isinstance(step, OneHotEncoder):
+        return list(step._n_features_outs)
+    if isinstance(step, HashingEncoder):
+        return [step.n_features] * len(columns)
+    return [1] * len(columns)
+
+
+def _block_bytes(matrix, start, stop):
+    """Memory of output columns [start, stop) of the transformed matrix"""
+    if stop <= start:
+        return 0
+    if sparse.issparse(matrix):
+        block = matrix[:, start:stop]
+        return int(block.nnz * (block.data.itemsize + block.indices.itemsize))
+    return int(matrix.shape[0] * (stop - start) * matrix.dtype.itemsize)
+
+
+def encoding_report(column_transformer, X, Xt):
+    """Strategy, cardinality, output width and memory of each column, plus totals.
+
+    X is the input of the fitted ColumnTransformer and Xt its output on the
+    same rows; onehot_width is the width a plain one-hot of every column
+    would have had.
+    """
+    columns = {}
+    onehot_width = 0
+    for name, transformer, selected in column_transformer.transformers_:
+        if transformer == "drop" or len(selected) == 0 or name not in column_transformer.output_indices_:
+            continue
+        selected = list(selected)
+        offset = column_transformer.output_indices_[name].start
+        strategy = {"cat": "onehot", "cat_top": "top_k", "cat_hash": "hashing", "cat_freq": "frequency"}.get(name)
+        if strategy == "onehot" and not isinstance(_final_step(transformer), OneHotEncoder):
+            strategy = "ordinal"
+        elif strategy == "top_k" and not isinstance(_final_step(transformer), OneHotEncoder):
+            strategy = "ordinal_top_k"
+        for column, width in zip(selected, _column_widths(transformer, selected)):
+            if strategy is None:
+                onehot_width += 1
+                offset += width
+                continue
+            cardinality = int(X[column].nunique(dropna=True))
+            onehot_width += cardinality + int(X[column].isna().any())
+            columns[str(column)] = {
+                "strategy": strategy,
+                "cardinality": cardinality,
+                "width": int(width),
+                "bytes": _block_bytes(Xt, offset, offset + width),
+            }
+            offset += width
+    return {
+        "columns": columns,
+        "width": int(Xt.shape[1]),
+        "bytes": _block_bytes(Xt, 0, Xt.shape[1]),
+        "onehot_width": int(onehot_width),
+    }
@@ -0,0 +1,357 @@
+# =====================================
+# compiled_pipeline.py — inferencia NumPy del pipeline Stacking
+# =====================================
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier, StackingClassifier
+from sklearn.frozen import FrozenEstimator
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from utils.feature_engineering import FeatureEngineer
+
+# Rows evaluated at once by the tree walker; bounds the (rows x trees) temporaries
+BLOCK_ROWS = 4096
+
+
+class CompileError(ValueError):
+    """The fitted object uses a component the NumPy engine does not implement"""
+
+
+def _softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=1, keepdims=True)
+    return z
+
+
+def _expit(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+# ============
+# 1️⃣ Preprocesamiento
+# ============
+class CompiledPreprocessor:
+    """ColumnTransformer[num: median imputer + scaler, cat: constant imputer + one-hot] as flat arrays"""
+
+    def __init__(self, column_transformer):
+        self.feature_names_in = np.asarray(getattr(column_transformer, "feature_names_in_", []), dtype=object)
+        self.num_columns = []
+        self.num_fill = np.empty(0)
+        self.num_mean = np.empty(0)
+        self.num_scale = np.empty(0)
+        self.cat_columns = []
+        self.cat_fill = "Unknown"
+        self.cat_categories = []
+        self.n_features_out = 0
+
+        for name, transformer, columns in column_transformer.transformers_:
+            if transformer == "drop" or len(columns) == 0:
+                continue
+            # Incremental retrains freeze the transformers they keep (utils/incremental.py)
+            if isinstance(transformer, FrozenEstimator):
+                transformer = transformer.estimator
+            steps = transformer.steps if isinstance(transformer, Pipeline) else [(name, transformer)]
+            kinds = [type(step) for _, step in steps]
+            columns = self._column_names(columns)
+            if kinds == [SimpleImputer, StandardScaler]:
+                self._compile_numeric(columns, steps[0][1], steps[1][1])
+            elif kinds == [SimpleImputer, OneHotEncoder]:
+                self._compile_categorical(columns, steps[0][1], steps[1][1])
+            else:
+                raise CompileError(f"Unsupported transformer '{name}': {kinds}")
+
+        self.n_features_out = len(self.num_columns) + sum(len(c) for c in self.cat_categories)
+
+    def _column_names(self, columns):
+        columns = list(columns)
+        if columns and isinstance(columns[0], (int, np.integer)):
+            return [self.feature_names_in[i] for i in columns]
+        return columns
+
+    def _compile_numeric(self, columns, imputer, scaler):
+        if self.num_columns:
+            raise CompileError("Only one numeric transformer is supported")
+        if imputer.strategy not in ("median", "mean", "most_frequent", "constant"):
+            raise CompileError(f"Unsupported imputer strategy {imputer.strategy}")
+        statistics = np.asarray(imputer.statistics_, dtype=np.float64)
+        # SimpleImputer drops columns that were entirely missing during fit
+        keep = ~np.isnan(statistics) if not imputer.keep_empty_features else np.ones(len(columns), bool)
+        self.num_columns = [c for c, k in zip(columns, keep) if k]
+        self.num_fill = np.nan_to_num(statistics[keep])
+        n = len(self.num_columns)
+        self.num_mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(n)
+        self.num_scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(n)
+
+    def _compile_categorical(self, columns, imputer, encoder):
+        if self.cat_columns:
+            raise CompileError("Only one categorical transformer is supported")
+        if imputer.strategy != "constant" or encoder.drop is not None:
+            raise CompileError("Only constant imputation and one-hot without drop are supported")
+        if getattr(encoder, "_infrequent_enabled", False):
+            raise CompileError("Infrequent category grouping is not supported")
+        self.cat_columns = list(columns)
+        self.cat_fill = imputer.fill_value
+        self.cat_categories = [np.asarray(c, dtype=object) for c in encoder.categories_]
+
+    def transform(self, X):
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(np.asarray(X), columns=self.feature_names_in)
+        n = len(X)
+        out = np.zeros((n, self.n_features_out), dtype=np.float64)
+
+        n_num = len(self.num_columns)
+        if n_num:
+            block = X[self.num_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+            block = np.where(np.isnan(block), self.num_fill, block)
+            out[:, :n_num] = (block - self.num_mean) / self.num_scale
+
+        offset = n_num
+        for column, categories in zip(self.cat_columns, self.cat_categories):
+            values = X[column].to_numpy(dtype=object, copy=True)
+            # Like SimpleImputer(missing_values=np.nan): NaN is imputed, None is a category of its own
+            values[pd.isna(values) & (values != None)] = self.cat_fill  # noqa: E711
+            inverse, uniques = pd.factorize(values, use_na_sentinel=False)
+            index = {category: i for i, category in enumerate(categories.tolist())}
+            # factorize reports the remaining None values as NaN
+            codes = np.array(
+                [index.get(None if pd.isna(u) else u, -1) for u in uniques], dtype=np.int64
+            )[inverse]
+            # Unknown categories (code -1) stay all-zero, like handle_unknown="ignore"
+            known = np.flatnonzero(codes >= 0)
+            out[known, offset + codes[known]] = 1.0
+            offset += len(categories)
+        return out
+
+
+# ============
+# 2️⃣ Árboles
+# ============
+class CompiledTreeEnsemble:
+    """All trees of a forest / AdaBoost ensemble concatenated into flat node arrays"""
+
+    def __init__(self, estimator):
+        if isinstance(estimator, RandomForestClassifier):
+            self.kind = "forest"
+            trees = estimator.estimators_
+            self.weights = np.empty(0)
+            self.weight_total = 1.0
+        elif isinstance(estimator, AdaBoostClassifier):
+            if getattr(estimator, "algorithm", "SAMME") == "SAMME.R":
+                raise CompileError("Only the SAMME AdaBoost algorithm is supported")
+            self.kind = "adaboost"
+            trees = estimator.estimators_
+            self.weights = np.asarray(estimator.estimator_weights_[:len(trees)], dtype=np.float64)
+            self.weight_total = float(np.sum(estimator.estimator_weights_))
+        elif isinstance(estimator, DecisionTreeClassifier):
+            self.kind = "forest"
+            trees = [estimator]
+            self.weights = np.empty(0)
+            self.weight_total = 1.0
+        else:
+            raise CompileError(f"Unsupported tree ensemble {type(estimator).__name__}")
+
+        self.n_classes = len(estimator.classes_)
+        features, thresholds, lefts, rights, missing_left, values, roots = [], [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for tree in trees:
+            if not isinstance(tree, DecisionTreeClassifier) or tree.n_outputs_ != 1:
+                raise CompileError("Only single-output DecisionTreeClassifier members are supported")
+            if not np.array_equal(tree.classes_, np.arange(self.n_classes)) and \
+                    not np.array_equal(tree.classes_, estimator.classes_):
+                raise CompileError("Tree classes do not match the ensemble classes")
+            t = tree.tree_
+            left = t.children_left.astype(np.int64)
+            right = t.children_right.astype(np.int64)
+            features.append(np.where(left < 0, 0, t.feature).astype(np.int64))
+            thresholds.append(t.threshold.astype(np.float64))
+            lefts.append(np.where(left < 0, -1, left + offset))
+            rights.append(np.where(right < 0, -1, right + offset))
+            missing = getattr(t, "missing_go_to_left", None)
+            missing_left.append(np.zeros(t.node_count, bool) if missing is None else missing.astype(bool))
+            # Normalise leaf values to class probabilities, as DecisionTreeClassifier.predict_proba does
+            value = t.value[:, 0, :self.n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts)
+        self.right = np.concatenate(rights)
+        self.missing_left = np.concatenate(missing_left)
+        self.value = np.concatenate(values)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.max_depth = max_depth
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_rows, n_trees)"""
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        node = np.repeat(self.roots[None, :], len(X), axis=0)
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            internal = left >= 0
+            if not internal.any():
+                break
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(internal, np.where(go_left, left, self.right[node]), node)
+        return node
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        if self.kind == "forest":
+            return self.value[leaves].mean(axis=1)
+
+        # AdaBoost (SAMME): weighted votes of each stump's argmax class
+        k = self.n_classes
+        votes = self.value[leaves].argmax(axis=2)
+        support = np.zeros((len(X), k))
+        for c in range(k):
+            support[:, c] = (votes == c) @ self.weights
+        decision = (support - (self.weights.sum() - support) / (k - 1)) / self.weight_total
+        if k == 2:
+            decision = (decision[:, 1] - decision[:, 0])
+            return _softmax(np.vstack([-decision, decision]).T / 2)
+        return _softmax(decision / (k - 1))
+
+
+# ============
+# 3️⃣ Meta-learner y stacking
+# ============
+class CompiledLogisticRegression:
+    def __init__(self, estimator):
+        if not isinstance(estimator, LogisticRegression):
+            raise CompileError(f"Unsupported final estimator {type(estimator).__name__}")
+        self.coef = np.asarray(estimator.coef_, dtype=np.float64)
+        self.intercept = np.asarray(estimator.intercept_, dtype=np.float64)
+        multi_class = getattr(estimator, "multi_class", "auto")
+        self.ovr = multi_class in ("ovr", "warn") or (
+            multi_class in ("auto", "deprecated")
+            and (len(estimator.classes_) <= 2 or estimator.solver == "liblinear")
+        )
+
+    def predict_proba(self, X):
+        decision = X @ self.coef.T + self.intercept
+        if self.ovr:
+            prob = _expit(decision)
+            if prob.shape[1] == 1:
+                return np.hstack([1 - prob, prob])
+            return prob / prob.sum(axis=1, keepdims=True)
+        if decision.shape[1] == 1:
+            decision = np.hstack([-decision, decision])
+        return _softmax(decision)
+
+
+class CompiledStacking:
+    def __init__(self, estimator):
+        if any(method != "predict_proba" for method in estimator.stack_method_):
+            raise CompileError("Only predict_proba stacking is supported")
+        self.members = [
+            CompiledTreeEnsemble(est) for est in estimator.estimators_ if est != "drop"
+        ]
+        self.final = CompiledLogisticRegression(estimator.final_estimator_)
+        self.passthrough = estimator.passthrough
+        self.binary = len(estimator.classes_) == 2
+
+    def predict_proba(self, X):
+        meta = []
+        for member in self.members:
+            proba = member.predict_proba(X)
+            meta.append(proba[:, 1:] if self.binary else proba)
+        if self.passthrough:
+            meta.append(X)
+        return self.final.predict_proba(np.hstack(meta))
+
+
+def _compile_estimator(estimator):
+    if isinstance(estimator, StackingClassifier):
+        return CompiledStacking(estimator)
+    if isinstance(estimator, (RandomForestClassifier, AdaBoostClassifier, DecisionTreeClassifier)):
+        return CompiledTreeEnsemble(estimator)
+    if isinstance(estimator, LogisticRegression):
+        return CompiledLogisticRegression(estimator)
+    raise CompileError(f"Unsupported estimator {type(estimator).__name__}")
+
+
+# ============
+# 4️⃣ Pipeline compilado
+# ============
+class CompiledPipeline:
+    """Fitted Pipeline([FeatureEngineer ->] ColumnTransformer -> Stacking/forest/LR) evaluated with plain NumPy.
+
+    Every fitted parameter is stored as a numpy array, so the object can be
+    dumped with joblib and mapped back read-only with mmap_mode="r".
+    """
+
+    def __init__(self, pipe):
+        if isinstance(pipe, Pipeline):
+            steps = [step for _, step in pipe.steps if step not in (None, "passthrough")]
+        else:
+            steps = [pipe]
+        # FeatureEngineer is already vectorized; it runs as is ahead of the flat preprocessor
+        self.features = steps.pop(0) if len(steps) == 3 and isinstance(steps[0], FeatureEngineer) else None
+        if len(steps) == 2 and isinstance(steps[0], ColumnTransformer):
+            self.preprocessor = CompiledPreprocessor(steps[0])
+        elif len(steps) == 1:
+            self.preprocessor = None
+        else:
+            raise CompileError("Expected Pipeline([FeatureEngineer,] ColumnTransformer, estimator) or a bare estimator")
+        self.estimator = _compile_estimator(steps[-1])
+        self.classes_ = np.asarray(pipe.classes_)
+        self.n_features_in_ = getattr(pipe, "n_features_in_", None)
+
+    def predict_proba(self, X):
+        if self.features is not None:
+            if not isinstance(X, pd.DataFrame):
+                X = pd.DataFrame(np.asarray(X), columns=self.features.feature_names_in_).infer_objects()
+            X = self.features.transform(X)
+        if self.preprocessor is not None:
+            X = self.preprocessor.transform(X)
+        else:
+            X = np.asarray(X, dtype=np.float64)
+        n = len(X)
+        if n <= BLOCK_ROWS:
+            return self.estimator.predict_proba(X)
+        return np.vstack([
+            self.estimator.predict_proba(X[start:start + BLOCK_ROWS])
+            for start in range(0, n, BLOCK_ROWS)
+        ])
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def compile_pipeline(pipe):
+    """Turn a fitted pipeline into a CompiledPipeline (raises CompileError if unsupported)"""
+    return CompiledPipeline(pipe)
+
+
+def compare_latency(pipe, compiled, X, batch_sizes=(1, 10, 100, 1000), repeat=5):
+    """Median predict_proba latency (seconds) of the sklearn and compiled paths per batch size"""
+    results = {}
+    for size in batch_sizes:
+        batch = X.iloc[:size] if isinstance(X, pd.DataFrame) else X[:size]
+        timings = {"sklearn": [], "compiled": []}
+        for _ in range(repeat):
+            for name, model in (("sklearn", pipe), ("compiled", compiled)):
+                start = time.perf_counter()
+                model.predict_proba(batch)
+                timings[name].append(time.perf_counter() - start)
+        results[size] = {name: float(np.median(values)) for name, values in timings.items()}
+        results[size]["speedup"] = results[size]["sklearn"] / max(results[size]["compiled"], 1e-12)
+    return results
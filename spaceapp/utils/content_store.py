@@ -0,0 +1,146 @@
+# =====================================
+# content_store.py — archivos subidos guardados una sola vez por contenido
+# =====================================
+
+import hashlib
+import os
+import re
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+# CONTENT_STORE en settings; DIR es relativo a MEDIA_ROOT
+STORE_DEFAULTS = {
+    "DIR": "files/blobs",
+    # Un blob sin referencias se conserva este tiempo (una nueva subida lo reutiliza)
+    "GRACE_SECONDS": 3600,
+}
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+MAX_SUFFIX = 16
+
+
+def store_settings():
+    return {**STORE_DEFAULTS, **getattr(settings, "CONTENT_STORE", {})}
+
+
+def blob_digest(path):
+    """sha256 of a stored blob, read from its name; None for files outside the store"""
+    path = Path(str(path))
+    stem = path.name.split(".", 1)[0]
+    if DIGEST_PATTERN.match(stem) and path.parent.name == stem[:2]:
+        return stem
+    return None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """MEDIA_ROOT storage that keeps a single file per distinct content.
+
+    Uploads are hashed while their chunks are written to a temporary file
+    and published as <DIR>/<sha[:2]>/<sha><ext>; bytes that are already
+    stored reuse the existing file. Several rows may point at one blob, so
+    delete() leaves blobs alone: uploaddata.Blob counts the rows referencing
+    each one (acquire/release, kept up to date by model signals) and
+    collect_garbage() removes those left without references. Names saved
+    before the store existed keep working as plain files.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The stored name depends on the content and is chosen in _save
+        return name
+
+    def _save(self, name, content):
+        directory = store_settings()["DIR"]
+        tmp_dir = Path(self.path(directory)) / ".tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = tmp_dir / uuid.uuid4().hex
+        sha, size = hashlib.sha256(), 0
+        try:
+            with open(tmp_path, "wb") as handle:
+                for chunk in content.chunks():
+                    sha.update(chunk)
+                    handle.write(chunk)
+                    size += len(chunk)
+            digest = sha.hexdigest()
+            blob_name = f"{directory}/{digest[:2]}/{digest}{Path(name).suffix.lower()[:MAX_SUFFIX]}"
+            self._publish(blob_name, digest, size, tmp_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return blob_name
+
+    def _publish(self, name, digest, size, tmp_path):
+        """Move the upload into place unless the blob exists; its row lock keeps garbage collection out"""
+        from uploaddata.models import Blob
+
+        with transaction.atomic():
+            Blob.objects.select_for_update().get_or_create(name=name, defaults={"sha256": digest, "size": size})
+            target = Path(self.path(name))
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, target)
+                if self.file_permissions_mode is not None:
+                    os.chmod(target, self.file_permissions_mode)
+            # Starts the grace period: the row saving this name acquires it right after
+            Blob.objects.filter(name=name).update(lastUsed=timezone.now())
+
+    def delete(self, name):
+        if blob_digest(name) is None:
+            super().delete(name)
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def acquire(name):
+    """Count one more row referencing a blob (no-op for files outside the store)"""
+    if not name or blob_digest(name) is None:
+        return
+    from uploaddata.models import Blob
+
+    Blob.objects.filter(name=name).update(refCount=F("refCount") + 1, lastUsed=timezone.now())
+
+
+def release(name):
+    """Count one row less referencing a blob; unreferenced blobs are collected after the grace period.
+
+    Once the deleting transaction commits only this blob is checked, which
+    removes it right away when GRACE_SECONDS is 0; the collect_blobs
+    management command removes the others once their grace period is over.
+    """
+    if not name or blob_digest(name) is None:
+        return
+    from uploaddata.models import Blob
+
+    Blob.objects.filter(name=name, refCount__gt=0).update(refCount=F("refCount") - 1, lastUsed=timezone.now())
+    # Files are only removed once the deleting transaction is committed
+    transaction.on_commit(lambda: collect_garbage(names=[name]))
+
+
+def collect_garbage(grace_seconds=None, storage=None, names=None):
+    """Delete blobs (all of them, or only names) nobody has referenced for grace_seconds; returns their names"""
+    from uploaddata.models import Blob
+
+    if grace_seconds is None:
+        grace_seconds = store_settings()["GRACE_SECONDS"]
+    storage = storage or blob_storage
+    cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+    candidates = Blob.objects.filter(refCount=0, lastUsed__lte=cutoff)
+    if names is not None:
+        candidates = candidates.filter(name__in=names)
+    removed = []
+    for name in candidates.values_list("name", flat=True):
+        with transaction.atomic():
+            # Re-checked under the row lock: an upload may have reused the blob meanwhile
+            blob = Blob.objects.select_for_update().filter(name=name, refCount=0, lastUsed__lte=cutoff).first()
+            if blob is not None:
+                blob.delete()
+                Path(storage.path(name)).unlink(missing_ok=True)
+                removed.append(name)
+    return removed
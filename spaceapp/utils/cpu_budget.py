@@ -0,0 +1,152 @@
+# =====================================
+# cpu_budget.py — presupuesto de CPU para trabajos de entrenamiento y predicción
+# =====================================
+
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import joblib
+from joblib import parallel_config
+from threadpoolctl import threadpool_limits
+
+# CPU_BUDGET en settings; 0 = todas las CPUs disponibles / todo el presupuesto de trabajos
+BUDGET_DEFAULTS = {
+    "CPUS": 0,
+    "PREDICTION_RESERVED_CPUS": 1,
+    "TRAINING_JOB_CPUS": 0,
+    "PREDICTION_JOB_CPUS": 1,
+    "REQUEST_THREADS": 1,
+}
+
+
+@contextmanager
+def cpu_allotment(cpus):
+    """Run the block with at most cpus BLAS/OpenMP threads and joblib workers.
+
+    Estimators built with n_jobs=None take their worker count from the
+    joblib config, so nested ensembles/CV stay inside the allotment instead
+    of each claiming every core.
+    """
+    if cpus is None:
+        yield
+        return
+    with threadpool_limits(limits=cpus), parallel_config(n_jobs=cpus):
+        yield
+
+
+class CpuScheduler:
+    """Hands each job an explicit number of CPUs out of a fixed budget.
+
+    submit() queues (fn, args) and runs it on the given executor as
+    fn(*args, cpus=n) once n CPUs are free; the CPUs return to the budget
+    when the job finishes. Jobs start in submission order, so a large job
+    is never starved by a stream of small ones.
+
+    The budget is per process: with N web workers (e.g. gunicorn --workers N)
+    each one schedules its own jobs, so up to N x budget CPUs can be busy.
+    Lower CPU_BUDGET["CPUS"] accordingly, or serve with a single worker
+    process for jobs.
+    """
+
+    def __init__(self, total):
+        self.total = max(1, int(total))
+        self.in_use = 0
+        self.started = 0
+        self.queued = 0
+        self._queue = deque()
+        # Reentrant: done callbacks of already finished futures run inline
+        self._lock = threading.RLock()
+
+    def submit(self, executor, cpus, fn, *args):
+        """Future of fn(*args, cpus=...) on executor, started when the budget allows"""
+        cpus = max(1, min(int(cpus), self.total))
+        future = Future()
+        with self._lock:
+            if self._queue or self.in_use + cpus > self.total:
+                self.queued += 1
+            self._queue.append((executor, cpus, fn, args, future))
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        while self._queue and self.in_use + self._queue[0][1] <= self.total:
+            executor, cpus, fn, args, future = self._queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.in_use += cpus
+            self.started += 1
+            try:
+                inner = executor.submit(fn, *args, cpus=cpus)
+            except Exception as e:
+                self.in_use -= cpus
+                future.set_exception(e)
+                continue
+            inner.add_done_callback(lambda done, cpus=cpus, future=future: self._finished(done, cpus, future))
+
+    def _finished(self, done, cpus, future):
+        with self._lock:
+            self.in_use -= cpus
+            self._dispatch()
+        if done.cancelled():
+            future.cancel()
+        elif done.exception() is not None:
+            future.set_exception(done.exception())
+        else:
+            future.set_result(done.result())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cpus": self.total,
+                "in_use": self.in_use,
+                "waiting": len(self._queue),
+                "started": self.started,
+                "queued": self.queued,
+            }
+
+
+def budget_settings():
+    from django.conf import settings
+
+    options = {**BUDGET_DEFAULTS, **getattr(settings, "CPU_BUDGET", {})}
+    cpus = options["CPUS"] or joblib.cpu_count()
+    # CPUs left to the HTTP workers serving /predict; jobs share the rest
+    options["JOB_CPUS"] = max(1, cpus - options["PREDICTION_RESERVED_CPUS"])
+    return options
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Scheduler shared by the training and prediction job pools of this server process"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CpuScheduler(budget_settings()["JOB_CPUS"])
+        return _scheduler
+
+
+def submit_job(executor, kind, fn, *args):
+    """Queue a "training" or "prediction" worker job with its configured CPU allotment"""
+    options = budget_settings()
+    cpus = options["TRAINING_JOB_CPUS"] if kind == "training" else options["PREDICTION_JOB_CPUS"]
+    return get_scheduler().submit(executor, cpus or options["JOB_CPUS"], fn, *args)
+
+
+def limit_request_threads():
+    """Cap the BLAS/OpenMP threads of this web worker process at REQUEST_THREADS; returns the cap.
+
+    threadpool_limits is process-wide: wrapping each request in it would
+    race between request threads and re-scan the loaded libraries on every
+    call, so each web worker applies it once at start-up (spaceapp/startup.py).
+    Only libraries already loaded are limited. Job workers are separate
+    processes and take their own allotment (cpu_allotment).
+    """
+    threads = budget_settings()["REQUEST_THREADS"]
+    if threads:
+        threadpool_limits(limits=threads)
+    return threads
@@ -0,0 +1,126 @@
+# =====================================
+# evaluation.py — métricas de test desde una sola pasada de predict_proba
+# =====================================
+
+import numpy as np
+from sklearn.metrics import auc, average_precision_score, precision_recall_curve, roc_curve
+
+# Opciones del bloque "evaluation" del JSON de parámetros
+EVALUATION_DEFAULTS = {
+    # Máximo de puntos por curva ROC/PR en la respuesta (None = sin límite)
+    "curve_points": 101,
+    # Error máximo permitido al simplificar una curva (None = no simplificar por error)
+    "curve_tolerance": None,
+}
+
+
+def parse_evaluation_options(parameters):
+    """Validated curve options from the "evaluation" block of the parameters JSON"""
+    options = {**EVALUATION_DEFAULTS, **(parameters.get("evaluation") or {})}
+    unknown = set(options) - set(EVALUATION_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown evaluation options: {', '.join(sorted(unknown))}")
+    points, tolerance = options["curve_points"], options["curve_tolerance"]
+    if points is not None and (not isinstance(points, int) or points < 2):
+        raise ValueError("evaluation.curve_points must be an integer >= 2")
+    if tolerance is not None and (not isinstance(tolerance, (int, float)) or tolerance <= 0):
+        raise ValueError("evaluation.curve_tolerance must be a positive number")
+    return options
+
+
+def _simplify(x, y, tolerance):
+    """Ramer-Douglas-Peucker: indices of the points kept so no dropped point is farther than tolerance"""
+    keep = np.zeros(len(x), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(x) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        norm = np.hypot(dx, dy)
+        distance = np.abs(dx * py - dy * px) / norm if norm > 0 else np.hypot(px, py)
+        i = int(np.argmax(distance))
+        if distance[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.extend(((start, split), (split, end)))
+    return np.flatnonzero(keep)
+
+
+def downsample_curve(x, y, max_points=None, tolerance=None):
+    """Curve reduced for the response; endpoints are always kept.
+
+    tolerance drops points within that distance of the simplified polyline;
+    max_points then keeps points evenly spaced along the curve length.
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    index = np.arange(len(x))
+    if tolerance is not None and len(x) > 2:
+        index = _simplify(x, y, tolerance)
+    if max_points is not None and len(index) > max_points:
+        length = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(x[index]), np.diff(y[index])))])
+        targets = np.linspace(0.0, length[-1], max_points)
+        picks = np.searchsorted(length, targets).clip(0, len(index) - 1)
+        picks[[0, -1]] = [0, len(index) - 1]
+        index = index[np.unique(picks)]
+    return x[index], y[index]
+
+
+def _curve(x, y, options):
+    x, y = downsample_curve(x, y, options["curve_points"], options["curve_tolerance"])
+    return {"x": np.round(x, 6).tolist(), "y": np.round(y, 6).tolist()}
+
+
+def evaluate_probabilities(y_true, y_prob, classes, options=None):
+    """Every test metric from one predict_proba matrix (rows x classes).
+
+    Labels are its argmax; accuracy and macro precision/recall/F1 come from
+    one confusion matrix, AUC and average precision from the full-resolution
+    curves, and only the downsampled ROC/PR curves go in the response.
+    Returns (y_pred, metrics).
+    """
+    options = options or EVALUATION_DEFAULTS
+    classes = np.asarray(classes)
+    y_prob = np.asarray(y_prob)
+    true_index = np.searchsorted(classes, np.asarray(y_true))
+    pred_index = y_prob.argmax(axis=1)
+    n_classes = len(classes)
+
+    cm = np.bincount(true_index * n_classes + pred_index, minlength=n_classes ** 2).reshape(n_classes, n_classes)
+    tp = np.diag(cm).astype(np.float64)
+    predicted, actual = cm.sum(axis=0), cm.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros(n_classes), where=predicted > 0)
+    recall = np.divide(tp, actual, out=np.zeros(n_classes), where=actual > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(n_classes),
+                   where=(precision + recall) > 0)
+
+    result = {
+        "confusion_matrix": cm.tolist(),
+        "accuracy": float(tp.sum() / max(cm.sum(), 1)),
+        "precision": float(precision.mean()),
+        "recall": float(recall.mean()),
+        "f1_score": float(f1.mean()),
+    }
+
+    roc_auc, roc_curves, average_precision, pr_curves = {}, {}, {}, {}
+    for i, c in enumerate(classes):
+        positives = true_index == i
+        if positives.all() or not positives.any():
+            # ROC/PR undefined for a class absent from (or alone in) the test split
+            continue
+        fpr, tpr, _ = roc_curve(positives, y_prob[:, i])
+        roc_auc[f"roc_auc_class_{c}"] = float(auc(fpr, tpr))
+        roc_curves[f"fpr_class_{c}"] = _curve(fpr, tpr, options)
+        precision_c, recall_c, _ = precision_recall_curve(positives, y_prob[:, i])
+        average_precision[f"average_precision_class_{c}"] = float(average_precision_score(positives, y_prob[:, i]))
+        # Recall ascending, as for the ROC x axis
+        pr_curves[f"pr_class_{c}"] = _curve(recall_c[::-1], precision_c[::-1], options)
+    result.update({
+        "auc": roc_auc,
+        "roc_curve": roc_curves,
+        "average_precision": average_precision,
+        "pr_curve": pr_curves,
+    })
+    return classes[pred_index], result
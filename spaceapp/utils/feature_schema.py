@@ -0,0 +1,82 @@
+# =====================================
+# feature_schema.py — esquema de features por modelo
+# =====================================
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_VERSION = 1
+
+
+def build_feature_schema(X, target="disposition"):
+    """Names, order, dtypes and categorical vocabularies of the training features"""
+    dtypes, categories = {}, {}
+    for column in X.columns:
+        series = X[column]
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            dtypes[column] = "float64"
+        else:
+            dtypes[column] = "object"
+            categories[column] = sorted(str(v) for v in series.dropna().unique())
+    return {
+        "version": SCHEMA_VERSION,
+        "target": target,
+        "columns": [str(c) for c in X.columns],
+        "dtypes": {str(k): v for k, v in dtypes.items()},
+        "categories": {str(k): v for k, v in categories.items()},
+    }
+
+
+def extend_schema(schema, categories_added):
+    """Feature schema of a retrained version: same columns, vocabularies grown with the new values"""
+    if not schema:
+        return schema
+    schema = {**schema, "categories": dict(schema.get("categories", {}))}
+    for column, values in categories_added.items():
+        schema["categories"][column] = sorted(set(schema["categories"].get(column, [])) | set(values))
+    return schema
+
+
+class FeatureProjection:
+    """Precompiled reorder/fill/cast of uploaded rows into the model's training layout"""
+
+    def __init__(self, schema, dtype=np.float64, index_col="kepler_name"):
+        self.columns = list(schema["columns"])
+        self.dtypes = dict(schema["dtypes"])
+        self.categorical = [c for c in self.columns if self.dtypes.get(c) == "object"]
+        self.dtype = np.dtype(dtype)
+        self.index_col = index_col
+        self._wanted = set(self.columns) | {index_col}
+
+    def read_csv_kwargs(self):
+        """usecols/dtype for pd.read_csv so only the model's columns are ever parsed"""
+        return {
+            "usecols": lambda column: column in self._wanted,
+            "dtype": {c: (str if self.dtypes[c] == "object" else self.dtype) for c in self.columns},
+        }
+
+    def project(self, df):
+        """Columns in training order, missing ones filled with NaN, in one pass.
+
+        All-numeric schemas give one C-contiguous float block; schemas with
+        categorical columns give a DataFrame keeping the string columns.
+        """
+        n = len(df)
+        if not self.categorical:
+            out = np.empty((n, len(self.columns)), dtype=self.dtype)
+            for j, column in enumerate(self.columns):
+                if column in df.columns:
+                    out[:, j] = df[column].to_numpy(dtype=self.dtype, na_value=np.nan)
+                else:
+                    out[:, j] = np.nan
+            return out
+
+        data = {}
+        for column in self.columns:
+            if column in df.columns:
+                series = df[column]
+                data[column] = series.astype(object) if column in self.categorical else \
+                    series.to_numpy(dtype=self.dtype, na_value=np.nan)
+            else:
+                data[column] = np.full(n, np.nan, dtype=object if column in self.categorical else self.dtype)
+        return pd.DataFrame(data, index=df.index, columns=self.columns)
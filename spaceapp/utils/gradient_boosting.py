@@ -0,0 +1,49 @@
+# =====================================
+# gradient_boosting.py — motor HistGradientBoosting (missing y categorías nativos)
+# =====================================
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.preprocessing import OrdinalEncoder
+
+from utils.categorical_encoding import HashingEncoder, categorical_transformers
+
+
+def build_gradient_boosting_preprocessor(num_cols, plan, options=None):
+    """Numeric columns untouched, categorical ones encoded per plan (see plan_encoding).
+
+    No imputation, scaling or one-hot: the model bins raw values and routes
+    NaN natively; categorical columns become ordinal codes (missing/unseen
+    -> NaN) the model treats as categories, or frequency/hash features when
+    they have too many values.
+    """
+    return ColumnTransformer(
+        transformers=[("num", "passthrough", list(num_cols))]
+        + categorical_transformers(plan, options, engine="hist_gradient_boosting"),
+        sparse_threshold=0,
+    )
+
+
+def categorical_mask(preprocessor):
+    """Boolean mask of the output columns the model should treat as categorical (the ordinal codes)"""
+    mask = []
+    for _, transformer, columns in preprocessor.transformers:
+        if isinstance(transformer, HashingEncoder):
+            mask += [False] * transformer.n_features * len(columns)
+        else:
+            mask += [isinstance(transformer, OrdinalEncoder)] * len(columns)
+    return np.array(mask, dtype=bool)
+
+
+def build_gradient_boosting_model(categorical_features=None):
+    """HistGradientBoosting with early stopping on a 10% validation split"""
+    return HistGradientBoostingClassifier(
+        max_iter=500,
+        learning_rate=0.1,
+        early_stopping=True,
+        validation_fraction=0.1,
+        n_iter_no_change=10,
+        categorical_features=categorical_features,
+        random_state=42,
+    )
@@ -0,0 +1,310 @@
+# =====================================
+# incremental.py — reentrenamiento incremental del pipeline Stacking
+# =====================================
+
+import copy
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.frozen import FrozenEstimator
+from sklearn.metrics import accuracy_score
+
+# Valores por columna numérica guardados para recalcular medianas
+RESERVOIR_SIZE = 4096
+# Filas de entrenamiento guardadas para reajustar el meta-modelo
+META_SAMPLE_SIZE = 2048
+STATE_VERSION = 2
+
+
+def _unfrozen(transformer):
+    """Fitted transformer inside the FrozenEstimator a previous retrain may have wrapped it in"""
+    return transformer.estimator if isinstance(transformer, FrozenEstimator) else transformer
+
+
+def _pipeline_parts(pipe):
+    ct = pipe.named_steps["preprocessor"]
+    parts = {name: (_unfrozen(transformer), list(columns)) for name, transformer, columns in ct.transformers_}
+    num_pipe, num_cols = parts.get("num", (None, []))
+    cat_pipe, cat_cols = parts.get("cat", (None, []))
+    return ct, (num_pipe if num_cols else None), num_cols, (cat_pipe if cat_cols else None), cat_cols
+
+
+def _engineered(pipe, X):
+    """Input of the ColumnTransformer: X after the FeatureEngineer step, when the pipeline has one"""
+    features = pipe.named_steps.get("features")
+    return features.transform(X) if features is not None else X
+
+
+def _merge_positions(n_sample, count, n_new, rng, size):
+    """Positions to keep from a previous sample (of count items) and from a new batch, so the
+    kept items are a uniform sample of both"""
+    total = count + n_new
+    if total <= size:
+        return np.arange(n_sample), np.arange(n_new)
+    k_old = min(rng.binomial(size, count / total), n_sample)
+    k_new = min(size - k_old, n_new)
+    return np.sort(rng.choice(n_sample, k_old, replace=False)), np.sort(rng.choice(n_new, k_new, replace=False))
+
+
+def _merge_sample(sample, count, values, rng, size=RESERVOIR_SIZE):
+    """Uniform sample of the union of a previous sample (of count values) and a new batch"""
+    keep_old, keep_new = _merge_positions(len(sample), count, len(values), rng, size)
+    return np.concatenate([sample[keep_old], values[keep_new]]), count + len(values)
+
+
+def build_incremental_state(pipe, X, y, random_state=42):
+    """Statistics kept next to a fitted pipeline so it can be retrained on appended rows.
+
+    Besides the numeric samples, a uniform sample of the rows themselves is
+    kept to refit the meta-learner; add their out-of-fold meta-features with
+    with_meta_features once the stacking model is fitted.
+    """
+    rng = np.random.default_rng(random_state)
+    _, _, num_cols, _, _ = _pipeline_parts(pipe)
+    X_engineered = _engineered(pipe, X)
+    counts, samples = [], []
+    for column in num_cols:
+        values = pd.to_numeric(X_engineered[column], errors="coerce").dropna().to_numpy(dtype=np.float64)
+        sample, count = _merge_sample(np.empty(0), 0, values, rng)
+        counts.append(count)
+        samples.append(sample)
+    _, positions = _merge_positions(0, 0, len(X), rng, META_SAMPLE_SIZE)
+    labels, label_counts = np.unique(np.asarray(y), return_counts=True)
+    return {
+        "version": STATE_VERSION,
+        "n_rows": int(len(X)),
+        "class_counts": {str(k): int(v) for k, v in zip(labels.tolist(), label_counts.tolist())},
+        "num_columns": num_cols,
+        "num_counts": counts,
+        "num_samples": samples,
+        "meta_rows": X.iloc[positions],
+        "meta_labels": np.asarray(y)[positions],
+        "meta_positions": positions,
+        "random_state": random_state,
+    }
+
+
+def with_meta_features(state, stacking, oof_meta):
+    """Copy of the state with the out-of-fold base-model predictions of its sampled rows.
+
+    oof_meta is what the stacking fit gave its final estimator for every
+    training row (OOFStackingClassifier.pop_oof), in the order of the X the
+    state was built from; only the prediction columns are kept, the
+    passthrough ones are recomputed by each retrain.
+    """
+    state = dict(state)
+    positions = state.pop("meta_positions")
+    if oof_meta is None:
+        return state
+    n_passthrough = stacking.n_features_in_ if stacking.passthrough else 0
+    meta = oof_meta[positions]
+    meta = meta.toarray() if sparse.issparse(meta) else np.asarray(meta)
+    state["meta_features"] = meta[:, :meta.shape[1] - n_passthrough].astype(np.float64)
+    return state
+
+
+def _with_every_class(X, y, n_classes):
+    """Zero-weight copies of the first row for classes missing from y, so fitted classes_ stay aligned"""
+    missing = np.setdiff1d(np.arange(n_classes), y)
+    weights = np.ones(len(y))
+    if len(missing) == 0:
+        return X, y, weights
+    pad = X[np.zeros(len(missing), dtype=int)]
+    X = sparse.vstack([X, pad], format="csr") if sparse.issparse(X) else np.vstack([X, pad])
+    return X, np.concatenate([y, missing]), np.concatenate([weights, np.zeros(len(missing))])
+
+
+def _remap_tree(tree, index_map, n_features):
+    """Move split features to their new output positions (thresholds are unchanged)"""
+    feature = tree.tree_.feature
+    internal = np.flatnonzero(feature >= 0)
+    feature[internal] = index_map[feature[internal]]
+    tree.n_features_in_ = n_features
+
+
+def _refit_preprocessor(ct, X, categories):
+    """Copy of a fitted ColumnTransformer whose one-hot vocabularies are the given categories.
+
+    The "cat" encoder is refitted on X with categories= set to the extended
+    vocabularies (old categories first, so their columns keep their order);
+    every other fitted transformer is frozen and keeps its statistics.
+    """
+    fitted = {name: transformer for name, transformer, _ in ct.transformers_}
+    transformers = []
+    for name, transformer, columns in ct.transformers:
+        if name == "cat" and len(columns):
+            transformer = clone(_unfrozen(fitted[name])).set_params(encoder__categories=categories)
+        elif not isinstance(transformer, str) and len(columns):
+            transformer = FrozenEstimator(_unfrozen(fitted[name]))
+        transformers.append((name, transformer, columns))
+    return clone(ct).set_params(transformers=transformers).fit(X)
+
+
+def _output_index_map(ct, new_ct, old_sizes, new_sizes):
+    """Old output position -> new output position (new categories go after each feature's block)"""
+    n_old_out = max((block.stop for block in ct.output_indices_.values()), default=0)
+    index_map = np.arange(n_old_out)
+    for name, block in ct.output_indices_.items():
+        new_start = new_ct.output_indices_[name].start
+        if name != "cat":
+            index_map[block] = np.arange(new_start, new_start + block.stop - block.start)
+            continue
+        old_offset, new_offset = block.start, new_start
+        for old_size, new_size in zip(old_sizes, new_sizes):
+            index_map[old_offset:old_offset + old_size] = np.arange(new_offset, new_offset + old_size)
+            old_offset += old_size
+            new_offset += new_size
+    return index_map
+
+
+def incremental_retrain(pipe, state, X_new, y_new, n_new_trees=None):
+    """New version of a fitted stacking pipeline updated with appended rows only.
+
+    - numeric imputer medians come from a bounded running sample; the
+      fitted standardization is left as is so existing splits and
+      coefficients keep their meaning (the sample's mean only measures drift)
+    - the preprocessor is refitted with the one-hot vocabularies extended by
+      unseen categories (its other transformers are frozen)
+    - existing trees (RF and AdaBoost) are remapped to the new one-hot
+      positions so they keep making the same splits
+    - the RandomForest grows n_new_trees warm-started trees fitted on the new
+      rows (by default in proportion to the share of new rows)
+    - the LogisticRegression meta-learner is refitted, warm-started from its
+      coefficients (moved to the new one-hot positions), on the new rows plus
+      the state's sample of earlier rows, so it does not forget them. Like
+      the stacking fit, it learns from base-model predictions on rows those
+      models were not fitted on: the stored out-of-fold ones for the sample,
+      the current version's for the new rows. States without them (version
+      1) keep the moved coefficients
+    The input pipeline and state are not modified. Returns (pipe, state, report).
+    """
+    pipe = copy.deepcopy(pipe)
+    state = copy.deepcopy(state)
+    rng = np.random.default_rng(state.get("random_state", 42) + state["n_rows"])
+    ct, num_pipe, num_cols, cat_pipe, cat_cols = _pipeline_parts(pipe)
+    stacking = pipe.named_steps["model"]
+    classes = stacking.classes_
+    unknown = set(pd.unique(y_new)) - set(classes.tolist())
+    if unknown:
+        raise ValueError(f"New rows have labels the model was not trained on: {sorted(map(str, unknown))}")
+    y_encoded = np.searchsorted(classes, np.asarray(y_new))
+    X_raw, X_new = X_new, _engineered(pipe, X_new)
+
+    # Out-of-sample view of the new rows through the current version
+    Xt_before = ct.transform(X_new)
+    meta_before = stacking.transform(Xt_before)
+    previous_accuracy = accuracy_score(y_encoded, stacking.final_estimator_.predict(meta_before))
+    n_old_out = Xt_before.shape[1]
+    predictions_new = meta_before[:, :meta_before.shape[1] - (n_old_out if stacking.passthrough else 0)]
+    predictions_new = predictions_new.toarray() if sparse.issparse(predictions_new) else np.asarray(predictions_new)
+
+    # --- Numeric statistics ---
+    if num_pipe is not None:
+        imputer = num_pipe.named_steps["imputer"]
+        for j, column in enumerate(num_cols):
+            values = pd.to_numeric(X_new[column], errors="coerce").dropna().to_numpy(dtype=np.float64)
+            state["num_samples"][j], state["num_counts"][j] = _merge_sample(
+                state["num_samples"][j], state["num_counts"][j], values, rng
+            )
+            # Columns the imputer dropped as empty stay dropped so the output width is stable
+            if not np.isnan(imputer.statistics_[j]) and len(state["num_samples"][j]):
+                imputer.statistics_[j] = np.median(state["num_samples"][j])
+
+    # --- Categorical vocabularies ---
+    added_categories = {}
+    old_sizes, categories = [], []
+    if cat_pipe is not None:
+        encoder = cat_pipe.named_steps["encoder"]
+        imputed = cat_pipe.named_steps["imputer"].transform(X_new[cat_cols])
+        for j, known in enumerate(encoder.categories_):
+            seen = set(known.tolist())
+            new_values = [v for v in pd.unique(imputed[:, j]) if v not in seen]
+            old_sizes.append(len(known))
+            categories.append(np.concatenate([known, np.array(new_values, dtype=object)]) if new_values else known)
+            if new_values:
+                added_categories[cat_cols[j]] = [str(v) for v in new_values]
+    new_ct = _refit_preprocessor(ct, X_new, categories)
+    pipe.set_params(preprocessor=new_ct)
+    new_sizes = [len(c) for c in categories]
+    index_map = _output_index_map(ct, new_ct, old_sizes, new_sizes)
+    n_new_out = n_old_out + sum(new_sizes) - sum(old_sizes)
+
+    for estimator in stacking.estimators_:
+        for tree in getattr(estimator, "estimators_", []):
+            _remap_tree(tree, index_map, n_new_out)
+        estimator.n_features_in_ = n_new_out
+
+    # --- Grow the RandomForest on the new rows ---
+    Xt_new = new_ct.transform(X_new)
+    rf = stacking.named_estimators_["rf"]
+    n_old_trees = len(rf.estimators_)
+    if n_new_trees is None:
+        n_new_trees = max(10, int(round(n_old_trees * len(X_new) / max(state["n_rows"], 1))))
+    X_fit, y_fit, weights = _with_every_class(Xt_new, y_encoded, len(classes))
+    rf.set_params(warm_start=True, n_estimators=n_old_trees + n_new_trees)
+    rf.fit(X_fit, y_fit, sample_weight=weights)
+    rf.set_params(warm_start=False)
+
+    # --- Meta-learner: passthrough features move with the one-hot columns ---
+    final = stacking.final_estimator_
+    if stacking.passthrough:
+        n_meta = final.coef_.shape[1] - n_old_out
+        coef = np.zeros((final.coef_.shape[0], n_meta + n_new_out))
+        coef[:, :n_meta] = final.coef_[:, :n_meta]
+        coef[:, n_meta + index_map] = final.coef_[:, n_meta:]
+        final.coef_ = coef
+        final.n_features_in_ = n_meta + n_new_out
+    meta_refitted = "meta_features" in state
+    if meta_refitted:
+        rows = pd.concat([state["meta_rows"], X_raw])
+        labels = np.concatenate([np.searchsorted(classes, state["meta_labels"]), y_encoded])
+        X_meta = np.vstack([state["meta_features"], predictions_new])
+        if stacking.passthrough:
+            Xt_rows = new_ct.transform(_engineered(pipe, rows))
+            X_meta = sparse.hstack([X_meta, Xt_rows], format="csr") if sparse.issparse(Xt_rows) \
+                else np.hstack([X_meta, Xt_rows])
+        X_meta, labels, weights = _with_every_class(X_meta, labels, len(classes))
+        final.set_params(warm_start=True)
+        final.fit(X_meta, labels, sample_weight=weights)
+        final.set_params(warm_start=False)
+
+        # The sample stays uniform over every row seen so far
+        keep_old, keep_new = _merge_positions(len(state["meta_rows"]), state["n_rows"], len(X_raw), rng,
+                                              META_SAMPLE_SIZE)
+        state["meta_rows"] = pd.concat([state["meta_rows"].iloc[keep_old], X_raw.iloc[keep_new]])
+        state["meta_labels"] = np.concatenate([state["meta_labels"][keep_old], np.asarray(y_new)[keep_new]])
+        state["meta_features"] = np.vstack([state["meta_features"][keep_old], predictions_new[keep_new]])
+
+    accuracy = accuracy_score(np.asarray(y_new), pipe.predict(X_raw))
+
+    state["n_rows"] += int(len(X_new))
+    labels, label_counts = np.unique(np.asarray(y_new), return_counts=True)
+    for label, count in zip(labels.tolist(), label_counts.tolist()):
+        state["class_counts"][str(label)] = state["class_counts"].get(str(label), 0) + int(count)
+
+    drift = {}
+    if num_pipe is not None:
+        # Shift of the sampled mean in units of the fitted standardization;
+        # large values mean a full retrain is due. The scaler only has the
+        # columns the imputer kept.
+        scaler = num_pipe.named_steps["scaler"]
+        kept = [j for j in range(len(num_cols)) if not np.isnan(imputer.statistics_[j])]
+        for k, j in enumerate(kept):
+            if len(state["num_samples"][j]):
+                mean = state["num_samples"][j].mean()
+                drift[num_cols[j]] = round(float((mean - scaler.mean_[k]) / scaler.scale_[k]), 4)
+
+    report = {
+        "rows_added": int(len(X_new)),
+        "rows_total": state["n_rows"],
+        "trees_added": int(n_new_trees),
+        "trees_total": int(n_old_trees + n_new_trees),
+        "categories_added": added_categories,
+        "numeric_mean_drift": drift,
+        "meta_learner_refitted": meta_refitted,
+        "previous_accuracy_on_new_rows": float(previous_accuracy),
+        "accuracy_on_new_rows": float(accuracy),
+    }
+    return pipe, state, report
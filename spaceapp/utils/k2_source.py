@@ -7,13 +7,18 @@ import pandas as pd
 import matplotlib.pyplot as plt
 # import seaborn as sns
 import numpy as np
+import os
+import time
 import warnings
 
 warnings.filterwarnings("ignore")
 
-from sklearn.ensemble import RandomForestClassifier, AdaBoostClassifier, StackingClassifier
+from sklearn.ensemble import (
+    RandomForestClassifier, AdaBoostClassifier, StackingClassifier, HistGradientBoostingClassifier
+)
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
+from sklearn.base import clone
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import (
     accuracy_score,
@@ -37,77 +42,109 @@ from sklearn.impute import SimpleImputer
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 
+from utils.categorical_encoding import (
+    categorical_transformers, encoding_report, parse_encoding_options, plan_encoding
+)
+from utils.feature_engineering import FeatureEngineer
+from utils.gradient_boosting import (
+    build_gradient_boosting_model, build_gradient_boosting_preprocessor, categorical_mask
+)
+from utils.feature_schema import build_feature_schema, extend_schema
+from utils.tabular_io import read_compact, read_dataset
+from utils.stacking import OOFStackingClassifier
+from utils.search import parse_parameters, successive_halving_search
+from utils.incremental import build_incremental_state, incremental_retrain, with_meta_features
+from utils.evaluation import evaluate_probabilities, parse_evaluation_options
+from utils.anytime import anytime_fit, budget_ladder, parse_time_budget
+
 
 # ============
 # 1️⃣ Load Data
 # ============
-def load_data(path):
-    """Carga dataset tabular K2"""
-    df = pd.read_csv(path, sep=",")
+# Columnas de identificadores y referencias, sin valor predictivo
+NON_PREDICTIVE_COLUMNS = (
+    "rowid", "pl_name", "hostname", "epic_hostname", "epic_candname",
+    "tic_id", "gaia_id", "disp_refname", "disc_refname", "pl_refname",
+    "st_refname", "sy_refname", "k2_name", "hd_name", "hip_name"
+)
+MAX_MISSING_RATIO = 0.95
+
+
+def _is_dropped_column(column):
+    return str(column).startswith("Unnamed") or column in NON_PREDICTIVE_COLUMNS
+
+
+def load_data(path, cache_dir=None, target="disposition", max_missing=None, low_memory=True):
+    """Carga dataset tabular K2 (CSV, Parquet, Feather o Arrow)
+
+    low_memory: una primera pasada barata mide missing y tipos por columna y
+    la segunda lee solo las columnas útiles, numéricas en float32 y textos
+    de baja cardinalidad como category. Con max_missing también se omiten
+    las columnas con más missing que ese ratio (nunca target).
+    """
+    if low_memory:
+        # Con cache_dir, los CSV guardados en disco se leen desde su copia columnar
+        df, _ = read_compact(path, drop=_is_dropped_column, max_missing=max_missing,
+                             keep=(target,), cache_dir=cache_dir)
+        return df
+    df = read_dataset(path, cache_dir=cache_dir, sep=",")
     df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
     return df
 
 
+def engineer_features(X):
+    """Agrega las features derivadas fuera del Pipeline (modelos guardados antes de FeatureEngineer)"""
+    return FeatureEngineer().fit_transform(X)
+
+
 # =========================
 # 2️⃣ Preprocesamiento total
 # =========================
-def build_preprocessor(df, target="disposition"):
-    """Crea preprocesador sklearn con limpieza, imputación y feature engineering"""
-
+def training_columns(df, target="disposition"):
+    """X (sin identificadores ni columnas casi vacías) e y del dataset"""
     # --- Eliminar columnas no predictivas ---
-    drop_cols = [
-        "rowid", "pl_name", "hostname", "epic_hostname", "epic_candname",
-        "tic_id", "gaia_id", "disp_refname", "disc_refname", "pl_refname",
-        "st_refname", "sy_refname", "k2_name", "hd_name", "hip_name"
-    ]
-    df = df.drop(columns=[c for c in drop_cols if c in df.columns], errors="ignore")
+    df = df.drop(columns=[c for c in NON_PREDICTIVE_COLUMNS if c in df.columns], errors="ignore")
 
     # --- Eliminar columnas con >95% de missing ---
     missing_ratio = df.isnull().mean()
-    high_missing = missing_ratio[missing_ratio > 0.95].index
+    high_missing = missing_ratio[missing_ratio > MAX_MISSING_RATIO].index.difference([target])
     df = df.drop(columns=high_missing, errors="ignore")
 
     # --- Separar X, y ---
-    X = df.drop(columns=[target])
-    y = df[target]
-
-    # --- Feature Engineering ---
-    # Planetas por estrella
-    if {"sy_pnum", "sy_snum"}.issubset(X.columns):
-        X["planets_per_star"] = X["sy_pnum"] / X["sy_snum"].replace(0, np.nan)
-    # Lunas por planeta
-    if {"sy_mnum", "sy_pnum"}.issubset(X.columns):
-        X["moons_per_planet"] = X["sy_mnum"] / X["sy_pnum"].replace(0, np.nan)
-    # Antigüedad
-    if "disc_year" in X.columns:
-        X["discovery_age"] = 2025 - X["disc_year"]
-    # Nivel de observación
-    obs_cols = [c for c in X.columns if c.startswith(("st_nphot", "st_nrvc", "pl_ntranspec"))]
-    if len(obs_cols) > 0:
-        X["well_observed"] = (X[obs_cols].sum(axis=1) > 0).astype(int)
-    # Espacial / terrestre
-    if "disc_locale" in X.columns:
-        X["space_based"] = X["disc_locale"].apply(lambda x: 1 if isinstance(x, str) and "space" in x.lower() else 0)
-
-    # --- Identificar tipos ---
-    num_cols = X.select_dtypes(include=["int64", "float64"]).columns
-    cat_cols = X.select_dtypes(include=["object", "category"]).columns
+    return df.drop(columns=[target]), df[target]
+
+
+def build_preprocessor(df, target="disposition", engine="stacking", encoding=None):
+    """Crea preprocesador sklearn con limpieza e imputación.
+
+    X se devuelve sin las features derivadas: build_pipeline antepone
+    FeatureEngineer, así también se calculan al predecir. Con engine
+    "hist_gradient_boosting" no hay imputación ni one-hot: las categorías
+    pasan como códigos ordinales y los missing quedan como NaN. encoding
+    (opciones de parse_encoding_options) decide cómo se codifica cada
+    categórica según su cardinalidad: one-hot solo para las de pocas
+    categorías, top-K + "otras", hashing o frecuencia para el resto.
+    """
+
+    X, y = training_columns(df, target)
+
+    # --- Identificar tipos (después del feature engineering, que corre dentro del Pipeline) ---
+    engineered = FeatureEngineer().fit(X).transform(X.iloc[:0])
+    num_cols = engineered.select_dtypes(include=["number"]).columns
+    cat_cols = engineered.select_dtypes(include=["object", "category"]).columns
+    plan = plan_encoding(X, [c for c in cat_cols if c in X.columns], encoding, engine)
+    if engine == "hist_gradient_boosting":
+        return X, y, build_gradient_boosting_preprocessor(num_cols, plan, encoding)
 
     # --- Pipelines ---
     numeric_transformer = Pipeline(steps=[
         ("imputer", SimpleImputer(strategy="median")),
         ("scaler", StandardScaler())
     ])
-    categorical_transformer = Pipeline(steps=[
-        ("imputer", SimpleImputer(strategy="constant", fill_value="Unknown")),
-        ("encoder", OneHotEncoder(handle_unknown="ignore"))
-    ])
 
+    # "num" y "cat" (one-hot) primero: retrain_model amplía el vocabulario de "cat"
     preprocessor = ColumnTransformer(
-        transformers=[
-            ("num", numeric_transformer, num_cols),
-            ("cat", categorical_transformer, cat_cols)
-        ]
+        transformers=[("num", numeric_transformer, num_cols)] + categorical_transformers(plan, encoding)
     )
 
     return X, y, preprocessor
@@ -116,119 +153,421 @@ def build_preprocessor(df, target="disposition"):
 # ============================================
 # 3️⃣ Entrenamiento, evaluación y guardado
 # ============================================
-def train_and_select_model(path="k2_data.csv", target="disposition"):
-    """Entrena solo el modelo Stacking con preprocesamiento avanzado"""
-    data_response = {}
-
-    # 1. Cargar data
-    df = load_data(path)
-    # print("Available columns:", df.columns.tolist())
-
-    X, y, preprocessor = build_preprocessor(df, target)
+CV_FOLDS = 5
+# fast: estimación desde las predicciones out-of-fold del propio Stacking (un solo ajuste; su
+#       preprocesamiento vio todo train, así que es algo optimista); otros motores: como full
+# full: CV de 5 folds del pipeline completo, preprocesamiento incluido, antes del ajuste final
+CV_MODES = ("fast", "full")
+DEFAULT_CV_MODE = "full"
+# Aviso que acompaña en la respuesta a la estimación fast del Stacking
+FAST_CV_NOTE = ("Estimated from the stacking fit's own out-of-fold predictions, refitting only the "
+                "meta-learner; the preprocessing was fitted on all training rows, so it is optimistic "
+                "compared with cv_mode 'full'")
+# stacking: RF + AdaBoost -> LogisticRegression (admite retrain_model)
+# hist_gradient_boosting: HistGradientBoosting con missing y categorías nativos y early stopping
+ENGINES = ("stacking", "hist_gradient_boosting")
+TRAINING_STAGES = ("load", "preprocess", "search", "cv", "fit", "evaluate")
+
+
+def report_progress(progress, stage, step=0, steps=1):
+    """Avisa al callback progress(stage, step, steps), si existe"""
+    if progress is not None:
+        progress(stage, step, steps)
+
+
+def build_pipeline(preprocessor, model):
+    """FeatureEngineer -> preprocesador -> modelo, el pipeline que se guarda y se usa al predecir"""
+    return Pipeline(steps=[
+        ("features", FeatureEngineer()),
+        ("preprocessor", preprocessor),
+        ("model", model)
+    ])
 
-    # 2. Split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
 
-    # 3. Definir solo modelo Stacking
-    stacking_model = StackingClassifier(
+def build_stacking_model():
+    """Stacking RF + AdaBoost -> LogisticRegression con los valores por defecto"""
+    return OOFStackingClassifier(
         estimators=[
             ("rf", RandomForestClassifier(n_estimators=100, random_state=42)),
             ("ada", AdaBoostClassifier(n_estimators=100, random_state=42)),
         ],
         final_estimator=LogisticRegression(max_iter=500),
         passthrough=True,
-        n_jobs=-1
+        # None: workers from the job's CPU allotment (utils/cpu_budget.py), not every core
+        n_jobs=None
     )
 
-    # 4. Pipeline y Cross-validation
-    pipe = Pipeline(steps=[
-        ("preprocessor", preprocessor),
-        ("model", stacking_model)
-    ])
-    scores = cross_val_score(pipe, X_train, y_train, cv=5, scoring="accuracy")
-    print(f"\nStacking: {scores.mean():.4f} (+/- {scores.std():.4f})")
-
-    # 5. Entrenar final
-    pipe.fit(X_train, y_train)
-
-    # 6. Guardar modelo
-    joblib.dump(pipe, "best_model.pkl")
-    print("📦 Modelo guardado como 'best_model.pkl'")
-
-    # 7. Evaluar
-    y_pred = pipe.predict(X_test)
-    print("\n📊 Classification Report:\n", classification_report(y_test, y_pred))
-
-    # === Matriz de confusión ===
-    cm = confusion_matrix(y_test, y_pred)
-    data_response['confusion_matrix'] = cm.tolist()
-    
-    """ plt.figure(figsize=(6, 5))
-    sns.heatmap(cm, annot=True, fmt="d", cmap="Blues",
-                xticklabels=pipe.classes_,
-                yticklabels=pipe.classes_)
-    plt.xlabel("Predicción")
-    plt.ylabel("Real")
-    plt.title("Matriz de confusión")
-    plt.savefig("confusion_matrix.png", dpi=300)
-    plt.close() """
-
-    # Calculate metrics
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred, average='macro')
-    recall = recall_score(y_test, y_pred, average='macro')
-    f1 = f1_score(y_test, y_pred, average='macro')
-    
-    y_prob = pipe.predict_proba(X_test)
-
-    data_response["accuracy"] = accuracy
-    data_response["precision"] = precision
-    data_response["recall"] = recall
-    data_response["f1_score"] = f1
-
-    # === Curva ROC Multiclase ===
-    try:
-        classes = pipe.classes_
-        y_test_bin = label_binarize(y_test, classes=classes)
-        y_score = pipe.predict_proba(X_test)
-        fpr, tpr, roc_auc = dict(), dict(), dict()
-        roc_auc_data = {}
-        roc_curve_data = {}
-        for i, c in enumerate(classes):
-            fpr[i], tpr[i], _ = roc_curve(y_test_bin[:, i], y_score[:, i])
-            
-            roc_curve_data[f"fpr_class_{c}"] = {
-                "x": fpr[i].tolist(),
-                "y": tpr[i].tolist()
-            }
-            roc_auc[i] = auc(fpr[i], tpr[i])
-            roc_auc_data[f"roc_auc_class_{c}"] = roc_auc[i]
-        data_response["auc"] = roc_auc_data
-        data_response["roc_curve"] = roc_curve_data
-
-        """ plt.figure(figsize=(7, 6))
-        for i, c in enumerate(classes):
-            plt.plot(fpr[i], tpr[i], label=f"{c} (AUC = {roc_auc[i]:.2f})")
-        plt.plot([0, 1], [0, 1], "k--")
-        plt.xlabel("False Positive Rate")
-        plt.ylabel("True Positive Rate")
-        plt.title("Curva ROC Multiclase (OvR)")
-        plt.legend(loc="lower right")
-        plt.savefig("roc_curve.png", dpi=300)
-        plt.close()
-        print("📈 Curva ROC guardada en 'roc_curve.png'") """
-    except Exception as e:
-        print("⚠️ No se pudo generar la curva ROC:", e)
+
+def parse_engine(parameters):
+    """Motor elegido con "engine" en el JSON de parámetros (por defecto stacking)"""
+    engine = parameters.get("engine") or "stacking"
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
+    return engine
+
+
+def build_model(engine="stacking", preprocessor=None):
+    """Modelo sin ajustar del motor; el de gradient boosting toma sus columnas categóricas del preprocesador"""
+    if engine == "hist_gradient_boosting":
+        return build_gradient_boosting_model(categorical_mask(preprocessor) if preprocessor is not None else None)
+    return build_stacking_model()
+
+
+TEST_SIZE = 0.2
+SPLIT_RANDOM_STATE = 42
+
+
+def preprocessing_config(target, engine="stacking", encoding=None):
+    """Todo lo que, junto al contenido del dataset, determina el preprocesamiento ajustado"""
+    return {
+        "target": target,
+        "engine": engine,
+        "encoding": encoding,
+        "test_size": TEST_SIZE,
+        "random_state": SPLIT_RANDOM_STATE,
+        "max_missing": MAX_MISSING_RATIO,
+        "non_predictive": list(NON_PREDICTIVE_COLUMNS),
+    }
+
+
+def split_training_rows(X, y):
+    """Split train/test fijo (mismas filas en cada entrenamiento del mismo dataset)"""
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=SPLIT_RANDOM_STATE, stratify=y)
+
+
+def training_rows(df, target="disposition"):
+    """Filas de train sin transformar, para la CV y la búsqueda (el preprocesamiento se ajusta en cada fold)"""
+    X_train, _, y_train, _ = split_training_rows(*training_columns(df, target))
+    return X_train, y_train.to_numpy()
+
+
+def prepare_training_data(df, target="disposition", engine="stacking", encoding=None):
+    """Split train/test y ajuste del preprocesamiento (FeatureEngineer + ColumnTransformer) sobre train.
+
+    Devuelve el preprocesador ajustado, las matrices ya transformadas, las
+    etiquetas, el estado para retrain_model (solo stacking), el esquema de
+    features y el ancho/memoria de la codificación de cada categórica. En
+    "rows" van además las filas de train sin transformar (no se guardan en
+    la caché), ver training_rows.
+    """
+    X, y, preprocessor = build_preprocessor(df, target, engine, encoding)
+    X_train, X_test, y_train, y_test = split_training_rows(X, y)
+    features = FeatureEngineer()
+    X_engineered = features.fit_transform(X_train)
+    Xt_train = preprocessor.fit_transform(X_engineered)
+    fitted = Pipeline(steps=[("features", features), ("preprocessor", preprocessor)])
+    return {
+        "preprocessor": fitted,
+        "state": build_incremental_state(fitted, X_train, y_train) if engine == "stacking" else None,
+        "X_train": Xt_train,
+        "X_test": fitted.transform(X_test),
+        "y_train": y_train.to_numpy(),
+        "y_test": y_test.to_numpy(),
+        "rows": (X_train, y_train.to_numpy()),
+        # Esquema de entrada (orden, dtypes, vocabularios) guardado junto al MLModel
+        "meta": {
+            "feature_schema": build_feature_schema(X, target),
+            "encoding": encoding_report(preprocessor, X_engineered, Xt_train),
+        },
+    }
+
+
+def registry_metadata(data_response, started):
+    """Metadata de una versión registrada: tiempo, esquema y métricas escalares (sin curvas)"""
+    metrics = ("accuracy", "precision", "recall", "f1_score", "auc", "average_precision", "cv_accuracy", "retrain")
+    metadata = {"engine": data_response.get("engine", "stacking")}
+    metadata.update({
+        "training_seconds": round(time.perf_counter() - started, 3),
+        "metrics": {name: data_response[name] for name in metrics if name in data_response},
+    })
+    if "feature_schema" in data_response:
+        metadata["feature_schema"] = data_response["feature_schema"]
+    return metadata
+
+
+def version_summary(record):
+    """Resumen de una versión registrada para la respuesta"""
+    return {
+        "lineage": record["lineage"],
+        "version": record["version"],
+        "codec": record["codec"],
+        "bytes": record["total_bytes"],
+        "load_seconds": record["artifacts"]["model"]["load_seconds"],
+        "artifacts": sorted(name for name, entry in record["artifacts"].items() if "sha256" in entry),
+    }
+
+
+def register_version(registry, registration, artifacts, files, data_response, started):
+    """Guarda la versión en el ModelRegistry y resume dónde quedó para la respuesta"""
+    registration = dict(registration or {})
+    metadata = {**registration.pop("metadata", {}), **registry_metadata(data_response, started)}
+    version, directory = registry.register(artifacts=artifacts, files=files, metadata=metadata, **registration)
+    record = registry.metadata(registration["lineage"], version)
+    print(f"📦 Modelo registrado como versión {version} en '{directory}' ({record['codec']}, {record['total_bytes']} bytes)")
+    return version_summary(record)
+
+
+def registry_checkpoint(registry, registration, preprocessor, data_response, started, state=None,
+                        on_checkpoint=None):
+    """Callback de anytime_fit: registra cada mejor modelo hasta el momento como versión checkpoint.
+
+    El Stacking se registra con su estado de retrain_model; on_checkpoint(summary)
+    se llama con cada versión registrada (p. ej. para crear o actualizar el MLModel).
+    """
+    def checkpoint(fitted, entry):
+        metadata = {
+            **(registration or {}).get("metadata", {}),
+            "checkpoint": True, "step": entry["step"], "validation_accuracy": entry["validation_accuracy"],
+        }
+        artifacts = {"model": Pipeline(steps=preprocessor.steps + [("model", fitted)])}
+        if state is not None and isinstance(fitted, OOFStackingClassifier):
+            artifacts["state"] = state
+        summary = register_version(registry, {**(registration or {}), "metadata": metadata}, artifacts,
+                                   None, data_response, started)
+        if on_checkpoint is not None:
+            on_checkpoint(summary)
+        return summary["version"]
+    return checkpoint
+
+
+def train_and_select_model(path="k2_data.csv", target="disposition", cache_dir=None, progress=None,
+                           cv_mode=DEFAULT_CV_MODE, parameters=None, model_path="best_model.pkl", state_path=None,
+                           preprocessing_cache=None, registry=None, registration=None, on_checkpoint=None):
+    """Entrena el modelo del motor elegido (Stacking por defecto) con preprocesamiento avanzado.
+
+    parameters es el JSON de MLModel.parameters: "engine" elige el motor
+    (ENGINES), "params" fija hiperparámetros
+    y "search" define el espacio de la búsqueda por successive halving;
+    "evaluation" limita los puntos de las curvas ROC/PR de la respuesta.
+    Con "time_budget_seconds" (desde el inicio de la carga) no hay búsqueda
+    ni CV: anytime_fit ajusta etapas cada vez más caras mientras quede
+    tiempo, registra la mejor hasta el momento y se queda con ella.
+    Con state_path se guardan también las estadísticas para retrain_model
+    (solo el motor stacking las tiene).
+    El ajuste final y el test usan el preprocesamiento ajustado una vez sobre
+    train y sus matrices transformadas, que con preprocessing_cache
+    (PreprocessingCache) se reutilizan entre entrenamientos del mismo dataset.
+    La búsqueda y la CV, en cambio, ajustan el preprocesamiento dentro de
+    cada fold (sin fuga de medianas, escalas ni categorías del fold
+    evaluado); solo la estimación "fast" del Stacking sale de las
+    predicciones out-of-fold del ajuste sobre train ya transformado.
+    Con registry (ModelRegistry) el modelo, su estado y las predicciones de
+    test se guardan como una versión nueva; registration son los argumentos
+    de ModelRegistry.register (lineage, codec, metadata, ...). Sin registry
+    se escriben en model_path/state_path y junto a model_path. Con
+    presupuesto de tiempo, cada checkpoint se pasa a on_checkpoint(summary) y
+    el elegido se reutiliza como versión final (sin registrarlo otra vez).
+    """
+    started = time.perf_counter()
+    if cv_mode not in CV_MODES:
+        raise ValueError(f"cv_mode must be one of {CV_MODES}, got {cv_mode!r}")
+    engine = parse_engine(parameters or {})
+    encoding = parse_encoding_options(parameters or {})
+    data_response = {"engine": engine}
+
+    # 1. Cargar data y preprocesar (o reutilizar el preprocesamiento guardado)
+    report_progress(progress, "load")
+    data, cache_key, rows = None, None, None
+    if preprocessing_cache is not None:
+        cache_key = preprocessing_cache.key(path, preprocessing_config(target, engine, encoding))
+        data = preprocessing_cache.get(cache_key)
+        data_response["preprocessing_cache"] = {"key": cache_key, "hit": data is not None}
+    if data is None:
+        df = load_data(path, cache_dir=cache_dir, target=target, max_missing=MAX_MISSING_RATIO)
+        # print("Available columns:", df.columns.tolist())
+        report_progress(progress, "preprocess")
+        data = prepare_training_data(df, target, engine, encoding)
+        rows = data.pop("rows")
+        del df
+        if preprocessing_cache is not None:
+            preprocessing_cache.put(cache_key, **data)
+    else:
+        print("♻️ Preprocesamiento reutilizado desde la caché")
+        report_progress(progress, "preprocess")
+    data_response["feature_schema"] = data["meta"]["feature_schema"]
+    data_response["encoding"] = data["meta"].get("encoding")
+    print(f"🧮 Ancho tras codificar: {data_response['encoding']['width']} columnas "
+          f"(one-hot completo: {data_response['encoding']['onehot_width']})")
+
+    # 2. Split (hecho en prepare_training_data)
+    X_train, X_test = data["X_train"], data["X_test"]
+    y_train, y_test = data["y_train"], data["y_test"]
+
+    # 3. Definir el modelo del motor
+    model = build_model(engine, data["preprocessor"].named_steps["preprocessor"])
+    fixed_params, search_options = parse_parameters(parameters or {}, model)
+    evaluation_options = parse_evaluation_options(parameters or {})
+    model.set_params(**fixed_params)
+
+    time_budget = parse_time_budget(parameters or {})
+    oof_meta, checkpoint_version = None, None
+    if time_budget is not None:
+        # 4-5. Con presupuesto: etapas cada vez más caras mientras quede tiempo; la mejor
+        # hasta el momento se registra como checkpoint antes de empezar la siguiente
+        checkpoint = None
+        if registry is not None:
+            # Sin out-of-fold: el retrain de un checkpoint conserva los coeficientes del meta-modelo
+            state = with_meta_features(data["state"], model, None) if data["state"] is not None else None
+            checkpoint = registry_checkpoint(registry, registration, data["preprocessor"], data_response, started,
+                                             state=state, on_checkpoint=on_checkpoint)
+        remaining = time_budget - (time.perf_counter() - started)
+        model, anytime = anytime_fit(budget_ladder(model), X_train, y_train, remaining,
+                                     checkpoint=checkpoint, progress=progress)
+        pipe = Pipeline(steps=data["preprocessor"].steps + [("model", model)])
+        best = anytime["steps"][anytime["best_step"]]
+        checkpoint_version = best["checkpoint"]
+        print(f"\n⏱️ {best['step']} {best['params']} elegido en {anytime['elapsed_seconds']} s ({anytime['stopped']})")
+        data_response["anytime"] = {"time_budget_seconds": time_budget, **anytime}
+        cv_mode, scores = "holdout", np.array([anytime["best_score"]])
+    else:
+        # 4. Búsqueda de hiperparámetros y Cross-validation: pipeline completo en cada fold
+        if rows is None and (search_options is not None or cv_mode == "full" or engine != "stacking"):
+            # Con la caché no se leyó el dataset; las filas sin transformar se vuelven a cargar
+            rows = training_rows(load_data(path, cache_dir=cache_dir, target=target, max_missing=MAX_MISSING_RATIO),
+                                 target)
+
+        def unfitted_pipeline():
+            return clone(Pipeline(steps=data["preprocessor"].steps + [("model", model)]))
+
+        if search_options is not None:
+            report_progress(progress, "search", 0, 1)
+            best_params, best_score, trace = successive_halving_search(
+                unfitted_pipeline(), *rows, search_options, progress=progress, oof=cv_mode == "fast"
+            )
+            model.set_params(**best_params)
+            print(f"\n🔎 Mejores parámetros ({best_score:.4f}): {best_params}")
+            data_response["search"] = {"best_params": best_params, "best_score": best_score, **trace}
+
+        if cv_mode == "full":
+            # Mismos folds que cross_val_score(cv=5), uno a uno para reportar progreso
+            scores = []
+            X_rows, y_rows = rows
+            folds = StratifiedKFold(n_splits=CV_FOLDS).split(X_rows, y_rows)
+            for k, (train_idx, test_idx) in enumerate(folds):
+                report_progress(progress, "cv", k, CV_FOLDS)
+                fold_pipe = unfitted_pipeline().fit(X_rows.iloc[train_idx], y_rows[train_idx])
+                scores.append(accuracy_score(y_rows[test_idx], fold_pipe.predict(X_rows.iloc[test_idx])))
+            scores = np.array(scores)
+        elif engine != "stacking":
+            # Gradient boosting no tiene out-of-fold; sus ajustes son baratos y la CV corre en paralelo
+            scores = cross_val_score(unfitted_pipeline(), *rows, cv=StratifiedKFold(n_splits=CV_FOLDS),
+                                     scoring="accuracy")
+
+        # 5. Entrenar final
+        report_progress(progress, "fit")
+        model.fit(X_train, y_train)
+        # Predicciones out-of-fold de RF/AdaBoost calculadas por el propio ajuste del Stacking
+        oof_meta = model.pop_oof() if engine == "stacking" else None
+        # Pipeline guardado: FeatureEngineer -> ColumnTransformer ya ajustados -> modelo
+        pipe = Pipeline(steps=data["preprocessor"].steps + [("model", model)])
+
+        if cv_mode == "fast" and engine == "stacking":
+            # Solo se reajusta el meta-modelo (LogisticRegression) sobre las features out-of-fold
+            scores = cross_val_score(
+                clone(model.final_estimator), oof_meta, y_train,
+                cv=StratifiedKFold(n_splits=CV_FOLDS), scoring="accuracy"
+            )
+    if isinstance(model, HistGradientBoostingClassifier):
+        data_response["n_iter"] = int(model.n_iter_)
+    print(f"\n{engine} ({cv_mode}): {scores.mean():.4f} (+/- {scores.std():.4f})")
+    optimistic = cv_mode == "fast" and engine == "stacking"
+    data_response["cv_accuracy"] = {"mode": cv_mode, "mean": float(scores.mean()), "std": float(scores.std()),
+                                    "optimistic": optimistic}
+    if optimistic:
+        data_response["cv_accuracy"]["note"] = FAST_CV_NOTE
+
+    # 6. Evaluar: una sola pasada de predict_proba; etiquetas, métricas y curvas salen de ella
+    report_progress(progress, "evaluate")
+    y_prob = model.predict_proba(X_test)
+    y_pred, metrics = evaluate_probabilities(y_test, y_prob, model.classes_, evaluation_options)
+    data_response.update(metrics)
+    print(
+        f"\n📊 Test: accuracy {metrics['accuracy']:.4f} | precision {metrics['precision']:.4f} | "
+        f"recall {metrics['recall']:.4f} | f1 {metrics['f1_score']:.4f}"
+    )
 
     # === Predicciones ===
     pred_df = pd.DataFrame({"Real": y_test, "Predicho": y_pred})
-    pred_df.to_csv("predicciones.csv", index=False)
-    print("📂 Predicciones guardadas en 'predicciones.csv'")
+
+    # 7. Guardar modelo (el estado de retrain_model solo sirve para el Stacking)
+    keep_state = data["state"] is not None and isinstance(model, OOFStackingClassifier)
+    # Sin out-of-fold (presupuesto de tiempo) el retrain conserva los coeficientes del meta-modelo
+    state = with_meta_features(data["state"], model, oof_meta) if keep_state else None
+    if registry is not None and checkpoint_version is not None:
+        # El modelo elegido ya está registrado como checkpoint: se le añade la evaluación
+        record = registry.attach(registration["lineage"], checkpoint_version, files={"predictions.csv": pred_df},
+                                 metadata={**registry_metadata(data_response, started), "final": True})
+        print(f"📦 Versión {checkpoint_version} (checkpoint) elegida como modelo final")
+        data_response["registry"] = version_summary(record)
+    elif registry is not None:
+        artifacts = {"model": pipe}
+        if keep_state:
+            artifacts["state"] = state
+        data_response["registry"] = register_version(
+            registry, registration, artifacts, {"predictions.csv": pred_df}, data_response, started
+        )
+    else:
+        joblib.dump(pipe, model_path)
+        print(f"📦 Modelo guardado como '{model_path}'")
+        if state_path is not None and keep_state:
+            joblib.dump(state, state_path)
+        predictions_path = os.path.join(os.path.dirname(os.path.abspath(model_path)), "predicciones.csv")
+        pred_df.to_csv(predictions_path, index=False)
+        print(f"📂 Predicciones guardadas en '{predictions_path}'")
 
     return data_response
 
+
+def retrain_model(model_path, state_path, path, feature_schema, target="disposition", cache_dir=None,
+                  progress=None, out_model_path="best_model.pkl", out_state_path=None, n_new_trees=None,
+                  registry=None, registration=None):
+    """Nueva versión del modelo entrenada solo con las filas nuevas de path.
+
+    Usa el estado guardado por train_and_select_model: el costo depende del
+    tamaño del lote nuevo y no del histórico completo. feature_schema es el
+    del modelo base; la respuesta trae el de la versión nueva. Con registry
+    la versión se registra igual que en train_and_select_model.
+    """
+    started = time.perf_counter()
+    report_progress(progress, "load")
+    pipe = joblib.load(model_path)
+    state = joblib.load(state_path)
+    df = load_data(path, cache_dir=cache_dir, target=target)
+    if target not in df.columns:
+        raise ValueError(f"Target column '{target}' not found in the new rows")
+
+    report_progress(progress, "preprocess")
+    df = df.dropna(subset=[target])
+    X_new = df.drop(columns=[target])
+    if "features" not in pipe.named_steps:
+        X_new = engineer_features(X_new)
+    # Mismas columnas y orden que el entrenamiento original
+    feature_columns = list(feature_schema["columns"])
+    for column in feature_columns:
+        if column not in X_new.columns:
+            X_new[column] = np.nan
+    X_new = X_new[feature_columns]
+
+    report_progress(progress, "fit")
+    pipe, state, report = incremental_retrain(pipe, state, X_new, df[target], n_new_trees=n_new_trees)
+
+    report_progress(progress, "evaluate")
+    print(f"🔁 Reentrenado con {report['rows_added']} filas nuevas ({report['trees_added']} árboles)")
+    data_response = {
+        "retrain": report,
+        "feature_schema": extend_schema(feature_schema, report["categories_added"]),
+    }
+    if registry is not None:
+        data_response["registry"] = register_version(
+            registry, registration, {"model": pipe, "state": state}, None, data_response, started
+        )
+    else:
+        joblib.dump(pipe, out_model_path)
+        if out_state_path is not None:
+            joblib.dump(state, out_state_path)
+    return data_response
+
+
 def hello():
     print("Hello, World!")
 # if __name__ == "__main__":
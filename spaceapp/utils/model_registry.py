@@ -0,0 +1,215 @@
+# =====================================
+# model_registry.py — registro versionado de modelos entrenados
+# =====================================
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import joblib
+import numpy as np
+import sklearn
+
+# Códecs de joblib: (nombre, nivel); None = sin comprimir (se puede mapear con mmap_mode)
+CODECS = {
+    "none": None,
+    "zlib": ("zlib", 3),
+    "gzip": ("gzip", 3),
+    "bz2": ("bz2", 3),
+    "lzma": ("lzma", 3),
+    "lz4": ("lz4", 3),
+}
+DEFAULT_CODEC = "zlib"
+METADATA_FILE = "metadata.json"
+VERSION_PATTERN = re.compile(r"^v(\d+)$")
+
+
+def check_codec(codec):
+    """Validated codec name (lz4 also needs the lz4 package)"""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}' (expected one of {', '.join(CODECS)})")
+    if codec == "lz4":
+        try:
+            import lz4  # noqa: F401
+        except ImportError:
+            raise ValueError("The lz4 codec needs the lz4 package")
+    return codec
+
+
+def parse_registry_options(parameters, default_codec=DEFAULT_CODEC):
+    """Validated options from the "registry" block of the parameters JSON"""
+    options = {"codec": default_codec, **(parameters.get("registry") or {})}
+    unknown = set(options) - {"codec"}
+    if unknown:
+        raise ValueError(f"Unknown registry options: {', '.join(sorted(unknown))}")
+    check_codec(options["codec"])
+    return options
+
+
+def _sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _dump(obj, path, codec):
+    start = time.perf_counter()
+    compress = CODECS[codec]
+    joblib.dump(obj, path, compress=compress if compress is not None else 0)
+    return time.perf_counter() - start
+
+
+def _timed_load(path):
+    start = time.perf_counter()
+    joblib.load(path)
+    return time.perf_counter() - start
+
+
+def measure_codecs(obj, codecs=None):
+    """Size, dump and load time of obj with each available codec (for choosing one)"""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for codec in codecs or CODECS:
+            try:
+                check_codec(codec)
+            except ValueError:
+                continue
+            path = Path(directory) / f"{codec}.joblib"
+            dump_seconds = _dump(obj, path, codec)
+            results[codec] = {
+                "bytes": path.stat().st_size,
+                "dump_seconds": round(dump_seconds, 4),
+                "load_seconds": round(_timed_load(path), 4),
+            }
+            path.unlink()
+    return results
+
+
+class ModelRegistry:
+    """Model versions on disk: <root>/<lineage>/v<version>/, whose artifacts never change.
+
+    A version holds joblib artifacts (the fitted pipeline as "model", plus
+    e.g. its retrain "state"), optional data files and metadata.json (sizes,
+    checksums, codec, measured load time, training time, schema, metrics).
+    Each version is written into a hidden temporary directory and renamed
+    into place, so concurrent trainings never overwrite each other and
+    readers never see a partial version.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def lineage_dir(self, lineage):
+        return self.root / str(lineage)
+
+    def version_dir(self, lineage, version):
+        return self.lineage_dir(lineage) / f"v{int(version)}"
+
+    def versions(self, lineage):
+        """Registered version numbers of a lineage, ascending"""
+        directory = self.lineage_dir(lineage)
+        if not directory.exists():
+            return []
+        found = []
+        for entry in directory.iterdir():
+            match = VERSION_PATTERN.match(entry.name)
+            if match and (entry / METADATA_FILE).exists():
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    def artifact_path(self, lineage, version, name="model"):
+        return self.version_dir(lineage, version) / f"{name}.joblib"
+
+    def metadata(self, lineage, version):
+        return json.loads((self.version_dir(lineage, version) / METADATA_FILE).read_text())
+
+    def load(self, lineage, version, name="model", mmap_mode=None):
+        return joblib.load(self.artifact_path(lineage, version, name), mmap_mode=mmap_mode)
+
+    def attach(self, lineage, version, files=None, metadata=None):
+        """Add data files and metadata keys to a registered version; its artifacts stay untouched.
+
+        Used when a checkpoint version turns out to be the final model: its
+        evaluation is added to it instead of registering the model again.
+        metadata.json is rewritten under a temporary name and renamed.
+        """
+        directory = self.version_dir(lineage, version)
+        record = self.metadata(lineage, version)
+        for file_name, frame in (files or {}).items():
+            frame.to_csv(directory / file_name, index=False)
+            record["artifacts"][file_name] = {"file": file_name, "bytes": (directory / file_name).stat().st_size}
+        record.update(metadata or {})
+        record["total_bytes"] = sum(entry["bytes"] for entry in record["artifacts"].values())
+        tmp_path = directory / f".{METADATA_FILE}.{uuid.uuid4().hex}.tmp"
+        tmp_path.write_text(json.dumps(record, default=str, indent=2))
+        os.replace(tmp_path, directory / METADATA_FILE)
+        return record
+
+    def register(self, lineage, artifacts, metadata=None, codec=DEFAULT_CODEC, files=None, version=None,
+                 after=0, compare_codecs=False):
+        """Write a new version and return (version, directory).
+
+        artifacts: {name: object} dumped with joblib using codec.
+        files: {file name: DataFrame} written as CSV next to them.
+        version: None takes the next number above after and every
+        registered version (retrying if another process registers it
+        first); an explicit version that already exists raises OSError.
+        """
+        check_codec(codec)
+        lineage_dir = self.lineage_dir(lineage)
+        lineage_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = lineage_dir / f".tmp-{uuid.uuid4().hex}"
+        tmp_dir.mkdir()
+        try:
+            entries = {}
+            for name, obj in artifacts.items():
+                path = tmp_dir / f"{name}.joblib"
+                dump_seconds = _dump(obj, path, codec)
+                entries[name] = {
+                    "file": path.name,
+                    "bytes": path.stat().st_size,
+                    "sha256": _sha256(path),
+                    "dump_seconds": round(dump_seconds, 4),
+                    # Also checks the artifact reads back before it is published
+                    "load_seconds": round(_timed_load(path), 4),
+                }
+            for file_name, frame in (files or {}).items():
+                frame.to_csv(tmp_dir / file_name, index=False)
+                entries[file_name] = {"file": file_name, "bytes": (tmp_dir / file_name).stat().st_size}
+
+            record = {
+                **(metadata or {}),
+                "lineage": str(lineage),
+                "codec": codec,
+                "artifacts": entries,
+                "total_bytes": sum(entry["bytes"] for entry in entries.values()),
+                "created": time.time(),
+                "sklearn_version": sklearn.__version__,
+                "numpy_version": np.__version__,
+            }
+            if compare_codecs and "model" in artifacts:
+                record["codec_comparison"] = measure_codecs(artifacts["model"])
+
+            while True:
+                number = version if version is not None else max(self.versions(lineage) + [after]) + 1
+                record["version"] = number
+                (tmp_dir / METADATA_FILE).write_text(json.dumps(record, default=str, indent=2))
+                target = self.version_dir(lineage, number)
+                try:
+                    os.rename(tmp_dir, target)
+                    return number, target
+                except OSError:
+                    if version is not None or not target.exists():
+                        raise
+                    # Lost the race for this number; take the next one
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
@@ -0,0 +1,176 @@
+# =====================================
+# preprocessing_cache.py — caché en disco del preprocesamiento ajustado
+# =====================================
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import joblib
+import numpy as np
+import sklearn
+from scipy import sparse
+
+from utils.content_store import blob_digest
+
+# Sube al cambiar cómo se preprocesa, así las entradas viejas dejan de coincidir
+CACHE_FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+
+def file_digest(path, block_size=1024 * 1024):
+    """sha256 of a file's content"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _save_matrix(directory, name, matrix):
+    """Dense -> <name>.npy; CSR -> <name>.data/.indices/.indptr.npy, all loadable with mmap_mode"""
+    if sparse.issparse(matrix):
+        matrix = matrix.tocsr()
+        for part in ("data", "indices", "indptr"):
+            np.save(directory / f"{name}.{part}.npy", getattr(matrix, part))
+        return {"format": "csr", "shape": list(matrix.shape)}
+    np.save(directory / f"{name}.npy", np.ascontiguousarray(matrix))
+    return {"format": "dense", "shape": list(matrix.shape)}
+
+
+def _load_matrix(directory, name, info):
+    if info["format"] == "csr":
+        parts = [np.load(directory / f"{name}.{part}.npy", mmap_mode="r") for part in ("data", "indices", "indptr")]
+        return sparse.csr_matrix(tuple(parts), shape=tuple(info["shape"]), copy=False)
+    return np.load(directory / f"{name}.npy", mmap_mode="r")
+
+
+def _directory_size(directory):
+    return sum(f.stat().st_size for f in directory.iterdir() if f.is_file())
+
+
+class PreprocessingCache:
+    """Fitted preprocessing and transformed train/test matrices on disk, keyed by dataset content.
+
+    Each entry is a directory named by sha256(dataset bytes + config): the
+    fitted feature/column transformers, the retrain state and the train/test
+    labels as joblib/npy files, the matrices as .npy arrays that are
+    memory-mapped on load. Entries are written to a temporary directory and
+    renamed into place, so readers never see a partial entry. When the total
+    size exceeds max_bytes, least recently used entries are removed.
+    """
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, path, config):
+        """Entry key for a dataset file and the preprocessing configuration used on it"""
+        config = {
+            **config,
+            "format_version": CACHE_FORMAT_VERSION,
+            "sklearn": sklearn.__version__,
+            # Uploads in the content store are named by their hash: no need to read them again
+            "dataset_sha256": blob_digest(path) or file_digest(path),
+        }
+        return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key):
+        """Entry dict (matrices memory-mapped) or None on a miss"""
+        entry_dir = self.directory / key
+        meta_path = entry_dir / META_FILE
+        try:
+            meta = json.loads(meta_path.read_text())
+            entry = {
+                "preprocessor": joblib.load(entry_dir / "preprocessor.joblib"),
+                "state": joblib.load(entry_dir / "state.joblib"),
+                "X_train": _load_matrix(entry_dir, "X_train", meta["matrices"]["X_train"]),
+                "X_test": _load_matrix(entry_dir, "X_test", meta["matrices"]["X_test"]),
+                "y_train": np.load(entry_dir / "y_train.npy", allow_pickle=True),
+                "y_test": np.load(entry_dir / "y_test.npy", allow_pickle=True),
+                "meta": meta,
+            }
+        except (OSError, ValueError, KeyError, EOFError):
+            # Missing, half-removed or unreadable entries count as misses
+            self.misses += 1
+            return None
+        # Last use is the mtime of meta.json (LRU order)
+        os.utime(meta_path)
+        self.hits += 1
+        return entry
+
+    def put(self, key, preprocessor, state, X_train, X_test, y_train, y_test, meta=None):
+        """Store an entry (atomic rename) and trim the cache back under max_bytes"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.directory / f".{key}.{uuid.uuid4().hex}.tmp"
+        tmp_dir.mkdir()
+        try:
+            joblib.dump(preprocessor, tmp_dir / "preprocessor.joblib")
+            joblib.dump(state, tmp_dir / "state.joblib")
+            np.save(tmp_dir / "y_train.npy", np.asarray(y_train), allow_pickle=True)
+            np.save(tmp_dir / "y_test.npy", np.asarray(y_test), allow_pickle=True)
+            meta = {
+                **(meta or {}),
+                "created": time.time(),
+                "matrices": {
+                    "X_train": _save_matrix(tmp_dir, "X_train", X_train),
+                    "X_test": _save_matrix(tmp_dir, "X_test", X_test),
+                },
+            }
+            (tmp_dir / META_FILE).write_text(json.dumps(meta, default=str))
+            try:
+                os.rename(tmp_dir, self.directory / key)
+            except OSError:
+                # Another run stored the same entry first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self.cleanup(keep=key)
+
+    def entries(self):
+        """(last_used, size, path) of every complete entry, least recently used first"""
+        if not self.directory.exists():
+            return []
+        found = []
+        for entry_dir in self.directory.iterdir():
+            meta_path = entry_dir / META_FILE
+            if entry_dir.name.startswith(".") or not meta_path.exists():
+                continue
+            try:
+                found.append((meta_path.stat().st_mtime, _directory_size(entry_dir), entry_dir))
+            except OSError:
+                continue
+        return sorted(found, key=lambda item: item[0])
+
+    def cleanup(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes:
+                break
+            if entry_dir.name == keep:
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+        return total
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
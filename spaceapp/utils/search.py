@@ -0,0 +1,217 @@
+# =====================================
+# search.py — búsqueda de hiperparámetros por successive halving
+# =====================================
+
+import math
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.stats import loguniform, randint, uniform
+from sklearn.base import clone
+from sklearn.ensemble import StackingClassifier
+from sklearn.model_selection import ParameterSampler, StratifiedKFold, cross_val_score, train_test_split
+
+from utils.stacking import oof_cv_scores
+
+# Parámetros del Stacking que puede fijar o explorar el JSON de parámetros
+PARAM_PREFIXES = ("rf__", "ada__", "final_estimator__")
+# De los demás modelos, todos menos los que fija el preprocesamiento
+FIXED_PARAMS = ("categorical_features",)
+SEARCH_DEFAULTS = {
+    "n_candidates": 16,
+    "factor": 3,
+    "min_samples": None,
+    "time_budget_seconds": None,
+    # None: the job's CPU allotment
+    "n_jobs": None,
+    "random_state": 42,
+}
+
+
+def _tunable(model):
+    """(names the parameters JSON may set, description for error messages)"""
+    names = set(model.get_params(deep=True))
+    if isinstance(model, StackingClassifier):
+        return {n for n in names if n.startswith(PARAM_PREFIXES)}, "rf__*, ada__* or final_estimator__*"
+    names -= set(FIXED_PARAMS)
+    return names, ", ".join(sorted(names))
+
+
+def _check_name(name, valid_names, expected):
+    if name not in valid_names:
+        raise ValueError(f"Unknown parameter '{name}' (expected {expected})")
+
+
+def parse_distribution(name, spec):
+    """List -> uniform choice; {"low", "high", "log"} -> int or float range"""
+    if isinstance(spec, list):
+        if not spec:
+            raise ValueError(f"Search space for '{name}' is empty")
+        return spec
+    if isinstance(spec, dict) and {"low", "high"} <= set(spec):
+        low, high = spec["low"], spec["high"]
+        if not low < high:
+            raise ValueError(f"Search space for '{name}' needs low < high")
+        if isinstance(low, int) and isinstance(high, int) and not spec.get("log", False):
+            return randint(low, high + 1)
+        if spec.get("log", False):
+            return loguniform(low, high)
+        return uniform(low, high - low)
+    raise ValueError(f"Search space for '{name}' must be a list or an object with low/high")
+
+
+def parse_parameters(parameters, model):
+    """Fixed params and search options from the training parameters JSON (validated against model)"""
+    valid_names, expected = _tunable(model)
+    fixed = dict(parameters.get("params") or {})
+    for name in fixed:
+        _check_name(name, valid_names, expected)
+
+    search = parameters.get("search")
+    if not search:
+        return fixed, None
+    options = {**SEARCH_DEFAULTS, **{k: v for k, v in search.items() if k != "space"}}
+    unknown = set(options) - set(SEARCH_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown search options: {', '.join(sorted(unknown))}")
+    try:
+        options["factor"], options["n_candidates"] = int(options["factor"]), int(options["n_candidates"])
+    except (TypeError, ValueError):
+        raise ValueError("search factor and n_candidates must be integers") from None
+    if options["factor"] < 2 or options["n_candidates"] < 1:
+        raise ValueError("search needs factor >= 2 and n_candidates >= 1")
+    space = search.get("space") or {}
+    if not space:
+        raise ValueError("search.space is empty")
+    distributions = {}
+    for name, spec in space.items():
+        _check_name(name, valid_names, expected)
+        distributions[name] = parse_distribution(name, spec)
+    options["space"] = distributions
+    return fixed, options
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _evaluate(index, pipe, params, X, y, cv, oof):
+    start = time.perf_counter()
+    candidate = clone(pipe).set_params(**{f"model__{k}": v for k, v in params.items()})
+    if oof and isinstance(candidate.steps[-1][1], StackingClassifier):
+        scores = oof_cv_scores(candidate, X, y, cv)
+    else:
+        scores = cross_val_score(candidate, X, y, cv=cv, scoring="accuracy")
+    return index, scores, time.perf_counter() - start
+
+
+def _schedule(n_candidates, factor, n_samples, min_samples):
+    """Rounds of (candidates, samples): each round keeps 1/factor of the candidates on factor x the rows"""
+    n_rounds = int(math.floor(math.log(n_candidates, factor))) + 1 if n_candidates > 1 else 1
+    while n_rounds > 1 and n_samples // factor ** (n_rounds - 1) < min_samples:
+        n_rounds -= 1
+    schedule = []
+    for i in range(n_rounds):
+        candidates = max(int(math.ceil(n_candidates / factor ** i)), 1)
+        samples = n_samples if i == n_rounds - 1 else n_samples // factor ** (n_rounds - 1 - i)
+        schedule.append((candidates, samples))
+    return schedule
+
+
+def successive_halving_search(pipe, X, y, options, progress=None, oof=False):
+    """HalvingRandomSearchCV-style search scored with 5-fold CV accuracy of the whole pipeline.
+
+    pipe includes its preprocessing, refitted on every fold so the scored
+    rows never shape the imputation, scaling or categories. With oof, a
+    stacking model is scored from the out-of-fold predictions of one fit
+    instead (cheaper, but its preprocessing sees the whole subsample).
+
+    Candidates are sampled from options["space"] and evaluated in parallel on a
+    stratified subsample; the best 1/factor move to the next round with
+    factor x more rows, the last round using all of X. Once the wall-clock
+    budget is spent no further round starts, running evaluations are
+    abandoned and the best candidate of the deepest completed round wins
+    (of the partial first round if none completed). Returns
+    (best_params, best_score, trace).
+    """
+    start = time.monotonic()
+    budget = options.get("time_budget_seconds")
+    deadline = start + budget if budget else None
+    factor = int(options["factor"])
+    n_classes = int(np.unique(y).size)
+    cv = StratifiedKFold(n_splits=5)
+    min_samples = options.get("min_samples") or 10 * cv.get_n_splits() * n_classes
+
+    candidates = [
+        {k: _plain(v) for k, v in params.items()}
+        for params in ParameterSampler(
+            options["space"], int(options["n_candidates"]), random_state=options["random_state"]
+        )
+    ]
+    schedule = _schedule(len(candidates), factor, len(y), min_samples)
+    total_evaluations = sum(c for c, _ in schedule)
+    n_jobs = options["n_jobs"]
+    if n_jobs != 1 and "n_jobs" in pipe.steps[-1][1].get_params():
+        # Parallelism across candidates, not inside each ensemble
+        pipe = clone(pipe).set_params(model__n_jobs=1)
+
+    trace = []
+    best = None
+    evaluated = 0
+    timed_out = False
+    for round_index, (_, n_samples) in enumerate(schedule):
+        if deadline is not None and best is not None and time.monotonic() > deadline:
+            timed_out = True
+            break
+        if n_samples < len(y):
+            X_round, _, y_round, _ = train_test_split(
+                X, y, train_size=n_samples, stratify=y, random_state=options["random_state"]
+            )
+        else:
+            X_round, y_round = X, y
+
+        results = Parallel(n_jobs=n_jobs, return_as="generator_unordered")(
+            delayed(_evaluate)(i, pipe, params, X_round, y_round, cv, oof)
+            for i, params in enumerate(candidates)
+        )
+        round_scores = []
+        try:
+            for i, scores, seconds in results:
+                evaluated += 1
+                entry = {
+                    "round": round_index,
+                    "n_samples": int(n_samples),
+                    "params": candidates[i],
+                    "mean_score": float(scores.mean()),
+                    "std_score": float(scores.std()),
+                    "fit_seconds": round(seconds, 3),
+                }
+                trace.append(entry)
+                round_scores.append((entry["mean_score"], i))
+                if progress is not None:
+                    progress("search", evaluated, total_evaluations)
+                if deadline is not None and time.monotonic() > deadline:
+                    timed_out = True
+                    break
+        finally:
+            # Abandons the evaluations still running (budget spent or job cancelled)
+            results.close()
+
+        completed = len(round_scores) == len(candidates)
+        if round_scores and (completed or best is None):
+            round_scores.sort(key=lambda item: -item[0])
+            best = (candidates[round_scores[0][1]], round_scores[0][0], round_index)
+        if timed_out and not completed:
+            break
+        keep = max(int(math.ceil(len(candidates) / factor)), 1)
+        candidates = [candidates[i] for _, i in round_scores[:keep]]
+
+    best_params, best_score, best_round = best
+    return best_params, best_score, {
+        "rounds": [{"n_candidates": c, "n_samples": int(s)} for c, s in schedule],
+        "evaluations": trace,
+        "best_round": best_round,
+        "elapsed_seconds": round(time.monotonic() - start, 3),
+        "timed_out": timed_out,
+    }
@@ -0,0 +1,48 @@
+# =====================================
+# stacking.py — Stacking que conserva sus predicciones out-of-fold
+# =====================================
+
+from sklearn.base import clone
+from sklearn.ensemble import StackingClassifier
+from sklearn.model_selection import cross_val_score
+
+
+class OOFStackingClassifier(StackingClassifier):
+    """StackingClassifier that keeps the out-of-fold meta-features of its last fit.
+
+    fit() already runs a cross_val_predict of every base estimator to train
+    the final estimator; those predictions are kept in oof_meta_ so a
+    generalization estimate can be derived from them without refitting the
+    ensemble. Take them with pop_oof() before saving the model.
+    """
+
+    def fit(self, X, y, **fit_params):
+        self._capture_oof = True
+        try:
+            return super().fit(X, y, **fit_params)
+        finally:
+            del self._capture_oof
+
+    # Private StackingClassifier hook: scikit-learn is pinned in requirements.txt and
+    # OOFStackingTests checks the captured matrix against cross_val_predict
+    def _concatenate_predictions(self, X, predictions):
+        X_meta = super()._concatenate_predictions(X, predictions)
+        if getattr(self, "_capture_oof", False):
+            self.oof_meta_ = X_meta
+        return X_meta
+
+    def pop_oof(self):
+        """Out-of-fold meta-features of the last fit (removed so they are not pickled)"""
+        return self.__dict__.pop("oof_meta_", None)
+
+
+def oof_cv_scores(pipe, X, y, cv):
+    """Fit pipe (ending in an OOFStackingClassifier) and score it from its out-of-fold meta-features.
+
+    Only the final estimator is cross-validated again, on the meta-features
+    the ensemble fit already produced, so the estimate costs one fit.
+    """
+    pipe.fit(X, y)
+    stacking = pipe.steps[-1][1]
+    oof_meta = stacking.pop_oof()
+    return cross_val_score(clone(stacking.final_estimator_), oof_meta, y, cv=cv, scoring="accuracy")
@@ -0,0 +1,387 @@
+# =====================================
+# tabular_io.py — lectura de CSV, Parquet, Feather y Arrow IPC
+# =====================================
+
+import hashlib
+import os
+from pathlib import Path
+
+import pandas as pd
+
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "arrow",
+    ".ipc": "arrow",
+    ".arrows": "arrow_stream",
+}
+COLUMNAR_FORMATS = ("parquet", "feather", "arrow", "arrow_stream")
+
+# Perfilado de columnas del cargador de baja memoria
+# Celdas por bloque de lectura: acota la memoria de cada pasada, sea cual sea el ancho
+CHUNK_CELLS = 2_000_000
+CATEGORY_MAX_UNIQUE = 1000
+CATEGORY_MAX_RATIO = 0.5
+# Sube al cambiar cómo se convierte el CSV, así las copias viejas dejan de coincidir
+COLUMNAR_CACHE_VERSION = 2
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ValueError("pyarrow is required to read Parquet, Feather or Arrow files")
+
+
+def _source_name(source):
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    return getattr(source, "name", "") or ""
+
+
+def detect_format(source):
+    """File format from its magic bytes, falling back to the extension (CSV by default)"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as handle:
+            head = handle.read(8)
+    else:
+        source.seek(0)
+        head = source.read(8)
+        source.seek(0)
+    if head[:4] == PARQUET_MAGIC:
+        return "parquet"
+    if head[:6] == ARROW_FILE_MAGIC:
+        return "arrow"
+    if head[:4] == ARROW_STREAM_MAGIC:
+        return "arrow_stream"
+    return EXTENSIONS.get(Path(_source_name(source)).suffix.lower(), "csv")
+
+
+def _arrow_source(source):
+    """Memory-map files on disk; uploads kept in memory are wrapped without another parse"""
+    import pyarrow as pa
+
+    if isinstance(source, (str, os.PathLike)):
+        return pa.memory_map(str(source), "r")
+    if hasattr(source, "temporary_file_path"):
+        return pa.memory_map(source.temporary_file_path(), "r")
+    source.seek(0)
+    return pa.BufferReader(source.read())
+
+
+def read_arrow_table(source, fmt, usecols=None):
+    """pyarrow.Table with only the selected columns read from disk (Parquet) or mapped (Arrow)"""
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_source = _arrow_source(source)
+    if fmt == "parquet":
+        parquet_file = pq.ParquetFile(arrow_source)
+        names = parquet_file.schema_arrow.names
+        columns = [c for c in names if usecols(c)] if usecols is not None else None
+        return parquet_file.read(columns=columns)
+
+    if fmt == "arrow_stream":
+        table = pa.ipc.open_stream(arrow_source).read_all()
+    else:
+        # Feather v2 is the Arrow IPC file format
+        table = pa.ipc.open_file(arrow_source).read_all()
+    if usecols is not None:
+        table = table.select([c for c in table.column_names if usecols(c)])
+    return table
+
+
+def arrow_to_frame(table, index_col=None):
+    """DataFrame over the Arrow buffers: null-free numeric columns are not copied"""
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    if index_col is not None and index_col in df.columns:
+        df = df.set_index(index_col)
+    return df
+
+
+def read_table(source, index_col=None, usecols=None, dtype=None, **csv_kwargs):
+    """Read a CSV, Parquet, Feather or Arrow IPC file into a DataFrame.
+
+    usecols is a callable (or list) applied to the column names in every
+    format; dtype only applies to CSV, columnar files keep their stored types.
+    """
+    fmt = detect_format(source)
+    if fmt == "csv":
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        return pd.read_csv(source, index_col=index_col, usecols=usecols, dtype=dtype, **csv_kwargs)
+
+    if usecols is not None and not callable(usecols):
+        wanted = set(usecols)
+        usecols = wanted.__contains__
+    return arrow_to_frame(read_arrow_table(source, fmt, usecols), index_col=index_col)
+
+
+def columnar_cache_path(path, cache_dir):
+    """<sha1(path)[:16]>-<mtime_ns>-<size>.feather, so an edited CSV gets a new cache entry"""
+    path = Path(path).resolve()
+    stat = path.stat()
+    digest = hashlib.sha1(f"{path}:{COLUMNAR_CACHE_VERSION}".encode()).hexdigest()[:16]
+    return Path(cache_dir) / f"{digest}-{stat.st_mtime_ns}-{stat.st_size}.feather"
+
+
+def _like_pandas(table):
+    """Same column names/kinds pd.read_csv would give: dates stay strings, blank headers are 'Unnamed: i'"""
+    import pyarrow as pa
+
+    names = [name or f"Unnamed: {i}" for i, name in enumerate(table.column_names)]
+    table = table.rename_columns(names)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_temporal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+    return table
+
+
+def cached_columnar(path, cache_dir):
+    """Path of an uncompressed Feather copy of a stored CSV, written on first use"""
+    _require_pyarrow()
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as feather
+
+    target = columnar_cache_path(path, cache_dir)
+    if target.exists():
+        return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Entries for older versions of the same file are dropped
+    for stale in target.parent.glob(f"{target.name.split('-')[0]}-*.feather"):
+        stale.unlink(missing_ok=True)
+    # Empty string cells are missing values, as in pd.read_csv
+    convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+    table = _like_pandas(pa_csv.read_csv(str(path), convert_options=convert_options))
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    feather.write_feather(table, str(tmp_path), compression="uncompressed")
+    os.replace(tmp_path, target)
+    return target
+
+
+def read_dataset(source, cache_dir=None, **kwargs):
+    """read_table that serves stored CSV files from their columnar cache when cache_dir is set"""
+    if cache_dir and isinstance(source, (str, os.PathLike)) and detect_format(source) == "csv":
+        kwargs.pop("sep", None)
+        kwargs.pop("dtype", None)
+        source = cached_columnar(source, cache_dir)
+    return read_table(source, **kwargs)
+
+
+def _merge_uniques(entry, values, max_unique):
+    """Distinct non-null strings seen so far; None once there are more than max_unique"""
+    if entry["uniques"] is None:
+        return
+    entry["uniques"].update(values)
+    if len(entry["uniques"]) > max_unique:
+        entry["uniques"] = None
+
+
+def _finish_profile(rows, columns):
+    for entry in columns.values():
+        entry["missing_ratio"] = entry.pop("missing") / rows if rows else 1.0
+        if "uniques" in entry:
+            uniques = entry.pop("uniques")
+            # Numbers parsed in some chunk of a text column have lost their original spelling
+            if uniques is not None and entry["kind"] == "string" and not entry.pop("mixed", False):
+                entry["n_unique"] = len(uniques)
+                entry["categories"] = sorted(uniques)
+            else:
+                entry["n_unique"] = None
+    return {"rows": rows, "columns": columns}
+
+
+def _csv_chunk_rows(source):
+    """Rows per chunk so that one chunk holds about CHUNK_CELLS cells"""
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+    n_columns = len(pd.read_csv(source, nrows=0).columns)
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+    return max(1000, CHUNK_CELLS // max(n_columns, 1))
+
+
+def _profile_csv(source, chunksize, max_unique):
+    rows, columns = 0, {}
+    for chunk in pd.read_csv(source, chunksize=chunksize, low_memory=False):
+        rows += len(chunk)
+        for name in chunk.columns:
+            series = chunk[name]
+            entry = columns.setdefault(name, {"kind": "numeric", "missing": 0, "uniques": set()})
+            entry["missing"] += int(series.isna().sum())
+            if pd.api.types.is_bool_dtype(series):
+                kind = "bool"
+            elif pd.api.types.is_numeric_dtype(series) or series.isna().all():
+                kind = "numeric"
+            else:
+                kind = "string"
+            # A column is numeric only if every chunk parsed as numbers
+            if kind != "numeric" and entry["kind"] == "numeric":
+                entry["kind"] = kind
+            if kind == "string":
+                _merge_uniques(entry, series.dropna().astype(str).unique(), max_unique)
+            elif series.notna().any():
+                # If another chunk turns out to be text, this one's values are not in uniques
+                entry["mixed"] = True
+    return _finish_profile(rows, columns)
+
+
+def _arrow_kind(field_type):
+    import pyarrow as pa
+
+    if pa.types.is_integer(field_type) or pa.types.is_floating(field_type) or pa.types.is_null(field_type):
+        return "numeric"
+    if pa.types.is_boolean(field_type):
+        return "bool"
+    if pa.types.is_string(field_type) or pa.types.is_large_string(field_type) \
+            or pa.types.is_dictionary(field_type):
+        return "string"
+    return "other"
+
+
+def _arrow_batches(source, fmt):
+    """(schema, record batches) of a columnar file, read one batch of about CHUNK_CELLS cells at a time"""
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_source = _arrow_source(source)
+    if fmt == "parquet":
+        parquet_file = pq.ParquetFile(arrow_source)
+        schema = parquet_file.schema_arrow
+        batch_rows = max(1000, CHUNK_CELLS // max(len(schema), 1))
+        return schema, parquet_file.iter_batches(batch_size=batch_rows)
+    if fmt == "arrow_stream":
+        reader = pa.ipc.open_stream(arrow_source)
+        return reader.schema, iter(reader)
+    reader = pa.ipc.open_file(arrow_source)
+    return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+
+def _profile_arrow(schema, batches, max_unique):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    rows, columns = 0, {}
+    for field in schema:
+        kind = _arrow_kind(field.type)
+        columns[field.name] = {"kind": kind, "missing": 0, "uniques": set() if kind == "string" else None}
+    for batch in batches:
+        rows += batch.num_rows
+        for field, column in zip(batch.schema, batch.columns):
+            entry = columns[field.name]
+            entry["missing"] += column.null_count
+            if entry["kind"] == "string" and entry["uniques"] is not None:
+                if pa.types.is_dictionary(column.type):
+                    column = column.dictionary_decode()
+                _merge_uniques(entry, pc.drop_null(pc.unique(column)).to_pylist(), max_unique)
+    return _finish_profile(rows, columns)
+
+
+def profile_columns(source, chunksize=None, max_unique=CATEGORY_MAX_UNIQUE):
+    """First, cheap pass over a table: per-column missing ratio, kind and distinct strings.
+
+    CSV files are scanned in chunks (about CHUNK_CELLS cells unless chunksize
+    rows are given) and columnar files one record batch at a time, so memory
+    stays bounded by one chunk. n_unique and the sorted categories are None
+    for string columns with more than max_unique values, and for CSV columns
+    that parse as numbers in some chunks and as text in others.
+    """
+    fmt = detect_format(source)
+    if fmt == "csv":
+        chunksize = chunksize or _csv_chunk_rows(source)
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        return _profile_csv(source, chunksize, max_unique)
+    schema, batches = _arrow_batches(source, fmt)
+    return _profile_arrow(schema, batches, max_unique)
+
+
+def compact_plan(profile, drop=None, max_missing=None, keep=(),
+                 max_unique=CATEGORY_MAX_UNIQUE, max_unique_ratio=CATEGORY_MAX_RATIO):
+    """(columns, dtypes) for the second pass.
+
+    Columns matching drop(name) or with a missing ratio above max_missing are
+    skipped (never those in keep). Numeric columns become float32, and
+    strings with few distinct values (<= max_unique and <= max_unique_ratio
+    of the non-null rows) become categoricals; other text columns are read
+    as plain strings. Columns in keep retain the default types.
+    """
+    keep = set(keep)
+    columns, dtypes = [], {}
+    for name, entry in profile["columns"].items():
+        if name not in keep:
+            if drop is not None and drop(name):
+                continue
+            if max_missing is not None and entry["missing_ratio"] > max_missing:
+                continue
+        columns.append(name)
+        if name in keep:
+            continue
+        if entry["kind"] == "numeric":
+            dtypes[name] = "float32"
+        elif entry["kind"] == "string" and entry["n_unique"] is not None:
+            non_null = profile["rows"] * (1 - entry["missing_ratio"])
+            if entry["n_unique"] <= max(max_unique_ratio * non_null, 1):
+                # Known categories let every CSV chunk share one dtype
+                categories = entry.get("categories")
+                dtypes[name] = pd.CategoricalDtype(categories) if categories is not None else "category"
+                continue
+        if entry["kind"] == "string":
+            # Otherwise chunks parsed as numbers would be concatenated with text ones
+            dtypes[name] = str
+    return columns, dtypes
+
+
+def _arrow_compact(table, columns, dtypes):
+    """Arrow table with the selected columns cast/encoded before any pandas conversion"""
+    import pyarrow as pa
+
+    table = table.select(columns)
+    for i, name in enumerate(table.column_names):
+        column = table.column(i)
+        if dtypes.get(name) == "float32":
+            column = column.cast(pa.float32())
+        elif str(dtypes.get(name)) == "category" and not pa.types.is_dictionary(column.type):
+            column = column.dictionary_encode()
+        else:
+            continue
+        table = table.set_column(i, name, column)
+    return table
+
+
+def read_compact(source, drop=None, max_missing=None, keep=(), cache_dir=None, index_col=None, chunksize=None):
+    """Two-pass low-memory read: profile the columns, then load only the survivors compacted.
+
+    See profile_columns and compact_plan. With cache_dir, stored CSV files
+    are read from their columnar cache; chunksize sets the rows per CSV
+    chunk. Returns (DataFrame, profile).
+    """
+    if cache_dir and isinstance(source, (str, os.PathLike)) and detect_format(source) == "csv":
+        source = cached_columnar(source, cache_dir)
+    fmt = detect_format(source)
+    if fmt == "csv":
+        chunksize = chunksize or _csv_chunk_rows(source)
+        profile = profile_columns(source, chunksize=chunksize)
+        columns, dtypes = compact_plan(profile, drop=drop, max_missing=max_missing, keep=keep)
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        # Already-typed chunks: the parser never holds the whole table as float64/object.
+        # usecols as a set: pandas returns the columns in file order
+        chunks = pd.read_csv(source, usecols=set(columns), dtype=dtypes, chunksize=chunksize, low_memory=False)
+        df = pd.concat(list(chunks))
+        if index_col is not None and index_col in df.columns:
+            df = df.set_index(index_col)
+        return df, profile
+
+    profile = profile_columns(source)
+    columns, dtypes = compact_plan(profile, drop=drop, max_missing=max_missing, keep=keep)
+    table = read_arrow_table(source, fmt, usecols=set(columns).__contains__)
+    return arrow_to_frame(_arrow_compact(table, columns, dtypes), index_col=index_col), profile
@@ -0,0 +1,61 @@
+# =====================================
+# testing.py — datos sintéticos y modelos pequeños compartidos por tests y benchmarks
+# =====================================
+
+from concurrent.futures import Executor, Future
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier, StackingClassifier
+from sklearn.linear_model import LogisticRegression
+
+from utils.k2_source import build_pipeline, build_preprocessor
+
+
+def make_k2_like_frame(n_rows=600, n_classes=3, seed=0):
+    """Small synthetic table with the shape of the K2 archive (numeric, categorical, missing values)"""
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, n_classes, n_rows)
+    df = pd.DataFrame({
+        "pl_orbper": rng.lognormal(2, 1, n_rows) * (1 + y),
+        "pl_rade": rng.normal(2 + y, 1, n_rows),
+        "st_teff": rng.normal(5500, 600, n_rows),
+        "sy_snum": rng.integers(0, 3, n_rows),
+        "sy_pnum": rng.integers(1, 5, n_rows),
+        "sy_mnum": rng.integers(0, 2, n_rows),
+        "disc_year": rng.integers(2014, 2024, n_rows),
+        "disc_locale": rng.choice(["Space", "Ground", None], n_rows),
+        "disc_facility": rng.choice(["K2", "TESS", "Keck", "WIYN"], n_rows),
+    })
+    for column in ("pl_orbper", "pl_rade", "st_teff"):
+        df.loc[rng.random(n_rows) < 0.1, column] = np.nan
+    labels = np.array(["FALSE POSITIVE", "CANDIDATE", "CONFIRMED"])[:n_classes]
+    df["disposition"] = labels[y]
+    return df
+
+
+def fit_stacking_pipeline(df, n_estimators=20):
+    X, y, preprocessor = build_preprocessor(df, "disposition")
+    stacking_model = StackingClassifier(
+        estimators=[
+            ("rf", RandomForestClassifier(n_estimators=n_estimators, random_state=42)),
+            ("ada", AdaBoostClassifier(n_estimators=n_estimators, random_state=42)),
+        ],
+        final_estimator=LogisticRegression(max_iter=500),
+        passthrough=True,
+    )
+    pipe = build_pipeline(preprocessor, stacking_model)
+    return pipe.fit(X, y), X
+
+
+class RecordingExecutor(Executor):
+    """Completes every submission at once, remembering the job ids instead of running them"""
+
+    def __init__(self):
+        self.job_ids = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.job_ids.append(args[0])
+        future = Future()
+        future.set_result(None)
+        return future
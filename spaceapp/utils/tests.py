@@ -0,0 +1,506 @@
+import io
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import (
+    accuracy_score, auc, average_precision_score, confusion_matrix, precision_recall_fscore_support, roc_auc_score
+)
+from sklearn.model_selection import StratifiedKFold, cross_val_predict, cross_val_score
+from sklearn.tree import DecisionTreeClassifier
+import pandas as pd
+
+from utils.anytime import anytime_fit, budget_ladder
+from utils.categorical_encoding import encoding_report, parse_encoding_options
+from utils.compiled_pipeline import compile_pipeline
+from utils.evaluation import downsample_curve, evaluate_probabilities, parse_evaluation_options
+from utils.feature_engineering import FeatureEngineer
+from utils.feature_schema import FeatureProjection, build_feature_schema
+from utils.incremental import build_incremental_state, incremental_retrain, with_meta_features
+from utils.k2_source import (
+    FAST_CV_NOTE, build_model, build_pipeline, build_preprocessor, load_data, split_training_rows,
+    train_and_select_model,
+)
+from utils.preprocessing_cache import PreprocessingCache
+from utils.search import parse_parameters, successive_halving_search
+from utils.stacking import OOFStackingClassifier
+from utils.tabular_io import cached_columnar, detect_format, read_compact, read_dataset, read_table
+from utils.testing import make_k2_like_frame
+
+
+class FeatureProjectionTests(SimpleTestCase):
+    """Uploaded rows are parsed and laid out the way the model was trained"""
+
+    def setUp(self):
+        train = pd.DataFrame({"pl_rade": [1.0, 2.5], "disc_facility": ["K2", "TESS"], "sy_snum": [1, 2]})
+        self.schema = build_feature_schema(train)
+        self.numeric_schema = build_feature_schema(train.drop(columns=["disc_facility"]))
+
+    def test_read_csv_kwargs_parse_only_the_model_columns(self):
+        csv = "kepler_name,notes,sy_snum,disc_facility,pl_rade\nK2-1 b,x,1,2024,1.5\nK2-2 b,y,,K2,\n"
+        df = pd.read_csv(io.StringIO(csv), **FeatureProjection(self.schema).read_csv_kwargs())
+        self.assertEqual(list(df.columns), ["kepler_name", "sy_snum", "disc_facility", "pl_rade"])
+        self.assertEqual([str(df[c].dtype) for c in ("sy_snum", "pl_rade")], ["float64", "float64"])
+        # Categorical columns stay strings even when they look numeric
+        self.assertEqual(df["disc_facility"].tolist(), ["2024", "K2"])
+
+    def test_project_reorders_fills_and_drops(self):
+        upload = pd.DataFrame({"notes": ["x", "y"], "sy_snum": [3, 4], "disc_facility": ["JWST", None]},
+                              index=[10, 11])
+        out = FeatureProjection(self.schema).project(upload)
+        self.assertIsInstance(out, pd.DataFrame)
+        self.assertEqual(list(out.columns), ["pl_rade", "disc_facility", "sy_snum"])
+        self.assertEqual(list(out.index), [10, 11])
+        self.assertTrue(out["pl_rade"].isna().all())
+        self.assertEqual([str(out[c].dtype) for c in out.columns], ["float64", "object", "float64"])
+        # Unseen categories are passed on as is (the encoder ignores them)
+        self.assertEqual(out["disc_facility"].tolist()[0], "JWST")
+        self.assertIsNone(out["disc_facility"].tolist()[1])
+
+    def test_all_numeric_projection_is_one_float_block(self):
+        upload = pd.DataFrame({"sy_snum": pd.array([3, None], dtype="Int64"), "pl_rade": [1.5, 2.5]})
+        out = FeatureProjection(self.numeric_schema).project(upload)
+        self.assertIsInstance(out, np.ndarray)
+        self.assertEqual((out.dtype, out.shape), (np.float64, (2, 2)))
+        self.assertTrue(out.flags.c_contiguous)
+        np.testing.assert_array_equal(out, [[1.5, 3.0], [2.5, np.nan]])
+
+
+class GradientBoostingEngineTests(SimpleTestCase):
+    """Raw features in, one column per feature out; NaN and unseen categories handled by the model"""
+
+    def test_native_missing_and_categories(self):
+        df = make_k2_like_frame(n_rows=1000, seed=11)
+        df.loc[df.index[:100], ["pl_rade", "disc_facility"]] = np.nan
+        X, y, preprocessor = build_preprocessor(df, "disposition", engine="hist_gradient_boosting")
+        pipe = build_pipeline(preprocessor, build_model("hist_gradient_boosting", preprocessor)).fit(X, y)
+        width = pipe[:-1].transform(X.iloc[:5]).shape[1]
+        self.assertEqual(width, len(pipe.named_steps["features"].get_feature_names_out()))
+        self.assertEqual(int(pipe.named_steps["model"].is_categorical_.sum()), len(preprocessor.transformers[1][2]))
+        unseen = X.iloc[:5].assign(disc_facility="NEW", pl_rade=np.nan)
+        np.testing.assert_allclose(pipe.predict_proba(unseen).sum(axis=1), 1.0)
+
+
+class CategoricalEncodingTests(SimpleTestCase):
+    """Only low-cardinality columns are one-hot encoded; the rest keep a bounded width"""
+
+    def make_frame(self, n_rows=800):
+        df = make_k2_like_frame(n_rows=n_rows, seed=13)
+        df["pl_bmassprov"] = [f"ref-{i}" for i in range(n_rows)]
+        df["rowupdate"] = [f"2020-01-{i % 60:02d}" for i in range(n_rows)]
+        return df
+
+    def test_auto_strategy_bounds_width(self):
+        df = self.make_frame()
+        X, y, preprocessor = build_preprocessor(df, "disposition", encoding=parse_encoding_options({}))
+        Xt = preprocessor.fit_transform(FeatureEngineer().fit_transform(X))
+        report = encoding_report(preprocessor, FeatureEngineer().fit_transform(X), Xt)
+        strategies = {c: v["strategy"] for c, v in report["columns"].items()}
+        self.assertEqual(strategies["disc_facility"], "onehot")
+        self.assertEqual((strategies["rowupdate"], report["columns"]["rowupdate"]["width"]), ("top_k", 21))
+        self.assertEqual((strategies["pl_bmassprov"], report["columns"]["pl_bmassprov"]["width"]), ("hashing", 32))
+        self.assertEqual(report["width"], Xt.shape[1])
+        self.assertGreater(report["onehot_width"], 800)
+
+    def test_unseen_values_keep_output_width(self):
+        df = self.make_frame()
+        for strategy in ("top_k", "hashing", "frequency"):
+            X, y, preprocessor = build_preprocessor(df, "disposition",
+                                                    encoding=parse_encoding_options({"encoding": {"strategy": strategy}}))
+            pipe = build_pipeline(preprocessor, "passthrough")[:-1].fit(X)
+            unseen = X.iloc[:5].assign(pl_bmassprov="never-seen", rowupdate=np.nan)
+            self.assertEqual(pipe.transform(unseen).shape[1], pipe.transform(X.iloc[:5]).shape[1])
+
+
+class TabularIOTests(SimpleTestCase):
+    """CSV, Parquet and Feather uploads read back the same table"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+        self.df = make_k2_like_frame(n_rows=200, seed=14)
+        self.paths = {
+            "csv": self.dir / "k2.csv",
+            "parquet": self.dir / "k2.parquet",
+            "feather": self.dir / "k2.feather",
+        }
+        self.df.to_csv(self.paths["csv"], index=False)
+        self.df.to_parquet(self.paths["parquet"], index=False)
+        self.df.to_feather(self.paths["feather"])
+
+    def test_format_detection(self):
+        self.assertEqual(detect_format(self.paths["csv"]), "csv")
+        self.assertEqual(detect_format(self.paths["parquet"]), "parquet")
+        # Feather v2 is the Arrow IPC file format
+        self.assertEqual(detect_format(self.paths["feather"]), "arrow")
+        # Magic bytes win over a misleading extension, also for in-memory uploads
+        renamed = self.dir / "uploaded.csv"
+        renamed.write_bytes(self.paths["parquet"].read_bytes())
+        self.assertEqual(detect_format(renamed), "parquet")
+        with open(self.paths["feather"], "rb") as handle:
+            self.assertEqual(detect_format(handle), "arrow")
+
+    def test_round_trip_with_usecols(self):
+        wanted = ["pl_rade", "disc_facility", "disposition"]
+        for fmt, path in self.paths.items():
+            for usecols in (wanted, wanted.__contains__):
+                df = read_table(path, usecols=usecols)
+                self.assertEqual(list(df.columns), wanted, fmt)
+                pd.testing.assert_frame_equal(df, self.df[wanted], check_dtype=False)
+
+    def test_csv_dtype(self):
+        df = read_table(self.paths["csv"], dtype={"pl_rade": "float32", "disc_facility": "category"})
+        self.assertEqual(df["pl_rade"].dtype, np.float32)
+        self.assertIsInstance(df["disc_facility"].dtype, pd.CategoricalDtype)
+
+    def test_columnar_cache_hit(self):
+        cache_dir = self.dir / "cache"
+        target = cached_columnar(self.paths["csv"], cache_dir)
+        written = target.stat().st_mtime_ns
+        self.assertEqual(cached_columnar(self.paths["csv"], cache_dir), target)
+        self.assertEqual(target.stat().st_mtime_ns, written)
+        self.assertEqual(os.listdir(cache_dir), [target.name])
+        pd.testing.assert_frame_equal(read_dataset(self.paths["csv"], cache_dir=cache_dir),
+                                      read_table(self.paths["csv"]))
+
+    def test_compact_read_keeps_column_numeric_in_one_chunk_and_text_in_another(self):
+        # The first chunk parses as integers, the second as text
+        codes = [str(i % 5) for i in range(100)] + ["A", "B"] * 50
+        path = self.dir / "mixed.csv"
+        pd.DataFrame({"code": codes, "value": np.arange(200)}).to_csv(path, index=False)
+        df, profile = read_compact(path, chunksize=100)
+        self.assertIsNone(profile["columns"]["code"]["n_unique"])
+        self.assertEqual(df["code"].tolist(), codes)
+
+    def test_compact_read_of_columnar_files(self):
+        for fmt in ("parquet", "feather"):
+            df, profile = read_compact(self.paths[fmt], drop=lambda name: name == "sy_mnum")
+            self.assertEqual(profile["rows"], 200, fmt)
+            self.assertEqual(profile["columns"]["disc_facility"]["categories"], ["K2", "Keck", "TESS", "WIYN"])
+            self.assertNotIn("sy_mnum", df.columns)
+            self.assertEqual(df["pl_rade"].dtype, np.float32)
+            self.assertIsInstance(df["disc_facility"].dtype, pd.CategoricalDtype)
+            pd.testing.assert_series_equal(df["disc_facility"].astype(str), self.df["disc_facility"])
+
+
+class _SleepyClassifier:
+    """Predicts the majority class after a fit that takes a known time"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def fit(self, X, y):
+        time.sleep(self.seconds)
+        values, counts = np.unique(y, return_counts=True)
+        self.label_ = values[counts.argmax()]
+        return self
+
+    def predict(self, X):
+        return np.full(X.shape[0], self.label_)
+
+
+class AnytimeTrainingTests(SimpleTestCase):
+    """A model always comes back; later steps run only while the budget lasts"""
+
+    def setUp(self):
+        df = make_k2_like_frame(n_rows=600, seed=12)
+        X, y, preprocessor = build_preprocessor(df, "disposition", engine="hist_gradient_boosting")
+        self.Xt = build_pipeline(preprocessor, "passthrough")[:-1].fit_transform(X)
+        self.y = y.to_numpy()
+        self.model = build_model("hist_gradient_boosting", preprocessor)
+
+    def test_spent_budget_still_returns_baseline(self):
+        saved = []
+        best, report = anytime_fit(budget_ladder(self.model), self.Xt, self.y, seconds=0,
+                                   checkpoint=lambda fitted, entry: saved.append(entry["step"]) or len(saved))
+        self.assertEqual([s["step"] for s in report["steps"]], ["baseline"])
+        self.assertEqual((report["stopped"], saved), ("time_budget", ["baseline"]))
+        self.assertEqual(best.predict(self.Xt[:3]).shape, (3,))
+
+    def test_ample_budget_runs_every_step(self):
+        best, report = anytime_fit(budget_ladder(self.model), self.Xt, self.y, seconds=600)
+        self.assertEqual(report["stopped"], "completed")
+        self.assertEqual(report["steps"][-1]["params"], {"max_iter": self.model.max_iter})
+        best_entry = report["steps"][report["best_step"]]
+        self.assertEqual(best_entry["validation_accuracy"], max(s["validation_accuracy"] for s in report["steps"]))
+
+    def test_small_budget_skips_first_ensemble_step(self):
+        # Enough time left after the baseline for a fit, not for 25 units of one
+        steps = [("baseline", {}, None, lambda: _SleepyClassifier(0.05)),
+                 ("ensemble", {}, 25, lambda: _SleepyClassifier(1.0))]
+        best, report = anytime_fit(steps, self.Xt, self.y, seconds=0.5)
+        self.assertEqual([s["step"] for s in report["steps"]], ["baseline"])
+        self.assertEqual((report["stopped"], report["best_step"]), ("time_budget", 0))
+        self.assertEqual(best.seconds, 0.05)
+        self.assertLess(report["elapsed_seconds"], 0.5)
+
+    def test_ensemble_steps_are_priced_from_one_measured_unit(self):
+        ladder = budget_ladder(self.model)
+        self.assertEqual([step[:3] for step in ladder[1:3]],
+                         [("hist_gradient_boosting", {"max_iter": 1}, 1),
+                          ("hist_gradient_boosting", {"max_iter": 25}, 24)])
+        # A baseline much cheaper than a unit: the measured unit stops the 24-unit step
+        steps = [("baseline", {}, None, lambda: _SleepyClassifier(0.01)),
+                 ("ensemble", {"units": 1}, 1, lambda: _SleepyClassifier(0.1)),
+                 ("ensemble", {"units": 25}, 24, lambda: _SleepyClassifier(2.4))]
+        _, report = anytime_fit(steps, self.Xt, self.y, seconds=1.0)
+        self.assertEqual([s["params"] for s in report["steps"]], [{}, {"units": 1}])
+        self.assertEqual(report["stopped"], "time_budget")
+        self.assertLess(report["elapsed_seconds"], 1.0)
+
+
+class LeakFreeCrossValidationTests(SimpleTestCase):
+    """CV folds refit the preprocessing, also when the transformed matrices come from the cache"""
+
+    PARAMETERS = {"params": {"rf__n_estimators": 5, "ada__n_estimators": 5}}
+
+    def test_full_cv_matches_pipeline_cross_validation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "k2.csv")
+            make_k2_like_frame(n_rows=300, seed=16).to_csv(path, index=False)
+            cache = PreprocessingCache(os.path.join(directory, "cache"))
+            runs = [
+                train_and_select_model(path=path, cv_mode="full", parameters=self.PARAMETERS,
+                                       model_path=os.path.join(directory, "model.pkl"), preprocessing_cache=cache)
+                for _ in range(2)
+            ]
+            self.assertEqual([r["preprocessing_cache"]["hit"] for r in runs], [False, True])
+
+            X, y, preprocessor = build_preprocessor(load_data(path), "disposition")
+            X_train, _, y_train, _ = split_training_rows(X, y)
+            model = build_model().set_params(**self.PARAMETERS["params"])
+            expected = cross_val_score(build_pipeline(preprocessor, model), X_train, y_train,
+                                       cv=StratifiedKFold(n_splits=5), scoring="accuracy")
+        for run in runs:
+            self.assertAlmostEqual(run["cv_accuracy"]["mean"], expected.mean())
+            self.assertFalse(run["cv_accuracy"]["optimistic"])
+            self.assertNotIn("note", run["cv_accuracy"])
+
+    def test_fast_estimate_is_flagged_optimistic(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "k2.csv")
+            make_k2_like_frame(n_rows=300, seed=16).to_csv(path, index=False)
+            run = train_and_select_model(path=path, cv_mode="fast", parameters=self.PARAMETERS,
+                                         model_path=os.path.join(directory, "model.pkl"))
+        self.assertEqual(run["cv_accuracy"]["mode"], "fast")
+        self.assertTrue(run["cv_accuracy"]["optimistic"])
+        self.assertEqual(run["cv_accuracy"]["note"], FAST_CV_NOTE)
+
+
+class OOFStackingTests(SimpleTestCase):
+    """The captured meta-features are the cross_val_predict output StackingClassifier trains on"""
+
+    def test_oof_matrix_equals_cross_val_predict(self):
+        rng = np.random.default_rng(17)
+        X = rng.normal(size=(300, 5))
+        y = rng.integers(0, 3, 300)
+        model = build_model().set_params(rf__n_estimators=10, ada__n_estimators=10)
+        self.assertIsInstance(model, OOFStackingClassifier)
+        oof = model.fit(X, y).pop_oof()
+
+        expected = [
+            cross_val_predict(clone(estimator), X, y, cv=StratifiedKFold(n_splits=5), method="predict_proba")
+            for _, estimator in model.estimators
+        ]
+        # passthrough=True appends the original features
+        np.testing.assert_allclose(oof, np.hstack(expected + [X]))
+        self.assertIsNone(model.pop_oof())
+
+
+class SuccessiveHalvingSearchTests(SimpleTestCase):
+    """Bad option values are rejected up front; a spent budget keeps the last completed round"""
+
+    BUDGET = 3.0
+
+    def setUp(self):
+        X, y, preprocessor = build_preprocessor(make_k2_like_frame(n_rows=600, seed=18), "disposition")
+        self.X, self.y = X, y.to_numpy()
+        self.pipe = build_pipeline(preprocessor, DecisionTreeClassifier(random_state=0))
+
+    def options(self, **search):
+        search = {"space": {"max_depth": list(range(1, 10))}, "n_candidates": 9, "factor": 3,
+                  "min_samples": 60, "n_jobs": 1, **search}
+        return parse_parameters({"search": search}, self.pipe.named_steps["model"])[1]
+
+    def test_non_numeric_options_raise_value_error(self):
+        for value in (None, "three", [3]):
+            with self.subTest(value=value), self.assertRaisesRegex(ValueError, "must be integers"):
+                self.options(factor=value)
+        with self.assertRaisesRegex(ValueError, "must be integers"):
+            self.options(n_candidates=None)
+
+    def run_search(self, stall_after):
+        def progress(stage, done, total):
+            if done == stall_after:
+                time.sleep(self.BUDGET)
+        return successive_halving_search(self.pipe, self.X, self.y,
+                                         self.options(time_budget_seconds=self.BUDGET), progress=progress)
+
+    def assert_best_of_first_round(self, result):
+        best_params, best_score, trace = result
+        first_round = [e for e in trace["evaluations"] if e["round"] == 0]
+        self.assertEqual(len(first_round), 9)
+        self.assertTrue(trace["timed_out"])
+        self.assertEqual(trace["best_round"], 0)
+        self.assertEqual(best_score, max(e["mean_score"] for e in first_round))
+        self.assertIn(best_params, [e["params"] for e in first_round if e["mean_score"] == best_score])
+
+    def test_budget_spent_between_rounds_starts_no_new_round(self):
+        result = self.run_search(stall_after=9)
+        self.assertEqual(len(result[2]["evaluations"]), 9)
+        self.assert_best_of_first_round(result)
+
+    def test_budget_spent_inside_a_round_keeps_previous_round(self):
+        result = self.run_search(stall_after=10)
+        self.assertEqual([e["round"] for e in result[2]["evaluations"][9:]], [1])
+        self.assert_best_of_first_round(result)
+
+
+class IncrementalRetrainTests(SimpleTestCase):
+    """Appended rows extend the vocabularies without breaking the fitted layout"""
+
+    def setUp(self):
+        df = make_k2_like_frame(n_rows=400, seed=19)
+        X, y, preprocessor = build_preprocessor(df, "disposition")
+        # Empty in the fitted rows: the imputer drops it and the scaler's columns shift
+        X["pl_orbper"] = np.nan
+        model = build_model().set_params(rf__n_estimators=20, ada__n_estimators=20)
+        self.pipe = build_pipeline(preprocessor, model).fit(X, y)
+        self.state = with_meta_features(build_incremental_state(self.pipe, X, y), model, model.pop_oof())
+        self.columns = X.columns
+        new = make_k2_like_frame(n_rows=120, seed=20)
+        new["pl_orbper"] = np.nan
+        new.loc[new.index[:40], "disc_facility"] = "JWST"
+        self.X_new, self.y_new = new.drop(columns=["disposition"])[X.columns], new["disposition"]
+
+    def retrain(self):
+        return incremental_retrain(self.pipe, self.state, self.X_new, self.y_new, n_new_trees=5)
+
+    def test_new_category_gets_its_own_column(self):
+        pipe, _, report = self.retrain()
+        self.assertEqual(report["categories_added"], {"disc_facility": ["JWST"]})
+        ct = pipe.named_steps["preprocessor"]
+        names = list(ct.get_feature_names_out())
+        self.assertIn("cat__disc_facility_JWST", names)
+        Xt = ct.transform(pipe.named_steps["features"].transform(self.X_new.iloc[:1]))
+        row = Xt.toarray()[0] if hasattr(Xt, "toarray") else Xt[0]
+        self.assertEqual(row[names.index("cat__disc_facility_JWST")], 1.0)
+        # The fitted model is untouched
+        self.assertNotIn("cat__disc_facility_JWST", self.pipe.named_steps["preprocessor"].get_feature_names_out())
+
+    def test_old_rows_keep_their_predictions_layout(self):
+        pipe, _, report = self.retrain()
+        self.assertEqual(report["trees_total"], 25)
+        proba = pipe.predict_proba(self.X_new)
+        self.assertEqual(proba.shape, (len(self.X_new), 3))
+        np.testing.assert_array_equal(pipe.classes_, self.pipe.classes_)
+        np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+        # Same splits after the remap: the AdaBoost half of the stack still agrees with the old model
+        old_ada, new_ada = self.pipe.named_steps["model"].named_estimators_["ada"], \
+            pipe.named_steps["model"].named_estimators_["ada"]
+        Xt_old = self.pipe[:-1].transform(self.X_new)
+        Xt_new = pipe[:-1].transform(self.X_new)
+        np.testing.assert_allclose(new_ada.predict_proba(Xt_new), old_ada.predict_proba(Xt_old))
+        np.testing.assert_allclose(compile_pipeline(pipe).predict_proba(self.X_new), proba, atol=1e-9)
+
+    def test_drift_is_reported_per_scaled_column(self):
+        self.X_new["pl_rade"] += 50
+        _, state, report = self.retrain()
+        drift = report["numeric_mean_drift"]
+        self.assertNotIn("pl_orbper", drift)
+        self.assertGreater(drift["pl_rade"], 5)
+        self.assertLess(abs(drift["st_teff"]), 1)
+        num_pipe = self.pipe.named_steps["preprocessor"].named_transformers_["num"]
+        scaler = num_pipe.named_steps["scaler"]
+        j = state["num_columns"].index("st_teff")
+        k = list(num_pipe[:-1].get_feature_names_out()).index("st_teff")
+        mean = state["num_samples"][j].mean()
+        self.assertAlmostEqual(drift["st_teff"], (mean - scaler.mean_[k]) / scaler.scale_[k], 4)
+        self.assertNotIn("num_means", state)
+
+    def test_meta_learner_is_refitted_on_old_and_new_rows(self):
+        pipe, state, report = self.retrain()
+        self.assertTrue(report["meta_learner_refitted"])
+        old_final = self.pipe.named_steps["model"].final_estimator_
+        new_final = pipe.named_steps["model"].final_estimator_
+        n_meta = self.state["meta_features"].shape[1]
+        self.assertFalse(np.allclose(new_final.coef_[:, :n_meta], old_final.coef_[:, :n_meta]))
+        self.assertFalse(old_final.warm_start or new_final.warm_start)
+        # Every row fits in the sample, with the new rows' out-of-sample predictions
+        self.assertEqual((len(state["meta_rows"]), len(state["meta_labels"])), (520, 520))
+        self.assertEqual(state["meta_features"].shape, (520, n_meta))
+        self.assertEqual(len(self.state["meta_rows"]), 400)
+
+        # Accuracy on unseen rows does not regress against the previous version
+        held_out = make_k2_like_frame(n_rows=3000, seed=31)
+        held_out["pl_orbper"] = np.nan
+        X_held, y_held = held_out.drop(columns=["disposition"])[self.columns], held_out["disposition"]
+        before = accuracy_score(y_held, self.pipe.predict(X_held))
+        self.assertGreaterEqual(accuracy_score(y_held, pipe.predict(X_held)), before - 0.01)
+
+    def test_states_without_meta_features_keep_the_coefficients(self):
+        state = dict(self.state)
+        del state["meta_features"]
+        pipe, _, report = incremental_retrain(self.pipe, state, self.X_new, self.y_new, n_new_trees=5)
+        self.assertFalse(report["meta_learner_refitted"])
+        old_final = self.pipe.named_steps["model"].final_estimator_
+        n_meta = self.state["meta_features"].shape[1]
+        np.testing.assert_array_equal(pipe.named_steps["model"].final_estimator_.coef_[:, :n_meta],
+                                      old_final.coef_[:, :n_meta])
+
+
+class EvaluationTests(SimpleTestCase):
+    """Metrics from one predict_proba matrix match scikit-learn's; curves stay within the point budget"""
+
+    def setUp(self):
+        rng = np.random.default_rng(23)
+        self.classes = np.array(["CANDIDATE", "CONFIRMED", "FALSE POSITIVE"])
+        self.y_true = self.classes[rng.integers(0, 3, 2000)]
+        logits = rng.normal(size=(2000, 3)) + 1.5 * (self.y_true[:, None] == self.classes)
+        self.y_prob = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+
+    def test_metrics_match_sklearn(self):
+        y_pred, metrics = evaluate_probabilities(self.y_true, self.y_prob, self.classes)
+        np.testing.assert_array_equal(y_pred, self.classes[self.y_prob.argmax(axis=1)])
+        self.assertEqual(metrics["confusion_matrix"], confusion_matrix(self.y_true, y_pred, labels=self.classes).tolist())
+        self.assertAlmostEqual(metrics["accuracy"], accuracy_score(self.y_true, y_pred))
+        precision, recall, f1, _ = precision_recall_fscore_support(self.y_true, y_pred, average="macro", zero_division=0)
+        self.assertAlmostEqual(metrics["precision"], precision)
+        self.assertAlmostEqual(metrics["recall"], recall)
+        self.assertAlmostEqual(metrics["f1_score"], f1)
+        for i, c in enumerate(self.classes):
+            positives = self.y_true == c
+            self.assertAlmostEqual(metrics["auc"][f"roc_auc_class_{c}"], roc_auc_score(positives, self.y_prob[:, i]))
+            self.assertAlmostEqual(metrics["average_precision"][f"average_precision_class_{c}"],
+                                   average_precision_score(positives, self.y_prob[:, i]))
+            curve = metrics["roc_curve"][f"fpr_class_{c}"]
+            self.assertLessEqual(len(curve["x"]), 101)
+            self.assertEqual((curve["x"][0], curve["y"][-1]), (0.0, 1.0))
+            # The compact curve still traces the full one
+            self.assertAlmostEqual(auc(curve["x"], curve["y"]), metrics["auc"][f"roc_auc_class_{c}"], delta=0.01)
+
+    def test_class_missing_from_test_split_has_no_curves(self):
+        present = self.y_true != "CONFIRMED"
+        _, metrics = evaluate_probabilities(self.y_true[present], self.y_prob[present], self.classes)
+        self.assertNotIn("roc_auc_class_CONFIRMED", metrics["auc"])
+        self.assertNotIn("pr_class_CONFIRMED", metrics["pr_curve"])
+        self.assertEqual(len(metrics["auc"]), 2)
+
+    def test_downsampling(self):
+        x = np.linspace(0, 1, 1001)
+        self.assertEqual([len(c) for c in downsample_curve(x, 2 * x, tolerance=1e-9)], [2, 2])
+        x_small, y_small = downsample_curve(x, np.sqrt(x), max_points=20)
+        self.assertLessEqual(len(x_small), 20)
+        self.assertEqual((x_small[0], x_small[-1]), (0.0, 1.0))
+        np.testing.assert_allclose(np.interp(x, x_small, y_small), np.sqrt(x), atol=0.05)
+
+    def test_invalid_options(self):
+        for evaluation in ({"curve_points": 1}, {"curve_points": "10"}, {"curve_tolerance": 0}, {"bins": 5}):
+            with self.subTest(evaluation=evaluation), self.assertRaises(ValueError):
+                parse_evaluation_options({"evaluation": evaluation})
@@ -0,0 +1,53 @@
+# =====================================
+# worker_pool.py — pools de procesos locales (sin broker)
+# =====================================
+
+import multiprocessing
+import os
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _init_worker():
+    """Spawned workers start from a clean interpreter: set Django up once per process"""
+    import django
+    django.setup()
+
+
+def get_pool(name, max_workers):
+    """Process pool shared by every request of this server process, one per job kind.
+
+    Workers are spawned (not forked) so they never inherit the parent's open
+    database connections, and job state lives in the database.
+    """
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pools[name]
+
+
+def worker_id():
+    """host:pid recorded on the jobs this process runs"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def worker_alive(worker):
+    """False only for a worker of this host whose process is gone; other hosts cannot be checked"""
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (ProcessLookupError, ValueError):
+        return False
+    except PermissionError:
+        pass
+    return True